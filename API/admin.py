@@ -1,3 +1,12 @@
 from django.contrib import admin
 
+from .models import PagareFallido
+
 # Register your models here.
+
+
+@admin.register(PagareFallido)
+class PagareFallidoAdmin(admin.ModelAdmin):
+    list_display = ('procedimiento', 'pagare', 'motivo', 'intentos', 'ultimo_fallo', 'reintentar_despues')
+    list_filter = ('procedimiento', 'motivo')
+    search_fields = ('pagare',)
@@ -0,0 +1,141 @@
+# asociados.py
+#? Consulta de SP_CONSULTACAPA (ValidarAsociado) y su variante por lotes: las cédulas
+#? se consultan en paralelo en un ejecutor acotado por worker y los resultados se
+#? entregan a medida que terminan.
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import oracledb
+from django.conf import settings
+from django.db import close_old_connections
+
+from .cache import asociado_cacheado
+from .deadline import DeadlineAgotadoError, deadline_actual, ejecutar_con_deadline, tiempo_restante
+from .oracle_exec import ejecutar_procedimiento
+from .oracle_pool import PoolSaturadoError, configuracion_pool, obtener_particion
+
+logger = logging.getLogger(__name__)
+
+#? Pausa entre esperas del pool de una cédula en cola (con getmode 'nowait' no hay espera)
+PAUSA_REINTENTO_S = 0.05
+
+
+def consultar_asociado(cedula, particion=None, refrescar=False):
+    """ResultadoCache con la fila de SP_CONSULTACAPA para la cédula (valor None = no es asociado)."""
+    def cargar():
+        filas = ejecutar_procedimiento('SP_CONSULTACAPA', [str(cedula)], max_filas=1, particion=particion)
+        return filas[0] if filas else None
+
+    return asociado_cacheado(cedula, cargar, refrescar=refrescar)
+
+
+def normalizar_cedulas(cedulas):
+    """Cédulas como texto, sin vacías ni duplicados, en el orden recibido."""
+    return list(dict.fromkeys(str(c).strip() for c in cedulas if c is not None and str(c).strip()))
+
+
+class ValidacionLote:
+    """
+    Ejecutor compartido por las validaciones en lote del worker, uno por partición:
+    min(ASOCIADO_LOTE_HILOS, cuota de la partición, máximo del pool) consultas a la vez
+    en total, sin importar cuántos lotes lleguen. Más hilos que sesiones solo harían que
+    los de más esperen el pool y se rechacen con POOL_SATURADO; así esperan en la cola.
+    """
+
+    def __init__(self):
+        self._reiniciar()
+        os.register_at_fork(after_in_child=self._reiniciar)
+
+    def _reiniciar(self):
+        self._ejecutores = {}  #? partición -> ThreadPoolExecutor
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def hilos(particion=None):
+        """Consultas simultáneas por worker para la partición."""
+        limites = [getattr(settings, "ASOCIADO_LOTE_HILOS", 4), configuracion_pool()['max']]
+        cuota = obtener_particion(particion).cuota if particion else None
+        if cuota:
+            limites.append(cuota)
+        return max(1, min(limites))
+
+    def _get_ejecutor(self, particion=None):
+        with self._lock:
+            ejecutor = self._ejecutores.get(particion)
+            if ejecutor is None:
+                ejecutor = self._ejecutores[particion] = ThreadPoolExecutor(
+                    max_workers=self.hilos(particion),
+                    thread_name_prefix='validar-lote',
+                )
+            return ejecutor
+
+    @staticmethod
+    def _validar(cedula, particion, refrescar):
+        try:
+            resultado = ValidacionLote._consultar_en_cola(cedula, particion, refrescar)
+            return {
+                "cedula": cedula,
+                "respuesta": "SI" if resultado.valor is not None else "NO",
+                "asociado": resultado.valor,
+                "cache": resultado.estado,
+            }
+        except PoolSaturadoError:
+            return {"cedula": cedula, "error": "POOL_SATURADO"}
+        except DeadlineAgotadoError as e:
+            return {"cedula": cedula, "error": "DEADLINE_AGOTADO", "etapa": e.etapa}
+        except oracledb.DatabaseError as e:
+            logger.error(f"Error de base de datos validando la cédula {cedula}: {e}")
+            return {"cedula": cedula, "error": "ERROR_BASE_DATOS"}
+        except Exception as e:
+            logger.error(f"Error inesperado validando la cédula {cedula}: {e}", exc_info=True)
+            return {"cedula": cedula, "error": "ERROR_INESPERADO"}
+        finally:
+            #? El hilo no pasa por el ciclo de petición: se cierra su conexión a Postgres (caché compartida)
+            close_old_connections()
+
+    @staticmethod
+    def _consultar_en_cola(cedula, particion, refrescar):
+        """
+        consultar_asociado() que, si el pool sigue ocupado (otras peticiones del worker),
+        vuelve a esperar mientras a la petición le quede tiempo en vez de descartar la cédula.
+        """
+        while True:
+            try:
+                return consultar_asociado(cedula, particion=particion, refrescar=refrescar)
+            except PoolSaturadoError:
+                restante = tiempo_restante()
+                if restante is None or restante <= 0:
+                    raise
+                time.sleep(min(PAUSA_REINTENTO_S, restante))
+
+    def validar(self, cedulas, particion=None, refrescar=False):
+        """
+        Generador con un resultado (dict) por cédula, en el orden en que terminan.
+        Debe crearse dentro de la petición: toma su deadline, que luego aplica en los hilos.
+        """
+        deadline = deadline_actual()
+        ejecutor = self._get_ejecutor(particion)
+        pendientes = {
+            ejecutor.submit(ejecutar_con_deadline, deadline, self._validar, cedula, particion, refrescar)
+            for cedula in cedulas
+        }
+
+        def resultados():
+            try:
+                while pendientes:
+                    listos, _ = wait(pendientes, return_when=FIRST_COMPLETED)
+                    for futuro in listos:
+                        pendientes.discard(futuro)
+                        yield futuro.result()
+            finally:
+                #? El cliente cortó el stream (o terminó): lo que no empezó ya no se consulta
+                for futuro in pendientes:
+                    futuro.cancel()
+
+        return resultados()
+
+
+validacion_lote = ValidacionLote()
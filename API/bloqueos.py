@@ -0,0 +1,115 @@
+# bloqueos.py
+#? Advisory locks de Postgres para que una misma generación no corra en paralelo
+#? en varios workers (o nodos) que comparten la base 'default'.
+import asyncio
+import contextlib
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connection
+
+from .deadline import tiempo_restante
+
+logger = logging.getLogger(__name__)
+
+#? Claves tomadas por este proceso. Los advisory locks son reentrantes por sesión:
+#? dos peticiones que comparten conexión (hilo de sync_to_async) se verían ambas líderes.
+_claves_locales = set()
+_claves_lock = threading.Lock()
+
+INTERVALO_SONDEO_S = 0.25
+
+
+def _reiniciar_estado_en_hijo():
+    global _claves_lock
+    _claves_locales.clear()
+    _claves_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reiniciar_estado_en_hijo)
+
+
+def clave_bloqueo(texto):
+    """Entero con signo de 64 bits (lo que recibe pg_try_advisory_lock) derivado del texto."""
+    resumen = hashlib.blake2b(texto.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(resumen, 'big', signed=True)
+
+
+def intentar_bloqueo(clave):
+    """Toma el lock sin esperar; True si esta petición quedó como líder."""
+    with _claves_lock:
+        if clave in _claves_locales:
+            return False
+        _claves_locales.add(clave)
+    tomado = False
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_try_advisory_lock(%s)", [clave])
+                tomado = cursor.fetchone()[0]
+        else:
+            tomado = True
+    finally:
+        if not tomado:
+            with _claves_lock:
+                _claves_locales.discard(clave)
+    return tomado
+
+
+def liberar_bloqueo(clave):
+    try:
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [clave])
+    finally:
+        with _claves_lock:
+            _claves_locales.discard(clave)
+
+
+def _espera_maxima(espera_s=None):
+    """espera_s (por defecto PDF_BLOQUEO_ESPERA_S), acotado por lo que le queda a la petición."""
+    espera = getattr(settings, "PDF_BLOQUEO_ESPERA_S", 3) if espera_s is None else espera_s
+    restante = tiempo_restante()
+    return espera if restante is None else max(0, min(espera, restante))
+
+
+@contextlib.contextmanager
+def bloqueo_generacion(ambito, valor, espera_s=None):
+    """
+    Entrega True si esta petición tiene el lock de (ambito, valor). Si otra lo tiene,
+    espera hasta espera_s (PDF_BLOQUEO_ESPERA_S) a que lo suelte; si no, entrega False.
+    """
+    clave = clave_bloqueo(f"{ambito}:{valor}")
+    limite = time.monotonic() + _espera_maxima(espera_s)
+    tomado = intentar_bloqueo(clave)
+    if not tomado:
+        logger.info("Generación en curso para %s %s; esperando al líder", ambito, valor)
+    while not tomado and time.monotonic() < limite:
+        time.sleep(INTERVALO_SONDEO_S)
+        tomado = intentar_bloqueo(clave)
+    try:
+        yield tomado
+    finally:
+        if tomado:
+            liberar_bloqueo(clave)
+
+
+@contextlib.asynccontextmanager
+async def bloqueo_generacion_async(ambito, valor):
+    """Variante para vistas async; usa la conexión del hilo de sync_to_async."""
+    clave = clave_bloqueo(f"{ambito}:{valor}")
+    limite = time.monotonic() + _espera_maxima()
+    tomado = await sync_to_async(intentar_bloqueo)(clave)
+    while not tomado and time.monotonic() < limite:
+        await asyncio.sleep(INTERVALO_SONDEO_S)
+        tomado = await sync_to_async(intentar_bloqueo)(clave)
+    try:
+        yield tomado
+    finally:
+        if tomado:
+            await sync_to_async(liberar_bloqueo)(clave)
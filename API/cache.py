@@ -0,0 +1,472 @@
+# cache.py
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+from .bloqueos import INTERVALO_SONDEO_S, clave_bloqueo, intentar_bloqueo, liberar_bloqueo
+from .deadline import DeadlineAgotadoError, tiempo_restante
+
+logger = logging.getLogger(__name__)
+
+#? estado: 'HIT' (memoria del worker), 'HIT-DB' (nivel compartido en Postgres),
+#? 'MISS' (esta petición consultó Oracle), 'SHARED' (esperó la consulta que ya
+#? estaba en curso en este u otro worker para la misma clave) o 'BYPASS' (el cliente pidió
+#? no usar la caché; se consultó Oracle y se refrescó la entrada)
+ResultadoCache = namedtuple('ResultadoCache', ['valor', 'estado', 'edad_s'])
+
+ESTADOS = ('HIT', 'HIT-DB', 'MISS', 'SHARED', 'BYPASS')
+ESTADOS_FALLO = ('MISS', 'BYPASS')
+
+#? Alias de CACHES para el nivel compartido entre workers
+ALIAS_COMPARTIDO = 'oracle'
+
+
+class _EnCurso:
+    """Consulta en curso para una clave: los seguidores esperan su resultado."""
+
+    def __init__(self):
+        self.listo = threading.Event()
+        self.valor = None
+        self.error = None
+        self.creado = None
+
+
+class CacheTTL:
+    """
+    Caché de dos niveles con vencimiento por TTL y single-flight:
+      1. LRU en memoria del worker (CACHE_LOCAL_MAX_ENTRADAS entradas).
+      2. Si compartida=True, CACHES['oracle'] (tabla UNLOGGED en Postgres), común a
+         todos los workers; se consulta solo cuando falla el nivel local.
+    Si varias peticiones del worker piden la misma clave vencida a la vez, solo la
+    primera consulta el nivel compartido u Oracle y las demás reciben su resultado.
+    Con el nivel compartido, un advisory lock de Postgres por clave (API/bloqueos.py)
+    hace lo mismo entre workers: uno ejecuta cargar() y los demás releen el nivel
+    compartido hasta CACHE_BLOQUEO_ESPERA_S.
+    Los errores no se guardan. Los valores se comparten: quien los use no debe modificarlos.
+    Las claves son str o tuplas cuyo primer elemento es el procedimiento (para métricas).
+    ttl_s puede ser un número o una función valor -> segundos (TTL distinto por respuesta).
+    'version' forma parte de las claves compartidas: se sube cuando cambia el formato de
+    los valores, para que los workers no lean entradas guardadas con el formato anterior.
+    """
+
+    def __init__(self, nombre, compartida=True, max_entradas=None, version=None):
+        self.nombre = nombre
+        self.compartida = compartida
+        self.max_entradas = max_entradas  #? None = CACHE_LOCAL_MAX_ENTRADAS
+        self.version = version
+        self._reiniciar()
+        os.register_at_fork(after_in_child=self._reiniciar)
+
+    def _reiniciar(self):
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()  #? clave -> (valor, creado: time.time())
+        self._en_curso = {}
+        self._en_curso_async = {}
+        self._contadores = defaultdict(lambda: dict.fromkeys(ESTADOS, 0))
+
+    @staticmethod
+    def _ttl(ttl_s, valor):
+        return ttl_s(valor) if callable(ttl_s) else ttl_s
+
+    @staticmethod
+    def _etiqueta(clave):
+        return clave[0] if isinstance(clave, tuple) else clave
+
+    def _clave_compartida(self, clave):
+        partes = clave if isinstance(clave, tuple) else (clave,)
+        prefijo = [self.nombre] if self.version is None else [self.nombre, f"v{self.version}"]
+        return ":".join([*prefijo, *map(str, partes)])
+
+    def _contar(self, clave, estado):
+        with self._lock:
+            self._contadores[self._etiqueta(clave)][estado] += 1
+
+    # Nivel local (llamar con self._lock tomado)
+
+    def _leer_local(self, clave, ttl_s):
+        entrada = self._entradas.get(clave)
+        if entrada is None:
+            return None
+        if time.time() - entrada[1] >= self._ttl(ttl_s, entrada[0]):
+            del self._entradas[clave]
+            return None
+        self._entradas.move_to_end(clave)
+        return entrada
+
+    def _guardar_local(self, clave, valor, creado):
+        self._entradas[clave] = (valor, creado)
+        self._entradas.move_to_end(clave)
+        maximo = self.max_entradas or getattr(settings, "CACHE_LOCAL_MAX_ENTRADAS", 1000)
+        while len(self._entradas) > maximo:
+            self._entradas.popitem(last=False)
+
+    # Nivel compartido: si Postgres falla se sigue sin él (cuenta como fallo de caché)
+
+    def _vigente_compartida(self, entrada, ttl_s):
+        return entrada is not None and time.time() - entrada[1] < self._ttl(ttl_s, entrada[0])
+
+    def _leer_compartida(self, clave, ttl_s):
+        if not self.compartida:
+            return None
+        try:
+            entrada = caches[ALIAS_COMPARTIDO].get(self._clave_compartida(clave))
+        except Exception as e:
+            logger.warning("Caché compartida no disponible (%s): %s", self.nombre, e)
+            return None
+        return entrada if self._vigente_compartida(entrada, ttl_s) else None
+
+    async def _leer_compartida_async(self, clave, ttl_s):
+        if not self.compartida:
+            return None
+        try:
+            entrada = await caches[ALIAS_COMPARTIDO].aget(self._clave_compartida(clave))
+        except Exception as e:
+            logger.warning("Caché compartida no disponible (%s): %s", self.nombre, e)
+            return None
+        return entrada if self._vigente_compartida(entrada, ttl_s) else None
+
+    def _escribir_compartida(self, clave, valor, creado, ttl_s):
+        ttl_s = self._ttl(ttl_s, valor)
+        if not self.compartida or ttl_s <= 0:
+            return
+        try:
+            caches[ALIAS_COMPARTIDO].set(self._clave_compartida(clave), (valor, creado), timeout=ttl_s)
+        except Exception as e:
+            logger.warning("No se pudo escribir en la caché compartida (%s): %s", self.nombre, e)
+
+    async def _escribir_compartida_async(self, clave, valor, creado, ttl_s):
+        ttl_s = self._ttl(ttl_s, valor)
+        if not self.compartida or ttl_s <= 0:
+            return
+        try:
+            await caches[ALIAS_COMPARTIDO].aset(self._clave_compartida(clave), (valor, creado), timeout=ttl_s)
+        except Exception as e:
+            logger.warning("No se pudo escribir en la caché compartida (%s): %s", self.nombre, e)
+
+    # Carga coordinada entre workers (advisory lock por clave del nivel compartido)
+
+    def _coordinada(self, ttl_s):
+        #? Con TTL 0 no se escribe el nivel compartido: no hay nada que releer
+        return self.compartida and (callable(ttl_s) or ttl_s > 0)
+
+    def _clave_bloqueo(self, clave):
+        return clave_bloqueo(f"cache:{self._clave_compartida(clave)}")
+
+    def _intentar_bloqueo(self, clave_lock):
+        """True/False según se tomó el lock; None si Postgres no responde (se carga sin coordinar)."""
+        try:
+            return intentar_bloqueo(clave_lock)
+        except Exception as e:
+            logger.warning("Sin advisory lock para la caché compartida (%s): %s", self.nombre, e)
+            return None
+
+    def _liberar_bloqueo(self, clave_lock):
+        try:
+            liberar_bloqueo(clave_lock)
+        except Exception as e:
+            logger.warning("No se pudo liberar el advisory lock de la caché (%s): %s", self.nombre, e)
+
+    def _limite_bloqueo(self):
+        espera = getattr(settings, "CACHE_BLOQUEO_ESPERA_S", 10)
+        restante = tiempo_restante()
+        return time.monotonic() + (espera if restante is None else max(0, min(espera, restante)))
+
+    def _cargar_entre_workers(self, clave, cargar, ttl_s):
+        """(valor, creado, estado) para el líder del worker tras un fallo del nivel compartido."""
+        clave_lock = self._clave_bloqueo(clave)
+        limite = self._limite_bloqueo()
+        tomado = self._intentar_bloqueo(clave_lock)
+        while tomado is False and time.monotonic() < limite:
+            time.sleep(INTERVALO_SONDEO_S)
+            entrada = self._leer_compartida(clave, ttl_s)
+            if entrada is not None:
+                return (*entrada, 'SHARED')
+            tomado = self._intentar_bloqueo(clave_lock)
+        try:
+            if tomado:
+                #? Otro worker pudo escribirla entre la primera lectura y el lock
+                entrada = self._leer_compartida(clave, ttl_s)
+                if entrada is not None:
+                    return (*entrada, 'HIT-DB')
+            valor = cargar()
+            creado = time.time()
+            self._escribir_compartida(clave, valor, creado, ttl_s)
+            return valor, creado, 'MISS'
+        finally:
+            if tomado:
+                self._liberar_bloqueo(clave_lock)
+
+    async def _cargar_entre_workers_async(self, clave, cargar, ttl_s):
+        clave_lock = self._clave_bloqueo(clave)
+        limite = self._limite_bloqueo()
+        tomado = await sync_to_async(self._intentar_bloqueo)(clave_lock)
+        while tomado is False and time.monotonic() < limite:
+            await asyncio.sleep(INTERVALO_SONDEO_S)
+            entrada = await self._leer_compartida_async(clave, ttl_s)
+            if entrada is not None:
+                return (*entrada, 'SHARED')
+            tomado = await sync_to_async(self._intentar_bloqueo)(clave_lock)
+        try:
+            if tomado:
+                entrada = await self._leer_compartida_async(clave, ttl_s)
+                if entrada is not None:
+                    return (*entrada, 'HIT-DB')
+            valor = await cargar()
+            creado = time.time()
+            await self._escribir_compartida_async(clave, valor, creado, ttl_s)
+            return valor, creado, 'MISS'
+        finally:
+            if tomado:
+                await sync_to_async(self._liberar_bloqueo)(clave_lock)
+
+    def _resultado(self, clave, valor, creado, estado):
+        with self._lock:
+            self._guardar_local(clave, valor, creado)
+            self._contadores[self._etiqueta(clave)][estado] += 1
+        return ResultadoCache(valor, estado, time.time() - creado)
+
+    def obtener(self, clave, cargar, ttl_s, refrescar=False):
+        """
+        Retorna ResultadoCache con el valor de 'clave', ejecutando cargar() si venció.
+        Con refrescar=True ejecuta cargar() sin mirar la caché y guarda el valor nuevo.
+        """
+        if refrescar:
+            valor = cargar()
+            creado = time.time()
+            self._escribir_compartida(clave, valor, creado, ttl_s)
+            return self._resultado(clave, valor, creado, 'BYPASS')
+
+        with self._lock:
+            entrada = self._leer_local(clave, ttl_s)
+            if entrada is not None:
+                self._contadores[self._etiqueta(clave)]["HIT"] += 1
+                return ResultadoCache(entrada[0], 'HIT', time.time() - entrada[1])
+            en_curso = self._en_curso.get(clave)
+            lider = en_curso is None
+            if lider:
+                en_curso = self._en_curso[clave] = _EnCurso()
+
+        if not lider:
+            #? El seguidor no espera más de lo que le queda a su propia petición
+            if not en_curso.listo.wait(timeout=tiempo_restante()):
+                raise DeadlineAgotadoError(f"cache:{self.nombre}")
+            if en_curso.error is not None:
+                raise en_curso.error
+            self._contar(clave, "SHARED")
+            return ResultadoCache(en_curso.valor, 'SHARED', time.time() - en_curso.creado)
+
+        try:
+            entrada = self._leer_compartida(clave, ttl_s)
+            if entrada is not None:
+                en_curso.valor, en_curso.creado = entrada
+                return self._resultado(clave, *entrada, 'HIT-DB')
+            if self._coordinada(ttl_s):
+                en_curso.valor, en_curso.creado, estado = self._cargar_entre_workers(clave, cargar, ttl_s)
+                return self._resultado(clave, en_curso.valor, en_curso.creado, estado)
+            en_curso.valor = cargar()
+            en_curso.creado = time.time()
+            return self._resultado(clave, en_curso.valor, en_curso.creado, 'MISS')
+        except BaseException as exc:
+            en_curso.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._en_curso.pop(clave, None)
+            en_curso.listo.set()
+
+    async def obtener_async(self, clave, cargar, ttl_s, refrescar=False):
+        """Variante para vistas async: 'cargar' es una función async sin argumentos."""
+        if refrescar:
+            valor = await cargar()
+            creado = time.time()
+            await self._escribir_compartida_async(clave, valor, creado, ttl_s)
+            return self._resultado(clave, valor, creado, 'BYPASS')
+
+        with self._lock:
+            entrada = self._leer_local(clave, ttl_s)
+        if entrada is not None:
+            self._contar(clave, "HIT")
+            return ResultadoCache(entrada[0], 'HIT', time.time() - entrada[1])
+
+        futuro = self._en_curso_async.get(clave)
+        if futuro is not None:
+            try:
+                valor, creado = await asyncio.wait_for(asyncio.shield(futuro), tiempo_restante())
+            except asyncio.TimeoutError:
+                raise DeadlineAgotadoError(f"cache:{self.nombre}")
+            self._contar(clave, "SHARED")
+            return ResultadoCache(valor, 'SHARED', time.time() - creado)
+
+        futuro = self._en_curso_async[clave] = asyncio.get_running_loop().create_future()
+        try:
+            entrada = await self._leer_compartida_async(clave, ttl_s)
+            if entrada is not None:
+                valor, creado = entrada
+                estado = 'HIT-DB'
+            elif self._coordinada(ttl_s):
+                valor, creado, estado = await self._cargar_entre_workers_async(clave, cargar, ttl_s)
+            else:
+                valor = await cargar()
+                creado = time.time()
+                estado = 'MISS'
+            futuro.set_result((valor, creado))
+            return self._resultado(clave, valor, creado, estado)
+        except asyncio.CancelledError:
+            futuro.cancel()
+            raise
+        except BaseException as exc:
+            futuro.set_exception(exc)
+            #? Evita el aviso de "exception was never retrieved" si nadie esperaba
+            futuro.exception()
+            raise
+        finally:
+            self._en_curso_async.pop(clave, None)
+
+    def vigentes(self, claves, ttl_s):
+        """Subconjunto de 'claves' con valor vigente en algún nivel (sin contarlo como uso)."""
+        with self._lock:
+            encontradas = {c for c in claves if self._leer_local(c, ttl_s) is not None}
+        faltantes = {self._clave_compartida(c): c for c in claves if c not in encontradas}
+        if self.compartida and faltantes:
+            try:
+                remotas = caches[ALIAS_COMPARTIDO].get_many(list(faltantes))
+            except Exception as e:
+                logger.warning("Caché compartida no disponible (%s): %s", self.nombre, e)
+                remotas = {}
+            encontradas.update(
+                faltantes[k] for k, entrada in remotas.items() if self._vigente_compartida(entrada, ttl_s)
+            )
+        return encontradas
+
+    def guardar(self, clave, valor, ttl_s):
+        creado = time.time()
+        with self._lock:
+            self._guardar_local(clave, valor, creado)
+        self._escribir_compartida(clave, valor, creado, ttl_s)
+
+    def tomar(self, clave, ttl_s):
+        """Retira y retorna el valor vigente de 'clave' (None si no hay): para datos de un solo uso."""
+        with self._lock:
+            entrada = self._entradas.pop(clave, None)
+        estado = 'HIT'
+        if self.compartida:
+            clave_compartida = self._clave_compartida(clave)
+            try:
+                if entrada is None:
+                    entrada, estado = caches[ALIAS_COMPARTIDO].get(clave_compartida), 'HIT-DB'
+                caches[ALIAS_COMPARTIDO].delete(clave_compartida)
+            except Exception as e:
+                logger.warning("Caché compartida no disponible (%s): %s", self.nombre, e)
+        if entrada is None or time.time() - entrada[1] >= self._ttl(ttl_s, entrada[0]):
+            self._contar(clave, "MISS")
+            return None
+        self._contar(clave, estado)
+        return entrada[0]
+
+    def invalidar(self, clave=None):
+        """Borra 'clave' de ambos niveles; sin clave vacía solo el nivel local del worker."""
+        with self._lock:
+            if clave is None:
+                self._entradas.clear()
+            else:
+                self._entradas.pop(clave, None)
+        if clave is not None and self.compartida:
+            try:
+                caches[ALIAS_COMPARTIDO].delete(self._clave_compartida(clave))
+            except Exception as e:
+                logger.warning("Caché compartida no disponible (%s): %s", self.nombre, e)
+
+    def estadisticas(self):
+        """Aciertos por nivel y fallos por procedimiento, con la tasa de acierto."""
+        with self._lock:
+            por_procedimiento = {}
+            for etiqueta, contadores in sorted(self._contadores.items()):
+                total = sum(contadores.values())
+                por_procedimiento[etiqueta] = {
+                    **{estado.lower().replace('-', '_'): n for estado, n in contadores.items()},
+                    "tasa_acierto": (
+                        round((total - sum(contadores[e] for e in ESTADOS_FALLO)) / total, 3) if total else None
+                    ),
+                }
+            return {
+                "compartida": self.compartida,
+                "entradas_locales": len(self._entradas),
+                "procedimientos": por_procedimiento,
+            }
+
+
+#? Listados SP_PLANPAGOS*1 como lista de FlujoResumen: clave (procedimiento, 'resumen')
+cache_listados = CacheTTL('listados')
+
+#? Detalles SP_PLANPAGOS* precargados tras un listado (API/prefetch.py): clave (procedimiento, pagaré).
+#? Datos personales: el nivel compartido solo con PREFETCH_CACHE_COMPARTIDA.
+#? Versión 2: PLAN_PAGO como PlanPago (antes lista de dicts por cuota)
+cache_detalles = CacheTTL(
+    'detalles',
+    compartida=getattr(settings, "PREFETCH_CACHE_COMPARTIDA", False),
+    version=2,
+)
+
+#? Respuestas de SP_CONSULTACAPA (ValidarAsociado): clave ('SP_CONSULTACAPA', cédula).
+#? Datos personales: el nivel compartido solo con ASOCIADO_CACHE_COMPARTIDA
+cache_asociados = CacheTTL(
+    'asociados',
+    compartida=getattr(settings, "ASOCIADO_CACHE_COMPARTIDA", False),
+    max_entradas=getattr(settings, "ASOCIADO_CACHE_MAX_ENTRADAS", 5000),
+)
+
+
+def listado_cacheado(procedimiento, cargar):
+    """
+    Resumen del listado de flujos pendientes desde la caché (TTL LISTADO_CACHE_TTL_S).
+    cargar() retorna la lista de FlujoResumen: es lo único que se guarda y comparte.
+    """
+    resultado = cache_listados.obtener(
+        (procedimiento, 'resumen'), cargar, getattr(settings, "LISTADO_CACHE_TTL_S", 60)
+    )
+    if resultado.estado != 'HIT':
+        logger.info("Listado %s: %s (%s flujos)", procedimiento, resultado.estado, len(resultado.valor))
+    return resultado
+
+
+async def listado_cacheado_async(procedimiento, cargar):
+    return await cache_listados.obtener_async(
+        (procedimiento, 'resumen'), cargar, getattr(settings, "LISTADO_CACHE_TTL_S", 60)
+    )
+
+
+def _ttl_asociado(fila):
+    """Los "NO" (sin fila) duran menos: la cédula puede afiliarse en cualquier momento."""
+    if fila is None:
+        return getattr(settings, "ASOCIADO_CACHE_TTL_NO_S", 30)
+    return getattr(settings, "ASOCIADO_CACHE_TTL_S", 300)
+
+
+def asociado_cacheado(cedula, cargar, refrescar=False):
+    """Fila de SP_CONSULTACAPA para la cédula (None si no es asociado); cargar() la consulta."""
+    return cache_asociados.obtener(('SP_CONSULTACAPA', str(cedula)), cargar, _ttl_asociado, refrescar=refrescar)
+
+
+async def asociado_cacheado_async(cedula, cargar, refrescar=False):
+    return await cache_asociados.obtener_async(
+        ('SP_CONSULTACAPA', str(cedula)), cargar, _ttl_asociado, refrescar=refrescar
+    )
+
+
+def pide_sin_cache(request):
+    """True si el cliente envió Cache-Control: no-cache (forzar la consulta a Oracle)."""
+    return 'no-cache' in request.headers.get('Cache-Control', '').lower()
+
+
+def cabeceras_cache(response, resultado):
+    """X-Cache (HIT/HIT-DB/MISS/SHARED/BYPASS) y Age (segundos desde la consulta a Oracle)."""
+    response['X-Cache'] = resultado.estado
+    response['Age'] = str(int(resultado.edad_s))
+    return response
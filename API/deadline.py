@@ -0,0 +1,120 @@
+# deadline.py
+import contextvars
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+#? Instante (time.monotonic) en que vence la petición en curso; None = sin límite
+_deadline = contextvars.ContextVar('deadline', default=None)
+
+
+class DeadlineAgotadoError(Exception):
+    """Se agotó el tiempo de la petición antes de (o durante) la etapa indicada."""
+
+    def __init__(self, etapa):
+        super().__init__(f"Tiempo de la petición agotado en la etapa: {etapa}")
+        self.etapa = etapa
+
+
+def establecer_deadline(segundos):
+    """Fija el deadline del contexto actual; retorna el token para restablecerlo."""
+    return _deadline.set(time.monotonic() + segundos if segundos else None)
+
+
+def restablecer_deadline(token):
+    _deadline.reset(token)
+
+
+def deadline_actual():
+    """Deadline (time.monotonic) de la petición en curso, para llevarlo a otros hilos."""
+    return _deadline.get()
+
+
+def ejecutar_con_deadline(deadline, funcion, *args, **kwargs):
+    """
+    Ejecuta funcion con el deadline dado (de deadline_actual). Para hilos propios y
+    generadores de StreamingHttpResponse, que corren fuera del DeadlineMiddleware.
+    """
+    token = _deadline.set(deadline)
+    try:
+        return funcion(*args, **kwargs)
+    finally:
+        _deadline.reset(token)
+
+
+def tiempo_restante():
+    """Segundos que le quedan a la petición, o None si no tiene deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.monotonic()
+
+
+def verificar_deadline(etapa):
+    """Lanza DeadlineAgotadoError si la petición ya no tiene tiempo para la etapa."""
+    restante = tiempo_restante()
+    if restante is not None and restante <= 0:
+        raise DeadlineAgotadoError(etapa)
+
+
+def limitar_timeout_ms(timeout_ms, etapa):
+    """
+    Recorta un timeout (ms; 0 = sin límite) al tiempo que le queda a la petición.
+    Lanza DeadlineAgotadoError si ya no queda tiempo.
+    """
+    restante = tiempo_restante()
+    if restante is None:
+        return timeout_ms
+    if restante <= 0:
+        raise DeadlineAgotadoError(etapa)
+    restante_ms = max(1, int(restante * 1000))
+    return min(timeout_ms, restante_ms) if timeout_ms else restante_ms
+
+
+def deadline_para(request):
+    """
+    Segundos de presupuesto de la petición: cabecera X-Request-Timeout (acotada por
+    REQUEST_DEADLINE_MAX_S) o, en su defecto, REQUEST_DEADLINE_RUTAS / REQUEST_DEADLINE_S.
+    """
+    cabecera = request.headers.get('X-Request-Timeout')
+    if cabecera:
+        try:
+            return min(float(cabecera), getattr(settings, "REQUEST_DEADLINE_MAX_S", 115))
+        except ValueError:
+            logger.warning("Cabecera X-Request-Timeout inválida: %s", cabecera)
+    for fragmento, segundos in getattr(settings, "REQUEST_DEADLINE_RUTAS", {}).items():
+        if fragmento in request.path:
+            return segundos
+    return getattr(settings, "REQUEST_DEADLINE_S", None)
+
+
+class DeadlineMiddleware:
+    """Fija el deadline de cada petición para que Oracle, el pool y el render lo respeten."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = establecer_deadline(deadline_para(request))
+        try:
+            return self.get_response(request)
+        finally:
+            restablecer_deadline(token)
+
+    async def __acall__(self, request):
+        token = establecer_deadline(deadline_para(request))
+        try:
+            return await self.get_response(request)
+        finally:
+            restablecer_deadline(token)
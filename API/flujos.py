@@ -0,0 +1,251 @@
+# flujos.py
+#? Registros compactos para las filas de los SP_PLANPAGOS*: en vez de un dict por fila,
+#? una clase con __slots__ por forma de cursor (armada una vez desde cursor.description).
+from functools import lru_cache
+from keyword import iskeyword
+from operator import attrgetter
+from typing import NamedTuple
+
+#? MAIL que reciben las filas sin correo; esas filas no entran al listado de flujos pendientes
+MAIL_POR_DEFECTO = 'no-email@example.com'
+
+#? Campos que agrega el procesamiento de las filas (API/views.py, API/plan_pagos.py)
+#? cuando el SP no los trae como columna
+CAMPOS_AGREGADOS = ('MAIL', 'PAGARE', 'PLAN_PAGO', 'FECHAULTIMA', 'VALORCUOTA')
+
+
+#? Valor de los campos agregados que aún no se asignan (no se exponen como claves)
+_SIN_ASIGNAR = object()
+
+
+class Diferido:
+    """
+    Valor de un campo que se calcula la primera vez que se lee (ej. PLAN_PAGO): el
+    Flujo guarda calcular(flujo, respaldo) en el campo y no lo vuelve a calcular.
+    """
+
+    __slots__ = ('calcular', 'respaldo')
+
+    def __init__(self, calcular, respaldo=None):
+        self.calcular = calcular
+        self.respaldo = respaldo
+
+    def __reduce__(self):
+        return (Diferido, (self.calcular, self.respaldo))
+
+
+class Flujo:
+    """
+    Fila de un SP_PLANPAGOS* con la interfaz de dict que usan las vistas y el render
+    (get, [], in, items...). Cada forma de cursor tiene su subclase (tipo_flujo) con
+    un slot por campo: sin tabla hash por fila. Solo se pueden asignar sus campos.
+    Los campos con un Diferido se calculan al leerlos.
+    """
+
+    __slots__ = ()
+    _campos = ()  #? columnas del cursor + CAMPOS_AGREGADOS que no trae
+    _atributos = {}  #? campo -> nombre del slot
+    _columnas = ()
+    _slots_columnas = ()
+    _slots_agregados = ()
+    _leer = None  #? attrgetter de todos los slots, en el orden de _campos
+
+    def __init__(self, *valores):
+        #? Es la rowfactory del cursor: recibe los valores en el orden de las columnas
+        for atributo, valor in zip(self._slots_columnas, valores):
+            setattr(self, atributo, valor)
+        for atributo in self._slots_agregados:
+            setattr(self, atributo, _SIN_ASIGNAR)
+
+    def _leer_slot(self, atributo):
+        valor = getattr(self, atributo)
+        if type(valor) is Diferido:
+            valor = valor.calcular(self, valor.respaldo)
+            setattr(self, atributo, valor)
+        return valor
+
+    #? __getitem__ y get son el camino caliente (render, resumen): se evita llamar a
+    #? _leer_slot salvo para los Diferido
+
+    def __getitem__(self, campo):
+        atributo = self._atributos.get(campo)
+        if atributo is None:
+            raise KeyError(campo)
+        valor = getattr(self, atributo)
+        if type(valor) is Diferido:
+            valor = self._leer_slot(atributo)
+        if valor is _SIN_ASIGNAR:
+            raise KeyError(campo)
+        return valor
+
+    def get(self, campo, default=None):
+        atributo = self._atributos.get(campo)
+        if atributo is None:
+            return default
+        valor = getattr(self, atributo)
+        if type(valor) is Diferido:
+            valor = self._leer_slot(atributo)
+        return default if valor is _SIN_ASIGNAR else valor
+
+    def __setitem__(self, campo, valor):
+        atributo = self._atributos.get(campo)
+        if atributo is None:
+            raise KeyError(f"{campo} no es un campo de este flujo ({', '.join(self._campos)})")
+        setattr(self, atributo, valor)
+
+    def __contains__(self, campo):
+        atributo = self._atributos.get(campo)
+        return atributo is not None and getattr(self, atributo) is not _SIN_ASIGNAR
+
+    def _items_crudos(self):
+        """Como items(), sin calcular los Diferido."""
+        return [
+            (campo, valor) for campo, valor in zip(self._campos, self._leer(self))
+            if valor is not _SIN_ASIGNAR
+        ]
+
+    def items(self):
+        #? Lista (no vista): se puede asignar campos mientras se recorre
+        items = []
+        for campo, valor in self._items_crudos():
+            if type(valor) is Diferido:
+                valor = self._leer_slot(self._atributos[campo])
+            items.append((campo, valor))
+        return items
+
+    def keys(self):
+        return [campo for campo, _ in self._items_crudos()]
+
+    def values(self):
+        return [valor for _, valor in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self._items_crudos())
+
+    def a_dict(self):
+        """dict de los campos asignados (para JSON u otras salidas)."""
+        return dict(self.items())
+
+    def __eq__(self, otro):
+        if isinstance(otro, (Flujo, dict)):
+            return self.a_dict() == dict(otro.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Flujo({self.a_dict()!r})"
+
+    def __reduce__(self):
+        #? Las subclases se crean en tiempo de ejecución: se reconstruyen por sus columnas.
+        #? Los Diferido se guardan sin calcular.
+        return (_reconstruir, (self._columnas, dict(self._items_crudos())))
+
+
+def _atributo(i, campo):
+    """Nombre del slot: la columna si es un identificador válido, si no uno posicional."""
+    if campo.isidentifier() and not iskeyword(campo) and not campo.startswith('_') and not hasattr(Flujo, campo):
+        return campo
+    return f"_c{i}"
+
+
+@lru_cache(maxsize=64)
+def tipo_flujo(columnas):
+    """
+    Subclase de Flujo para las columnas de un cursor (tupla de nombres), creada una vez.
+    Lanza ValueError si el cursor repite un nombre de columna (un slot por campo).
+    """
+    repetidas = sorted({columna for columna in columnas if columnas.count(columna) > 1})
+    if repetidas:
+        raise ValueError(f"Columnas repetidas en el cursor: {', '.join(repetidas)}")
+    campos = tuple(dict.fromkeys(columnas + CAMPOS_AGREGADOS))
+    atributos = {campo: _atributo(i, campo) for i, campo in enumerate(campos)}
+    return type('Flujo', (Flujo,), {
+        '__slots__': tuple(atributos.values()),
+        '_campos': campos,
+        '_atributos': atributos,
+        '_columnas': columnas,
+        '_slots_columnas': tuple(atributos[c] for c in columnas),
+        '_slots_agregados': tuple(atributos[c] for c in campos if c not in columnas),
+        '_leer': attrgetter(*atributos.values()),
+    })
+
+
+def _reconstruir(columnas, campos):
+    flujo = tipo_flujo(columnas)(*[_SIN_ASIGNAR] * len(columnas))
+    for campo, valor in campos.items():
+        flujo[campo] = valor
+    return flujo
+
+
+class LecturaListado:
+    """
+    Lectura de un listado SP_PLANPAGOS*1 durante el fetch (oracle_exec.leer_cursor):
+    descarta, sin armarlas, las filas sin MAIL (o con MAIL_POR_DEFECTO) o sin CEDULA;
+    a las demás les cambia None por '' y les agrega el PAGARE de la OBLIGACION.
+    """
+
+    def __init__(self, obtener_pagare):
+        self.obtener_pagare = obtener_pagare
+
+    def __call__(self, columnas, fabrica):
+        indices = {columna: i for i, columna in enumerate(columnas)}
+        if 'MAIL' not in indices or 'CEDULA' not in indices:
+            #? Ninguna fila tendría MAIL y CEDULA
+            return lambda valores: None
+        i_mail, i_cedula, i_obligacion = indices['MAIL'], indices['CEDULA'], indices.get('OBLIGACION')
+        obtener_pagare = self.obtener_pagare
+
+        def por_fila(valores):
+            mail, cedula = valores[i_mail], valores[i_cedula]
+            if not mail or mail == MAIL_POR_DEFECTO or cedula is None or not str(cedula).strip():
+                return None
+            fila = fabrica(*['' if v is None else v for v in valores])
+            fila['PAGARE'] = obtener_pagare(None if i_obligacion is None else valores[i_obligacion])
+            return fila
+
+        return por_fila
+
+
+class FlujoResumen(NamedTuple):
+    """Fila del listado de flujos pendientes (ListarFlujosPendientes)."""
+    CEDULA: object
+    NOMBRE: object
+    MAIL: object
+    OBLIGACION: object
+    PAGARE: object
+
+    @classmethod
+    def desde_flujo(cls, flow, pagare):
+        return cls(flow.get("CEDULA"), flow.get("NOMBRE"), flow.get("MAIL"), flow.get("OBLIGACION"), pagare)
+
+
+def resumen_listado(flujos):
+    """
+    FlujoResumen de cada flujo del listado (con el PAGARE que le agregó LecturaListado).
+    En los Flujo los 5 campos se leen con un attrgetter por forma de cursor en vez de
+    cinco get(); los dict y los Flujo con campos sin asignar o Diferido usan get().
+    """
+    campos = FlujoResumen._fields
+    resumen = []
+    tipo = leer = None
+    for flow in flujos:
+        if type(flow) is not tipo:
+            tipo, leer = type(flow), None
+            if issubclass(tipo, Flujo) and all(campo in tipo._atributos for campo in campos):
+                leer = attrgetter(*(tipo._atributos[campo] for campo in campos))
+        if leer is not None:
+            valores = leer(flow)
+            if not any(valor is _SIN_ASIGNAR or type(valor) is Diferido for valor in valores):
+                resumen.append(FlujoResumen._make(valores))
+                continue
+        resumen.append(FlujoResumen._make(flow.get(campo) for campo in campos))
+    return resumen
+
+
+def resumen_json(summary_list):
+    """Lista de FlujoResumen como lista de objetos JSON (el NamedTuple se serializaría como lista)."""
+    return [resumen._asdict() for resumen in summary_list]
@@ -0,0 +1,102 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncRequestFactory, RequestFactory
+
+from API import asociados, views, views_async
+
+FILA_ASOCIADO = {"CEDULA": "1000000", "NOMBRE": "ASOCIADO DE PRUEBA", "ESTADO": "ACTIVO"}
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga sin Oracle: compara cuántas peticiones de validar-asociado "
+        "atienden N workers sync frente a un worker ASGI, con un SP_CONSULTACAPA "
+        "simulado que tarda --latencia-ms. Las peticiones saltan la caché de asociados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=60)
+        parser.add_argument('--latencia-ms', type=int, default=500)
+        parser.add_argument('--workers-sync', type=int, default=3,
+                            help="Workers sync de gunicorn (cada uno atiende una petición a la vez).")
+        parser.add_argument('--pool-async', type=int, default=10,
+                            help="Máximo del pool async (llamadas Oracle simultáneas).")
+
+    def _sync(self, peticiones, latencia_s, workers):
+        en_curso = {"actual": 0, "max": 0}
+
+        def sp_lento(nombre, parametros, max_filas=None, particion=None):
+            en_curso["actual"] += 1
+            en_curso["max"] = max(en_curso["max"], en_curso["actual"])
+            time.sleep(latencia_s)
+            en_curso["actual"] -= 1
+            return [dict(FILA_ASOCIADO)]
+
+        factory = RequestFactory()
+        vista = views.ValidarAsociado.as_view()
+
+        def peticion(i):
+            return vista(
+                factory.get(f'/api/validar-asociado/{i}/', headers={'Cache-Control': 'no-cache'}), identificacion=str(i)
+            ).status_code
+
+        with mock.patch.object(asociados, 'ejecutar_procedimiento', sp_lento):
+            inicio = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as ejecutor:
+                codigos = list(ejecutor.map(peticion, range(peticiones)))
+            return time.perf_counter() - inicio, codigos, en_curso["max"]
+
+    def _async(self, peticiones, latencia_s, pool_max):
+        en_curso = {"actual": 0, "max": 0}
+
+        async def main():
+            #? El semáforo hace de pool async: como máximo pool_max llamadas simultáneas
+            pool = asyncio.Semaphore(pool_max)
+
+            async def sp_lento(nombre, parametros, max_filas=None, particion=None):
+                async with pool:
+                    en_curso["actual"] += 1
+                    en_curso["max"] = max(en_curso["max"], en_curso["actual"])
+                    await asyncio.sleep(latencia_s)
+                    en_curso["actual"] -= 1
+                return [dict(FILA_ASOCIADO)]
+
+            factory = AsyncRequestFactory()
+            vista = views_async.ValidarAsociadoAsync.as_view()
+            with mock.patch.object(views_async, 'ejecutar_procedimiento_async', sp_lento):
+                inicio = time.perf_counter()
+                respuestas = await asyncio.gather(*(
+                    vista(
+                        factory.get(f'/api/async/validar-asociado/{i}/', headers={'Cache-Control': 'no-cache'}),
+                        identificacion=str(i),
+                    )
+                    for i in range(peticiones)
+                ))
+                return time.perf_counter() - inicio, [r.status_code for r in respuestas]
+
+        duracion, codigos = asyncio.run(main())
+        return duracion, codigos, en_curso["max"]
+
+    def _reporte(self, etiqueta, duracion, codigos, max_en_curso):
+        ok = sum(1 for c in codigos if c == 200)
+        self.stdout.write(
+            f"{etiqueta:<28} {duracion:7.2f} s | {len(codigos) / duracion:7.1f} req/s | "
+            f"llamadas Oracle simultáneas (máx) {max_en_curso:3d} | 200 OK {ok}/{len(codigos)}"
+        )
+
+    def handle(self, *args, **options):
+        peticiones = options['peticiones']
+        latencia_s = options['latencia_ms'] / 1000.0
+        self.stdout.write(f"{peticiones} peticiones, SP simulado de {options['latencia_ms']} ms")
+        self._reporte(
+            f"sync ({options['workers_sync']} workers)",
+            *self._sync(peticiones, latencia_s, options['workers_sync']),
+        )
+        self._reporte(
+            f"async (pool max {options['pool_async']})",
+            *self._async(peticiones, latencia_s, options['pool_async']),
+        )
@@ -0,0 +1,131 @@
+import sys
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from API.flujos import FlujoResumen, tipo_flujo
+from API.management.commands.bench_plan_pagos import fila_sintetica
+from API.oracle_exec import _fabrica_dict
+from API.views import _LECTURA_LISTADO, _obtener_pagare, _resumen_flujos
+
+
+def filas_listado(total, cuotas):
+    """Tuplas de un SP_PLANPAGOS1 sintético: una obligación por fila, cada una con sus propios textos."""
+    base = fila_sintetica(cuotas)
+    columnas = tuple(base)
+    filas = []
+    for i in range(total):
+        fila = dict(base, CEDULA=str(10000000 + i), OBLIGACION=f"10-{100000 + i}", MAIL=f"asociado{i}@example.com")
+        #? Copia de cada texto: en un fetch real ninguna fila comparte sus strings
+        filas.append(tuple(None if v is None else ''.join(list(str(v))) for v in fila.values()))
+    return columnas, filas
+
+
+def procesar_listado(filas):
+    """Normalización del listado como recorrido aparte tras el fetch (sin LecturaListado)."""
+    for fila in filas:
+        for campo, valor in fila.items():
+            if valor is None:
+                fila[campo] = ''
+        if not fila.get('MAIL'):
+            fila['MAIL'] = 'no-email@example.com'
+        fila['PAGARE'] = _obtener_pagare(fila.get('OBLIGACION'))
+    return filas
+
+
+def _medir(funcion):
+    """(resultado, bytes retenidos) de funcion()."""
+    tracemalloc.start()
+    try:
+        inicio = tracemalloc.get_traced_memory()[0]
+        resultado = funcion()
+        retenido = tracemalloc.get_traced_memory()[0] - inicio
+    finally:
+        tracemalloc.stop()
+    return resultado, retenido
+
+
+def _cronometrar(funcion, repeticiones):
+    """Mejor ms de funcion() (sin tracemalloc, que encarece cada asignación)."""
+    mejor = None
+    for _ in range(repeticiones):
+        t0 = time.perf_counter()
+        funcion()
+        duracion = (time.perf_counter() - t0) * 1000
+        mejor = duracion if mejor is None else min(mejor, duracion)
+    return mejor
+
+
+def _resumen_dicts(filas):
+    """Resumen anterior: un dict de 5 claves por flujo pendiente."""
+    return [
+        {"CEDULA": f.get("CEDULA"), "NOMBRE": f.get("NOMBRE"), "MAIL": f.get("MAIL"),
+         "OBLIGACION": f.get("OBLIGACION"), "PAGARE": f.get("PAGARE")}
+        for f in filas
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Memoria retenida y tiempo de un listado SP_PLANPAGOS1 grande: filas como dict "
+        "(row_factory='dict') contra Flujo (row_factory='flujo', API/flujos.py), y el resumen "
+        "como dicts contra FlujoResumen."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=5000)
+        parser.add_argument('--cuotas', type=int, default=12,
+                            help="Cuotas por fila (largo de las columnas del plan).")
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        columnas, filas = filas_listado(options['filas'], options['cuotas'])
+        repeticiones = options['repeticiones']
+        datos = sum(sys.getsizeof(v) for f in filas for v in f if v is not None)
+        self.stdout.write(
+            f"{len(filas)} filas x {len(columnas)} columnas | textos de las filas: {datos / 1024:.0f} KiB (no se cuentan)"
+        )
+        self.stdout.write(
+            f"{'':>18} | {'dict KiB':>9} | {'Flujo KiB':>9} | {'ahorro':>6} | {'dict ms':>8} | {'Flujo ms':>8} | {'x':>5}"
+        )
+
+        fabricas = {'dict': _fabrica_dict(list(columnas)), 'flujo': tipo_flujo(columnas)}
+        resumenes = {'dict': _resumen_dicts, 'flujo': _resumen_flujos}
+        etapas = {'filas': {}, 'procesadas': {}, 'lectura': {}, 'resumen': {}}
+        listados = {}
+        for nombre, fabrica in fabricas.items():
+            armar = lambda: [fabrica(*f) for f in filas]  # noqa: E731
+            por_fila = _LECTURA_LISTADO(columnas, fabrica)
+            leer = lambda: [f for f in map(por_fila, filas) if f is not None]  # noqa: E731
+            #? Igual que el fetch: una llamada a la rowfactory por fila
+            filas_armadas, memoria_filas = _medir(armar)
+            #? Recorrido aparte tras el fetch (antes de LecturaListado): PAGARE y MAIL por defecto
+            _, memoria_procesar = _medir(lambda: procesar_listado(filas_armadas))
+            #? Camino actual: LecturaListado normaliza y agrega PAGARE en el fetch
+            listados[nombre], memoria_lectura = _medir(leer)
+            resumen, memoria_resumen = _medir(lambda: resumenes[nombre](listados[nombre]))
+
+            ms_filas = _cronometrar(armar, repeticiones)
+            ms_procesar = _cronometrar(lambda: procesar_listado(armar()), repeticiones)
+            ms_lectura = _cronometrar(leer, repeticiones)
+            ms_resumen = _cronometrar(lambda: resumenes[nombre](listados[nombre]), repeticiones)
+            etapas['filas'][nombre] = (memoria_filas, ms_filas)
+            etapas['procesadas'][nombre] = (memoria_filas + memoria_procesar, ms_procesar)
+            etapas['lectura'][nombre] = (memoria_lectura, ms_lectura)
+            etapas['resumen'][nombre] = (memoria_resumen, ms_resumen)
+            if nombre == 'flujo':
+                assert all(isinstance(r, FlujoResumen) for r in resumen)
+        assert [f.a_dict() for f in listados['flujo']] == listados['dict'], "Flujo no coincide con el dict"
+
+        for etapa, medidas in etapas.items():
+            (memoria_dict, ms_dict), (memoria_flujo, ms_flujo) = medidas['dict'], medidas['flujo']
+            self.stdout.write(
+                f"{etapa:>18} | {memoria_dict / 1024:>9.0f} | {memoria_flujo / 1024:>9.0f} | "
+                f"{1 - memoria_flujo / memoria_dict:>6.0%} | {ms_dict:>8.1f} | {ms_flujo:>8.1f} | "
+                f"{ms_flujo / ms_dict:>5.2f}"
+            )
+        self.stdout.write(
+            f"por fila leída: dict {etapas['lectura']['dict'][0] / len(filas):.0f} B, "
+            f"Flujo {etapas['lectura']['flujo'][0] / len(filas):.0f} B"
+        )
@@ -0,0 +1,109 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from API.flujos import MAIL_POR_DEFECTO
+from API.management.commands.bench_flujos import filas_listado, procesar_listado
+from API.oracle_exec import configuracion_procedimiento, leer_cursor
+from API.views import _LECTURA_LISTADO, _resumen_flujos
+
+
+class CursorSintetico:
+    """REF CURSOR en memoria: entrega las tuplas en lotes de arraysize, como el cursor real."""
+
+    def __init__(self, columnas, filas, arraysize):
+        self.description = [(columna,) for columna in columnas]
+        self.arraysize = arraysize
+        self.rowfactory = None
+        self._filas = filas
+        self._posicion = 0
+
+    def fetchmany(self, num_filas=None):
+        num_filas = num_filas or self.arraysize
+        lote = self._filas[self._posicion:self._posicion + num_filas]
+        self._posicion += len(lote)
+        return lote if self.rowfactory is None else [self.rowfactory(*fila) for fila in lote]
+
+    def fetchall(self):
+        filas = []
+        while lote := self.fetchmany():
+            filas.extend(lote)
+        return filas
+
+    def __iter__(self):
+        while lote := self.fetchmany():
+            yield from lote
+
+
+def filas_con_descartes(total, cuotas, descartadas):
+    """Listado sintético donde una fracción 'descartadas' de las filas no tiene MAIL o CEDULA."""
+    columnas, filas = filas_listado(total, cuotas)
+    i_mail, i_cedula = columnas.index('MAIL'), columnas.index('CEDULA')
+    cada = round(1 / descartadas) if descartadas else 0
+    for i in range(0, total, cada) if cada else ():
+        fila = list(filas[i])
+        #? Alterna los dos motivos de descarte
+        fila[i_mail if (i // cada) % 2 else i_cedula] = None
+        filas[i] = tuple(fila)
+    return columnas, filas
+
+
+class Command(BaseCommand):
+    help = (
+        "Listado SP_PLANPAGOS1 sintético: fetchall + normalizar + filtrar en recorridos separados "
+        "contra LecturaListado (normaliza y filtra durante el fetch). Reporta tiempo y pico de memoria."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=20000)
+        parser.add_argument('--cuotas', type=int, default=12)
+        parser.add_argument('--descartadas', type=float, default=0.3,
+                            help="Fracción de filas sin MAIL o sin CEDULA.")
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def _medir(self, funcion, columnas, filas, repeticiones):
+        """(resumen, mejor ms, pico KiB) de funcion(cursor) sobre cursores nuevos."""
+        conf = configuracion_procedimiento('SP_PLANPAGOS1')
+        mejor = None
+        for _ in range(repeticiones):
+            cursor = CursorSintetico(columnas, filas, conf['arraysize'])
+            inicio = time.perf_counter()
+            resumen = funcion(cursor, conf)
+            duracion = (time.perf_counter() - inicio) * 1000
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        tracemalloc.start()
+        try:
+            funcion(CursorSintetico(columnas, filas, conf['arraysize']), conf)
+            pico = tracemalloc.get_traced_memory()[1] / 1024
+        finally:
+            tracemalloc.stop()
+        return resumen, mejor, pico
+
+    def handle(self, *args, **options):
+        columnas, filas = filas_con_descartes(options['filas'], options['cuotas'], options['descartadas'])
+
+        def separado(cursor, conf):
+            #? Antes: fetchall arma todas las filas, luego se normalizan y se filtran aparte
+            listado = procesar_listado(leer_cursor(cursor, conf))
+            validas = [
+                flow for flow in listado
+                if flow.get("MAIL") and flow.get("MAIL") != MAIL_POR_DEFECTO and str(flow.get("CEDULA", "")).strip()
+            ]
+            return _resumen_flujos(validas)
+
+        def en_el_fetch(cursor, conf):
+            return _resumen_flujos(leer_cursor(cursor, conf, lectura=_LECTURA_LISTADO))
+
+        antes, ms_antes, pico_antes = self._medir(separado, columnas, filas, options['repeticiones'])
+        ahora, ms_ahora, pico_ahora = self._medir(en_el_fetch, columnas, filas, options['repeticiones'])
+        assert antes == ahora, "El listado filtrado durante el fetch no coincide"
+
+        self.stdout.write(
+            f"{len(filas)} filas, {len(filas) - len(ahora)} descartadas ({options['descartadas']:.0%} pedido), "
+            f"{options['cuotas']} cuotas"
+        )
+        self.stdout.write(f"{'':>22} | {'ms':>8} | {'pico KiB':>9}")
+        self.stdout.write(f"{'recorridos separados':>22} | {ms_antes:>8.1f} | {pico_antes:>9.0f}")
+        self.stdout.write(f"{'en el fetch':>22} | {ms_ahora:>8.1f} | {pico_ahora:>9.0f}")
+        self.stdout.write(f"mejora: {ms_antes / ms_ahora:.2f}x en tiempo, {1 - pico_ahora / pico_antes:.0%} menos memoria pico")
@@ -0,0 +1,67 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from API.oracle_exec import configuracion_procedimiento, ejecutar_en_conexion
+from API.oracle_pool import acquire_connection
+
+SQL_ROUNDTRIPS = """
+    SELECT m.value
+      FROM v$mystat m
+      JOIN v$statname n ON n.statistic# = m.statistic#
+     WHERE n.name = 'SQL*Net roundtrips to/from client'
+"""
+
+COLUMNAS_PLAN = ['NO', 'FECHA', 'ABONO_CAPITAL', 'ABONO_INTERES', 'SEGURO_VIDA',
+                 'OTROS_CONCEPTOS', 'CAPITALIZACION', 'VALOR_CUOTA', 'SALDO_PARCIAL']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara latencia e idas y vueltas de un SP_PLANPAGOS* trayendo las columnas "
+        "del plan como LOB (lectura perezosa) o en línea como str (lobs_inline). "
+        "Requiere Oracle y permiso de lectura sobre v$mystat/v$statname."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('pagare', help="Pagaré con un plan largo (120-360 cuotas).")
+        parser.add_argument('--procedimiento', default='SP_PLANPAGOS')
+        parser.add_argument('--repeticiones', type=int, default=20)
+
+    def _roundtrips(self, conn):
+        with conn.cursor() as cursor:
+            cursor.execute(SQL_ROUNDTRIPS)
+            return cursor.fetchone()[0]
+
+    def _medir(self, conn, procedimiento, pagare, lobs_inline, repeticiones):
+        conf = dict(configuracion_procedimiento(procedimiento), lobs_inline=lobs_inline)
+        tiempos = []
+        idas = []
+        for _ in range(repeticiones):
+            antes = self._roundtrips(conn)
+            inicio = time.perf_counter()
+            filas = ejecutar_en_conexion(conn, procedimiento, [pagare], conf=conf)
+            #? Igual que las vistas: str() sobre cada columna del plan (lee el LOB si lo es)
+            for fila in filas:
+                for col in COLUMNAS_PLAN:
+                    str(fila.get(col, ''))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+            #? -1 por la ida y vuelta de la propia consulta a v$mystat
+            idas.append(self._roundtrips(conn) - antes - 1)
+        return tiempos, idas
+
+    def handle(self, *args, **options):
+        procedimiento = options['procedimiento']
+        pagare = options['pagare']
+        repeticiones = options['repeticiones']
+        with acquire_connection() as conn:
+            #? Calentamiento: parseo del SP y caché de sentencias
+            ejecutar_en_conexion(conn, procedimiento, [pagare])
+            for etiqueta, inline in (("LOB", False), ("inline", True)):
+                tiempos, idas = self._medir(conn, procedimiento, pagare, inline, repeticiones)
+                self.stdout.write(
+                    f"{etiqueta:>7}: media {statistics.mean(tiempos):8.2f} ms | "
+                    f"p95 {sorted(tiempos)[int(0.95 * (len(tiempos) - 1))]:8.2f} ms | "
+                    f"idas y vueltas/llamada {statistics.mean(idas):6.1f}"
+                )
@@ -0,0 +1,127 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+
+from API.oracle_exec import (
+    configuracion_procedimiento,
+    ejecutar_en_conexion,
+    ejecutar_lote_en_conexion,
+)
+
+COLUMNAS = ['CEDULA', 'NOMBRE', 'MAIL', 'OBLIGACION', 'NO', 'FECHA', 'VALOR_CUOTA', 'SALDO_PARCIAL']
+
+
+class _CursorSimulado:
+    """Cursor mínimo: cada execute/callproc cuesta una ida y vuelta simulada."""
+
+    def __init__(self, conexion):
+        self._conexion = conexion
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.outputtypehandler = None
+        self.rowfactory = None
+        self.description = None
+        self._filas = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        pass
+
+    def _abrir(self, pagare):
+        self.description = [(c,) for c in COLUMNAS]
+        self._filas = [tuple(f"{c}-{pagare}" for c in COLUMNAS)]
+
+    def callproc(self, nombre, parametros):
+        self._conexion.ida_y_vuelta()
+        parametros[-1]._abrir(parametros[0])
+
+    def execute(self, sql, binds):
+        self._conexion.ida_y_vuelta()
+        self._implicitos = []
+        for i in range(len(binds)):
+            cursor = _CursorSimulado(self._conexion)
+            cursor._abrir(binds[f"p{i}_0"])
+            self._implicitos.append(cursor)
+
+    def getimplicitresults(self):
+        return self._implicitos
+
+    def fetchall(self):
+        #? El fetch de un cursor pequeño llega con la respuesta (prefetch): sin ida y vuelta extra
+        if self.rowfactory:
+            return [self.rowfactory(*fila) for fila in self._filas]
+        return list(self._filas)
+
+    def fetchmany(self, n):
+        return self.fetchall()[:n]
+
+
+class _ConexionSimulada:
+    def __init__(self, latencia_s):
+        self.latencia_s = latencia_s
+        self.call_timeout = 0
+        self.outputtypehandler = None
+        self.idas_y_vueltas = 0
+
+    def ida_y_vuelta(self):
+        self.idas_y_vueltas += 1
+        time.sleep(self.latencia_s)
+
+    def cursor(self):
+        return _CursorSimulado(self)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara N llamadas a SP_PLANPAGOS (una ida y vuelta cada una) contra una sola "
+        "llamada en lote (bloque PL/SQL con resultados implícitos) sobre una conexión "
+        "simulada con --latencia-ms por ida y vuelta y --checkout-ms por conexión del pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pagares', type=int, default=50)
+        parser.add_argument('--latencia-ms', type=float, default=5.0)
+        parser.add_argument('--checkout-ms', type=float, default=0.5,
+                            help="Costo simulado de tomar y devolver una conexión del pool.")
+        parser.add_argument('--repeticiones', type=int, default=5)
+
+    def handle(self, *args, **options):
+        pagares = [str(100000 + i) for i in range(options['pagares'])]
+        latencia_s = options['latencia_ms'] / 1000.0
+        checkout_s = options['checkout_ms'] / 1000.0
+        conf = configuracion_procedimiento('SP_PLANPAGOS')
+
+        def individuales():
+            conn = _ConexionSimulada(latencia_s)
+            for pagare in pagares:
+                #? Cada generar-pdf toma su propia conexión del pool
+                time.sleep(checkout_s)
+                ejecutar_en_conexion(conn, 'SP_PLANPAGOS', [pagare], conf=conf)
+            return conn.idas_y_vueltas
+
+        def lote():
+            conn = _ConexionSimulada(latencia_s)
+            time.sleep(checkout_s)
+            resultados = ejecutar_lote_en_conexion(conn, 'SP_PLANPAGOS', [[p] for p in pagares], conf=conf)
+            assert [r[0]['CEDULA'] for r in resultados] == [f"CEDULA-{p}" for p in pagares]
+            return conn.idas_y_vueltas
+
+        self.stdout.write(
+            f"{len(pagares)} pagarés | ida y vuelta {options['latencia_ms']} ms | checkout {options['checkout_ms']} ms"
+        )
+        for etiqueta, funcion in (("individual", individuales), ("lote", lote)):
+            tiempos = []
+            for _ in range(options['repeticiones']):
+                inicio = time.perf_counter()
+                idas = funcion()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            self.stdout.write(
+                f"{etiqueta:>10}: media {statistics.mean(tiempos):9.2f} ms | "
+                f"mín {min(tiempos):9.2f} ms | idas y vueltas {idas}"
+            )
@@ -0,0 +1,191 @@
+import copy
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from API.flujos import tipo_flujo
+from API.numeros import parse_numero
+from API.plan_pagos import COLUMNAS_PLAN, COLUMNAS_NUMERICAS, armar_plan_pago, procesar_flujos
+
+
+def _plan_pago_referencia(row):
+    """Implementación anterior (la que estaba copiada en cada views.py), para comparar."""
+    plan_pago = []
+    nos = str(row.get('NO', '')).split(';')
+    fechas = str(row.get('FECHA', '')).split(';')
+    abonos_capital = str(row.get('ABONO_CAPITAL', '')).split(';')
+    abonos_interes = str(row.get('ABONO_INTERES', '')).split(';')
+    seguro_vida = str(row.get('SEGURO_VIDA', '')).split(';')
+    otros_conceptos = str(row.get('OTROS_CONCEPTOS', '')).split(';')
+    capitalizaciones = str(row.get('CAPITALIZACION', '')).split(';')
+    valores_cuota = str(row.get('VALOR_CUOTA', '')).split(';')
+    saldos_parcial = str(row.get('SALDO_PARCIAL', '')).split(';')
+
+    num_cuotas = len(nos)
+    for i in range(num_cuotas):
+        plan_pago.append({
+            'NO': (nos[i] if i < len(nos) else '').strip(),
+            'FECHA': (fechas[i] if i < len(fechas) else '').strip(),
+            'ABONO_CAPITAL': (abonos_capital[i] if i < len(abonos_capital) else '').strip(),
+            'ABONO_INTERES': (abonos_interes[i] if i < len(abonos_interes) else '').strip(),
+            'SEGURO_VIDA': (seguro_vida[i] if i < len(seguro_vida) else '').strip(),
+            'OTROS_CONCEPTOS': (otros_conceptos[i] if i < len(otros_conceptos) else '').strip(),
+            'CAPITALIZACION': (capitalizaciones[i] if i < len(capitalizaciones) else '').strip(),
+            'VALOR_CUOTA': (valores_cuota[i] if i < len(valores_cuota) else '').strip(),
+            'SALDO_PARCIAL': (saldos_parcial[i] if i < len(saldos_parcial) else '').strip(),
+        })
+    return plan_pago
+
+
+def _plan_pago_dicts(row):
+    """Lista de dicts por cuota (representación anterior a PlanPago), para comparar."""
+    columnas = [str(row.get(columna, '')).split(';') for columna in COLUMNAS_PLAN]
+    num_cuotas = len(columnas[0])
+    for valores in columnas[1:]:
+        if len(valores) < num_cuotas:
+            valores.extend([''] * (num_cuotas - len(valores)))
+    return [
+        {
+            'NO': no.strip(), 'FECHA': fecha.strip(), 'ABONO_CAPITAL': capital.strip(),
+            'ABONO_INTERES': interes.strip(), 'SEGURO_VIDA': seguro.strip(),
+            'OTROS_CONCEPTOS': otros.strip(), 'CAPITALIZACION': capitalizacion.strip(),
+            'VALOR_CUOTA': cuota.strip(), 'SALDO_PARCIAL': saldo.strip(),
+        }
+        for no, fecha, capital, interes, seguro, otros, capitalizacion, cuota, saldo in zip(*columnas)
+    ]
+
+
+def _formatear(valor):
+    return f"{int(parse_numero(valor)):,}".replace(",", ".")
+
+
+def _tabla_dicts(plan):
+    """Filas y totales de la tabla del PDF como los armaba _draw_payment_table con la lista de dicts."""
+    tabla = [[str(row.get('NO', '')), str(row.get('FECHA', ''))] +
+             [_formatear(row.get(col, '')) for col in COLUMNAS_NUMERICAS] for row in plan]
+    tabla.append([_formatear(sum(parse_numero(row.get(col, 0)) for row in plan if row.get(col) not in (None, '')))
+                  for col in COLUMNAS_NUMERICAS])
+    return tabla
+
+
+def _tabla_columnas(plan):
+    """Lo mismo con PlanPago: filas como tuplas y totales por columna."""
+    tabla = [[no, fecha, *map(_formatear, valores)] for no, fecha, *valores in plan.filas()]
+    tabla.append([_formatear(total) for total in plan.totales().values()])
+    return tabla
+
+
+def _memoria(funcion, filas):
+    """Bytes retenidos por los planes de 'filas' (tracemalloc, sin contar las filas de entrada)."""
+    tracemalloc.start()
+    try:
+        inicio = tracemalloc.get_traced_memory()[0]
+        planes = [funcion(fila) for fila in filas]
+        retenido = tracemalloc.get_traced_memory()[0] - inicio
+    finally:
+        tracemalloc.stop()
+    del planes
+    return retenido
+
+
+def fila_sintetica(cuotas):
+    """Fila de detalle con el formato de SP_PLANPAGOS: un valor por cuota separado por ';'."""
+    saldo = 150000 * cuotas
+    return {
+        'CEDULA': '1000000', 'NOMBRE': 'ASOCIADO DE PRUEBA', 'MAIL': 'asociado@example.com',
+        'OBLIGACION': '10-123456', 'MONTOCREDITO': str(saldo), 'FECHAULTIMA': None,
+        'NO': ';'.join(str(i) for i in range(1, cuotas + 1)),
+        'FECHA': ';'.join(f"15/{i % 12 + 1:02d}/{2025 + i // 12}" for i in range(cuotas)),
+        'ABONO_CAPITAL': ';'.join('150.000,00' for _ in range(cuotas)),
+        #? Algunas columnas vienen con espacios alrededor del separador
+        'ABONO_INTERES': '; '.join(f"{(cuotas - i) * 1500:,}" for i in range(cuotas)),
+        'SEGURO_VIDA': ';'.join('1.200' for _ in range(cuotas)),
+        'OTROS_CONCEPTOS': ';'.join('0' for _ in range(cuotas)),
+        'CAPITALIZACION': ';'.join('0' for _ in range(cuotas)),
+        'VALOR_CUOTA': ';'.join('159.200,60' for _ in range(cuotas)),
+        #? ... y otras traen menos valores que cuotas
+        'SALDO_PARCIAL': ';'.join(str(saldo - i * 150000) for i in range(cuotas - 1)),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Microbenchmark del plan de pagos (API/plan_pagos.py) para planes de 12 a 360 cuotas: "
+        "parser contra la implementación anterior y PlanPago (columnas) contra la lista de "
+        "dicts por cuota en memoria retenida y en armar la tabla del PDF (formato + totales)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cuotas', type=int, nargs='+', default=[12, 36, 60, 120, 240, 360])
+        parser.add_argument('--iteraciones', type=int, default=500)
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--planes', type=int, default=200,
+                            help="Planes retenidos a la vez para medir memoria.")
+
+    def _medir(self, funcion, fila, iteraciones, repeticiones):
+        """Mejor tiempo por llamada (µs) de 'repeticiones' corridas de 'iteraciones' llamadas."""
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _ in range(iteraciones):
+                funcion(fila)
+            duracion = (time.perf_counter() - inicio) / iteraciones * 1e6
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        return mejor
+
+    def handle(self, *args, **options):
+        iteraciones, repeticiones = options['iteraciones'], options['repeticiones']
+        self.stdout.write(
+            f"{'cuotas':>6} | {'anterior µs':>12} | {'actual µs':>10} | {'mejora':>7} | "
+            f"{'procesar dict µs':>16} | {'procesar Flujo µs':>17} | + leer PLAN_PAGO µs"
+        )
+        for cuotas in options['cuotas']:
+            fila = fila_sintetica(cuotas)
+            assert list(armar_plan_pago(fila)) == _plan_pago_referencia(fila), "El parser no coincide con la referencia"
+            anterior = self._medir(_plan_pago_referencia, fila, iteraciones, repeticiones)
+            actual = self._medir(armar_plan_pago, fila, iteraciones, repeticiones)
+            #? La fila completa incluye normalizar None, FECHAULTIMA y VALORCUOTA (se copia: se modifica)
+            filas = [copy.deepcopy(fila) for _ in range(iteraciones)]
+            inicio = time.perf_counter()
+            for f in filas:
+                procesar_flujos([f])
+            completo = (time.perf_counter() - inicio) / len(filas) * 1e6
+            #? Con Flujo (row_factory='flujo') el plan se arma recién al leerlo
+            clase = tipo_flujo(tuple(fila))
+            flujos = [clase(*fila.values()) for _ in range(iteraciones)]
+            inicio = time.perf_counter()
+            for f in flujos:
+                procesar_flujos([f])
+            diferido = (time.perf_counter() - inicio) / len(flujos) * 1e6
+            inicio = time.perf_counter()
+            for f in flujos:
+                f['PLAN_PAGO'], f['FECHAULTIMA'], f['VALORCUOTA']
+            lectura = (time.perf_counter() - inicio) / len(flujos) * 1e6
+            assert flujos[0].a_dict() == filas[0], "El Flujo procesado no coincide con el dict"
+            self.stdout.write(
+                f"{cuotas:>6} | {anterior:>12.1f} | {actual:>10.1f} | {anterior / actual:>6.2f}x | "
+                f"{completo:>16.1f} | {diferido:>17.1f} | {lectura:.1f}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'cuotas':>6} | {'dicts KiB':>10} | {'columnas KiB':>12} | {'ahorro':>6} | "
+            f"{'tabla dicts µs':>14} | {'tabla columnas µs':>17} | mejora"
+        )
+        for cuotas in options['cuotas']:
+            fila = fila_sintetica(cuotas)
+            dicts, columnas = _plan_pago_dicts(fila), armar_plan_pago(fila)
+            assert list(columnas) == dicts, "PlanPago no coincide con la lista de dicts"
+            assert _tabla_columnas(columnas) == _tabla_dicts(dicts), "La tabla del PDF no coincide"
+            filas = [fila] * options['planes']
+            memoria_dicts = _memoria(_plan_pago_dicts, filas) / options['planes'] / 1024
+            memoria_columnas = _memoria(armar_plan_pago, filas) / options['planes'] / 1024
+            #? La tabla se mide con planes nuevos en cada llamada: los totales de PlanPago se cachean
+            tabla_dicts = self._medir(lambda f: _tabla_dicts(_plan_pago_dicts(f)), fila, iteraciones, repeticiones)
+            tabla_columnas = self._medir(lambda f: _tabla_columnas(armar_plan_pago(f)), fila, iteraciones, repeticiones)
+            self.stdout.write(
+                f"{cuotas:>6} | {memoria_dicts:>10.1f} | {memoria_columnas:>12.1f} | "
+                f"{1 - memoria_columnas / memoria_dicts:>6.0%} | {tabla_dicts:>14.1f} | {tabla_columnas:>17.1f} | "
+                f"{tabla_dicts / tabla_columnas:.2f}x"
+            )
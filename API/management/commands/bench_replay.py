@@ -0,0 +1,87 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from API import oracle_pool
+from API.metrics import VentanaLatencias
+from API.oracle_exec import estadisticas_procedimientos
+from API.oracle_replay import directorio_fixtures
+from API.views import GenerarPDF, _filtrar_flujos, _obtener_datos_basicos, _obtener_pagare, _resumen_flujos
+
+
+class Command(BaseCommand):
+    help = (
+        "Prueba de carga sin Oracle con los fixtures de grabar_fixtures (ORACLE_MODO=replay): "
+        "listado SP_PLANPAGOS1 y luego, con --hilos concurrentes, detalle SP_PLANPAGOS + "
+        "render del PDF de --peticiones obligaciones. No usa Postgres (ni historial ni caché negativa)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=50)
+        parser.add_argument('--hilos', type=int, default=3,
+                            help="Peticiones simultáneas (ej. hilos de gunicorn por worker).")
+        parser.add_argument('--latencia-ms', type=float, default=5.0,
+                            help="Latencia simulada por ida y vuelta a Oracle.")
+        parser.add_argument('--jitter-ms', type=float, default=2.0)
+        parser.add_argument('--sin-render', action='store_true',
+                            help="Mide solo Oracle + procesamiento de filas.")
+
+    def handle(self, *args, **options):
+        if not directorio_fixtures().exists():
+            raise CommandError(f"No hay fixtures en {directorio_fixtures()} (ver grabar_fixtures).")
+        #? El comando corre en su propio proceso: los ajustes solo cambian para él
+        settings.ORACLE_MODO = 'replay'
+        settings.ORACLE_REPLAY_LATENCIA_MS = options['latencia_ms']
+        settings.ORACLE_REPLAY_JITTER_MS = options['jitter_ms']
+        settings.NEGATIVO_CACHE = False
+        settings.PREFETCH_DETALLES = False
+        oracle_pool.cerrar_pool(espera_s=0)
+
+        inicio = time.perf_counter()
+        resumen = _resumen_flujos(_obtener_datos_basicos())
+        listado_ms = (time.perf_counter() - inicio) * 1000
+        if not resumen:
+            raise CommandError("El fixture del listado no tiene flujos con MAIL y CEDULA.")
+        obligaciones = [resumen[i % len(resumen)].OBLIGACION for i in range(options['peticiones'])]
+
+        detalle = VentanaLatencias()
+        render = VentanaLatencias()
+        total = VentanaLatencias()
+        generador = GenerarPDF()
+
+        def peticion(obligacion):
+            t0 = time.perf_counter()
+            flujos = _filtrar_flujos(pagare=_obtener_pagare(obligacion) or None)
+            t1 = time.perf_counter()
+            detalle.registrar((t1 - t0) * 1000)
+            tamano = 0
+            if flujos and not options['sin_render']:
+                tamano = len(generador._renderizar_pdf(flujos[0])[1])
+                render.registrar((time.perf_counter() - t1) * 1000)
+            total.registrar((time.perf_counter() - t0) * 1000)
+            return tamano
+
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['hilos']) as ejecutor:
+            tamanos = list(ejecutor.map(peticion, obligaciones))
+        duracion = time.perf_counter() - inicio
+
+        self.stdout.write(
+            f"{len(obligaciones)} obligaciones ({len(resumen)} distintas en el listado) | {options['hilos']} hilos | "
+            f"ida y vuelta {options['latencia_ms']} ± {options['jitter_ms']} ms"
+        )
+        self.stdout.write(f"listado: {listado_ms:.1f} ms | {len(obligaciones) / duracion:.1f} PDF/s en {duracion:.2f} s")
+        for etiqueta, ventana in (("detalle", detalle), ("render", render), ("total", total)):
+            r = ventana.resumen()
+            if r["muestras"]:
+                self.stdout.write(f"{etiqueta:>8}: p50 {r['p50']:8.2f} ms | p95 {r['p95']:8.2f} ms | max {r['max']:8.2f} ms")
+        if any(tamanos):
+            self.stdout.write(f"PDF medio: {sum(tamanos) / len([t for t in tamanos if t]) / 1024:.1f} KiB")
+        self.stdout.write(f"pool: {oracle_pool.estadisticas_pool()['latencia_acquire_ms']}")
+        for nombre, metricas in estadisticas_procedimientos().items():
+            etapas = " | ".join(
+                f"{etapa} {metricas[etapa]['p50']}" for etapa in ('espera_pool_ms', 'ejecucion_ms', 'fetch_ms', 'bytes')
+            )
+            self.stdout.write(f"{nombre} (p50): {etapas}")
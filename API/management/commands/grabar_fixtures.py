@@ -0,0 +1,65 @@
+import shutil
+from datetime import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from API.oracle_exec import ejecutar_procedimiento
+from API.oracle_replay import directorio_fixtures, ruta_fixture, ruta_fixture_defecto
+from API.views import _obtener_pagare
+
+#? Línea de producto -> (SP del listado, SP del detalle por pagaré)
+PROCEDIMIENTOS = {
+    'API': ('SP_PLANPAGOS1', 'SP_PLANPAGOS'),
+    'APIConsumo': ('SP_PLANPAGOSCONSUMO1', 'SP_PLANPAGOSCONSUMO'),
+    'APIComercial': ('SP_PLANPAGOSCOMERCIAL1', 'SP_PLANPAGOSCOMERCIAL'),
+    'APIMicro': ('SP_PLANPAGOSMICROCREDITO1', 'SP_PLANPAGOSMICROCREDITO'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Graba fixtures de Oracle (API/oracle_replay.py) contra la base real: el listado de "
+        "la línea, el detalle de hasta --max-pagares pagarés y, con --asociados, "
+        "SP_CONSULTACAPA de sus cédulas. Luego se reproducen con ORACLE_MODO=replay."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--linea', choices=sorted(PROCEDIMIENTOS), default='API')
+        parser.add_argument('--max-pagares', type=int, default=20)
+        parser.add_argument('--asociados', action='store_true')
+
+    def handle(self, *args, **options):
+        if getattr(settings, "ORACLE_MODO", "real") == 'replay':
+            raise CommandError("Con ORACLE_MODO=replay no hay Oracle contra el cual grabar.")
+        #? El comando corre en su propio proceso: solo cambia el modo de este
+        settings.ORACLE_MODO = 'grabar'
+        listado, detalle = PROCEDIMIENTOS[options['linea']]
+
+        parametros = [datetime.now().strftime("%Y/%m/%d %H:%M:%S")]
+        filas = ejecutar_procedimiento(listado, parametros)
+        #? El listado recibe la hora actual: el replay siempre usa el _default
+        self._como_defecto(listado, parametros)
+        self.stdout.write(f"{listado}: {len(filas)} filas")
+
+        pagares = list(dict.fromkeys(p for p in (_obtener_pagare(f.get('OBLIGACION')) for f in filas) if p))
+        pagares = pagares[:options['max_pagares']]
+        for i, pagare in enumerate(pagares):
+            filas_detalle = ejecutar_procedimiento(detalle, [pagare])
+            if i == 0:
+                #? Forma de respuesta para pagarés sin fixture propio (pruebas con muchos pagarés)
+                self._como_defecto(detalle, [pagare])
+            self.stdout.write(f"{detalle} {pagare}: {len(filas_detalle)} filas")
+
+        if options['asociados']:
+            cedulas = list(dict.fromkeys(str(f.get('CEDULA')) for f in filas if f.get('CEDULA')))
+            for cedula in cedulas[:options['max_pagares']]:
+                ejecutar_procedimiento('SP_CONSULTACAPA', [cedula], max_filas=1)
+            self.stdout.write(f"SP_CONSULTACAPA: {min(len(cedulas), options['max_pagares'])} cédulas")
+
+        self.stdout.write(self.style.SUCCESS(f"Fixtures en {directorio_fixtures()}"))
+
+    def _como_defecto(self, nombre, parametros):
+        origen = ruta_fixture(nombre, parametros)
+        if origen.exists():
+            shutil.copyfile(origen, ruta_fixture_defecto(nombre))
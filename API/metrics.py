@@ -0,0 +1,77 @@
+# metrics.py
+import math
+import threading
+from collections import deque
+
+
+class VentanaLatencias:
+    """
+    Ventana deslizante de muestras (ms) con percentiles calculados bajo demanda.
+    Es por proceso: cada worker de gunicorn lleva su propia ventana.
+    """
+
+    def __init__(self, tamano=1024):
+        self._muestras = deque(maxlen=tamano)
+        self._lock = threading.Lock()
+        self.total = 0
+
+    def registrar(self, valor_ms):
+        with self._lock:
+            self._muestras.append(valor_ms)
+            self.total += 1
+
+    def reiniciar(self):
+        with self._lock:
+            self._muestras.clear()
+            self.total = 0
+
+    def resumen(self):
+        """Retorna conteo, máximo y percentiles p50/p95/p99 de la ventana actual."""
+        with self._lock:
+            ordenadas = sorted(self._muestras)
+            total = self.total
+        if not ordenadas:
+            return {"total": total, "muestras": 0, "p50": None, "p95": None, "p99": None, "max": None}
+        return {
+            "total": total,
+            "muestras": len(ordenadas),
+            "p50": round(_percentil(ordenadas, 50), 2),
+            "p95": round(_percentil(ordenadas, 95), 2),
+            "p99": round(_percentil(ordenadas, 99), 2),
+            "max": round(ordenadas[-1], 2),
+        }
+
+
+def _percentil(ordenadas, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    idx = max(0, min(len(ordenadas) - 1, math.ceil(p / 100.0 * len(ordenadas)) - 1))
+    return ordenadas[idx]
+
+
+class MetricasProcedimiento:
+    """
+    Ventanas por etapa de un procedimiento almacenado: espera por la conexión, callproc
+    (o execute del lote), fetch del REF CURSOR, total, filas y bytes aproximados.
+    """
+
+    ETAPAS = ('total_ms', 'espera_pool_ms', 'ejecucion_ms', 'fetch_ms', 'filas', 'bytes')
+
+    def __init__(self):
+        self._ventanas = {etapa: VentanaLatencias() for etapa in self.ETAPAS}
+        self._lock = threading.Lock()
+        self.errores = 0
+
+    def registrar(self, **valores):
+        for etapa, valor in valores.items():
+            if valor is not None:
+                self._ventanas[etapa].registrar(valor)
+
+    def registrar_error(self):
+        with self._lock:
+            self.errores += 1
+
+    def resumen(self):
+        return {
+            **{etapa: ventana.resumen() for etapa, ventana in self._ventanas.items()},
+            "errores": self.errores,
+        }
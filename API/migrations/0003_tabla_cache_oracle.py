@@ -0,0 +1,41 @@
+from django.core.management import call_command
+from django.db import migrations
+
+#? Tabla de CACHES['oracle'] (DatabaseCache) con el mismo esquema que createcachetable,
+#? pero UNLOGGED: no escribe WAL (es caché desechable) y se vacía si Postgres se cae.
+TABLA = 'oracle_cache'
+
+CREAR_TABLA = """
+CREATE UNLOGGED TABLE IF NOT EXISTS "oracle_cache" (
+    "cache_key" varchar(255) NOT NULL PRIMARY KEY,
+    "value" text NOT NULL,
+    "expires" timestamp with time zone NOT NULL
+);
+CREATE INDEX IF NOT EXISTS "oracle_cache_expires" ON "oracle_cache" ("expires");
+"""
+
+BORRAR_TABLA = 'DROP TABLE IF EXISTS "oracle_cache";'
+
+
+def crear_tabla(apps, schema_editor):
+    conexion = schema_editor.connection
+    if conexion.vendor == 'postgresql':
+        schema_editor.execute(CREAR_TABLA)
+    else:
+        #? Otras bases (ej. SQLite en desarrollo) no tienen UNLOGGED: tabla normal de DatabaseCache
+        call_command('createcachetable', TABLA, database=conexion.alias, verbosity=0)
+
+
+def borrar_tabla(apps, schema_editor):
+    schema_editor.execute(BORRAR_TABLA)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0002_remove_historialpdfs_k_flujo_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_tabla, borrar_tabla),
+    ]
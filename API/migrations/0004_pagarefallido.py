@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('API', '0003_tabla_cache_oracle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PagareFallido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('procedimiento', models.CharField(help_text='Procedimiento de detalle que falló.', max_length=100)),
+                ('pagare', models.CharField(help_text='Pagaré consultado.', max_length=50)),
+                ('motivo', models.CharField(choices=[('SIN_FILAS', 'El procedimiento no devolvió filas'), ('ORA-01422', 'ORA-01422: la consulta exacta devolvió más de una fila')], max_length=20)),
+                ('detalle', models.TextField(blank=True, default='')),
+                ('intentos', models.PositiveIntegerField(default=1, help_text='Fallos consecutivos registrados.')),
+                ('primer_fallo', models.DateTimeField(auto_now_add=True)),
+                ('ultimo_fallo', models.DateTimeField()),
+                ('reintentar_despues', models.DateTimeField(db_index=True, help_text='Antes de esta fecha no se consulta Oracle.')),
+            ],
+            options={
+                'verbose_name': 'Pagaré fallido',
+                'verbose_name_plural': 'Pagarés fallidos',
+                'ordering': ['-ultimo_fallo'],
+                'constraints': [models.UniqueConstraint(fields=('procedimiento', 'pagare'), name='pagare_fallido_unico')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class HistorialPDFs(models.Model):
     """
@@ -19,4 +20,43 @@ class HistorialPDFs(models.Model):
     class Meta:
         verbose_name = "Historial de PDF"
         verbose_name_plural = "Historiales de PDFs"
-        ordering = ['-fecha_creacion']
\ No newline at end of file
+        ordering = ['-fecha_creacion']
+
+class PagareFallido(models.Model):
+    """
+    Caché negativa: pagarés cuyo procedimiento de detalle no devolvió filas o falló con
+    ORA-01422. Mientras no llegue 'reintentar_despues' se responde el mismo error sin
+    volver a llamar a Oracle; cada fallo nuevo duplica la espera (ver API/negativos.py).
+    """
+    MOTIVO_SIN_FILAS = 'SIN_FILAS'
+    MOTIVO_ORA_01422 = 'ORA-01422'
+    MOTIVOS = [
+        (MOTIVO_SIN_FILAS, 'El procedimiento no devolvió filas'),
+        (MOTIVO_ORA_01422, 'ORA-01422: la consulta exacta devolvió más de una fila'),
+    ]
+
+    #? Procedimiento de detalle que falló (SP_PLANPAGOSCONSUMO, SP_PLANPAGOS, ...)
+    procedimiento = models.CharField(max_length=100, help_text="Procedimiento de detalle que falló.")
+    pagare = models.CharField(max_length=50, help_text="Pagaré consultado.")
+    motivo = models.CharField(max_length=20, choices=MOTIVOS)
+    #? Mensaje original del error (vacío para SIN_FILAS)
+    detalle = models.TextField(blank=True, default="")
+    intentos = models.PositiveIntegerField(default=1, help_text="Fallos consecutivos registrados.")
+    primer_fallo = models.DateTimeField(auto_now_add=True)
+    ultimo_fallo = models.DateTimeField()
+    reintentar_despues = models.DateTimeField(db_index=True, help_text="Antes de esta fecha no se consulta Oracle.")
+
+    def __str__(self):
+        return f"{self.procedimiento} {self.pagare}: {self.motivo} ({self.intentos} intentos)"
+
+    @property
+    def vigente(self):
+        return self.reintentar_despues > timezone.now()
+
+    class Meta:
+        verbose_name = "Pagaré fallido"
+        verbose_name_plural = "Pagarés fallidos"
+        ordering = ['-ultimo_fallo']
+        constraints = [
+            models.UniqueConstraint(fields=['procedimiento', 'pagare'], name='pagare_fallido_unico'),
+        ]
@@ -0,0 +1,141 @@
+# negativos.py
+#? Caché negativa por pagaré (modelo PagareFallido). n8n reintenta en cada ciclo los
+#? pagarés que fallan; con esto solo se vuelve a consultar Oracle tras el backoff.
+import logging
+from collections import namedtuple
+from datetime import timedelta
+
+import oracledb
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import PagareFallido
+from .oracle_exec import ejecutar_procedimiento, ejecutar_procedimiento_lote
+
+logger = logging.getLogger(__name__)
+
+MOTIVO_SIN_FILAS = PagareFallido.MOTIVO_SIN_FILAS
+MOTIVO_ORA_01422 = PagareFallido.MOTIVO_ORA_01422
+#? Error de Oracle de un solo pagaré que no se guarda en la caché negativa (puede ser transitorio)
+MOTIVO_ERROR = 'ERROR'
+
+#? Resultado de consultar_lote para un pagaré sin filas, con fallo vigente o que falló
+Fallo = namedtuple('Fallo', ['motivo', 'detalle'])
+
+
+def espera_backoff(intentos):
+    """NEGATIVO_BACKOFF_BASE_S * 2^(intentos-1), acotado por NEGATIVO_BACKOFF_MAX_S."""
+    base = getattr(settings, "NEGATIVO_BACKOFF_BASE_S", 900)
+    maximo = getattr(settings, "NEGATIVO_BACKOFF_MAX_S", 21600)
+    return timedelta(seconds=min(base * 2 ** (max(intentos, 1) - 1), maximo))
+
+
+def buscar_negativo(procedimiento, pagare):
+    """Registro de fallos del pagaré (vigente o no), o None. Sin pagaré no hay caché."""
+    if not pagare or not getattr(settings, "NEGATIVO_CACHE", True):
+        return None
+    return PagareFallido.objects.filter(procedimiento=procedimiento, pagare=pagare).first()
+
+
+def registrar_negativo(procedimiento, pagare, motivo, detalle=""):
+    """Registra un fallo y programa el próximo reintento con backoff exponencial."""
+    if not pagare or not getattr(settings, "NEGATIVO_CACHE", True):
+        return None
+    ahora = timezone.now()
+    fallido, creado = PagareFallido.objects.get_or_create(
+        procedimiento=procedimiento,
+        pagare=pagare,
+        defaults={
+            "motivo": motivo,
+            "detalle": detalle,
+            "ultimo_fallo": ahora,
+            "reintentar_despues": ahora + espera_backoff(1),
+        },
+    )
+    if not creado:
+        PagareFallido.objects.filter(pk=fallido.pk).update(
+            motivo=motivo, detalle=detalle, ultimo_fallo=ahora, intentos=F('intentos') + 1,
+        )
+        fallido.refresh_from_db()
+        fallido.reintentar_despues = ahora + espera_backoff(fallido.intentos)
+        fallido.save(update_fields=['reintentar_despues'])
+    logger.info(
+        "Caché negativa %s %s: %s (intento %s, reintento %s)",
+        procedimiento, pagare, motivo, fallido.intentos, fallido.reintentar_despues,
+    )
+    return fallido
+
+
+def fallos_vigentes(procedimiento, pagares):
+    """{pagaré: PagareFallido} de los pagarés con un fallo vigente, en una sola consulta."""
+    pagares = [p for p in pagares if p]
+    if not pagares or not getattr(settings, "NEGATIVO_CACHE", True):
+        return {}
+    fallidos = PagareFallido.objects.filter(
+        procedimiento=procedimiento, pagare__in=pagares, reintentar_despues__gt=timezone.now()
+    )
+    return {fallido.pagare: fallido for fallido in fallidos}
+
+
+def _consultar_uno(procedimiento, pagare, particion):
+    try:
+        return ejecutar_procedimiento(procedimiento, [pagare], particion=particion)
+    except oracledb.DatabaseError as exc:
+        mensaje = str(exc)
+        if "ORA-01422" in mensaje:
+            registrar_negativo(procedimiento, pagare, MOTIVO_ORA_01422, mensaje)
+            return Fallo(MOTIVO_ORA_01422, mensaje)
+        logger.warning("%s falló para el pagaré %s: %s", procedimiento, pagare, mensaje)
+        return Fallo(MOTIVO_ERROR, mensaje)
+
+
+def consultar_lote(procedimiento, pagares, particion=None):
+    """
+    ejecutar_procedimiento_lote() con la caché negativa: los pagarés con un fallo vigente
+    no se consultan. Si el lote falla con un error de Oracle se consulta pagaré por pagaré,
+    para que uno con ORA-01422 no deje sin respuesta a los demás. Los ORA-01422 y los
+    pagarés sin filas quedan registrados con registrar_negativo().
+    Retorna, en el orden de 'pagares', las filas de cada uno o un Fallo.
+    """
+    vigentes = fallos_vigentes(procedimiento, pagares)
+    consultar = [p for p in pagares if p not in vigentes]
+    try:
+        resultados = ejecutar_procedimiento_lote(procedimiento, [[p] for p in consultar], particion=particion)
+    except oracledb.DatabaseError as exc:
+        logger.warning(
+            "%s: el lote de %s pagarés falló (%s); se consultan uno por uno", procedimiento, len(consultar), exc
+        )
+        resultados = [_consultar_uno(procedimiento, p, particion) for p in consultar]
+    filas_por_pagare = dict(zip(consultar, resultados))
+
+    respuesta, respondieron = [], []
+    for pagare in pagares:
+        if pagare in vigentes:
+            respuesta.append(Fallo(vigentes[pagare].motivo, vigentes[pagare].detalle))
+            continue
+        filas = filas_por_pagare[pagare]
+        if not isinstance(filas, Fallo) and not filas:
+            registrar_negativo(procedimiento, pagare, MOTIVO_SIN_FILAS)
+            filas = Fallo(MOTIVO_SIN_FILAS, "")
+        elif not isinstance(filas, Fallo) and pagare:
+            respondieron.append(pagare)
+        respuesta.append(filas)
+    if respondieron and getattr(settings, "NEGATIVO_CACHE", True):
+        #? Ya responden: se olvidan los fallos anteriores (vencidos)
+        PagareFallido.objects.filter(procedimiento=procedimiento, pagare__in=respondieron).delete()
+    return respuesta
+
+
+def serializar_negativo(fallido):
+    return {
+        "procedimiento": fallido.procedimiento,
+        "pagare": fallido.pagare,
+        "motivo": fallido.motivo,
+        "detalle": fallido.detalle,
+        "intentos": fallido.intentos,
+        "primer_fallo": fallido.primer_fallo.isoformat(),
+        "ultimo_fallo": fallido.ultimo_fallo.isoformat(),
+        "reintentar_despues": fallido.reintentar_despues.isoformat(),
+        "vigente": fallido.vigente,
+    }
@@ -0,0 +1,92 @@
+# numeros.py
+import re
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+
+from django.conf import settings
+
+
+@lru_cache(maxsize=1)
+def separadores_sesion():
+    """
+    (decimal, miles) fijados en cada sesión del pool por ORACLE_NLS_NUMERIC_CHARACTERS,
+    o None si el formato no se fija y depende del locale de la base de datos.
+    """
+    nls = getattr(settings, "ORACLE_NLS_NUMERIC_CHARACTERS", "")
+    if len(nls) != 2:
+        return None
+    return nls[0], nls[1]
+
+
+@lru_cache(maxsize=8)
+def _formato_sesion(decimal, miles):
+    """
+    Regex de un número escrito con los separadores de la sesión: sin agrupar o con
+    grupos de miles de 3 dígitos, y parte decimal opcional (ej. '3,791,706.5' con '.,').
+    """
+    d, m = re.escape(decimal), re.escape(miles)
+    return re.compile(rf'^[+-]?(\d{{1,3}}({m}\d{{3}})+|\d*)({d}\d+)?$')
+
+
+def _parse_heuristico(s):
+    """
+    Adivina el separador decimal cuando no se conoce el formato de la sesión:
+    - '1.234.567' -> 1234567
+    - '146004,84' -> 146004.84
+    - '146004.84' -> 146004.84
+    - '3,791,706'  -> 3791706
+    """
+    # Si tiene ambos separadores, asume . = miles, , = decimal (formato PESOS)
+    if '.' in s and ',' in s:
+        s = s.replace('.', '').replace(',', '.')
+    else:
+        # Varias ',' sin '.': son de miles
+        if s.count(',') > 1:
+            s = s.replace(',', '')
+        # Si sólo tiene una ',', aseume que es decimal
+        elif ',' in s:
+            s = s.replace('.', '')  # por si vienen puntos de miles mezclados
+            s = s.replace(',', '.')
+        else:
+            # Sólo tiene puntos. ¿Es decimal?
+            parts = s.split('.')
+            if len(parts) > 1 and len(parts[-1]) <= 2:
+                # ej: 146004.84 => decimal, se conserva
+                s = ''.join(parts[:-1]) + '.' + parts[-1]
+            else:
+                # ej: 1.234.567 => miles, se remueven
+                s = s.replace('.', '')
+
+    try:
+        return Decimal(s)
+    except InvalidOperation:
+        return Decimal(0)
+
+
+def parse_numero(valor):
+    """
+    Convierte un valor de Oracle (str/int/float/Decimal) en Decimal. '' o None -> 0.
+    Si el pool fija NLS_NUMERIC_CHARACTERS y el texto tiene ese formato se parsea de
+    forma estricta (ej. '1.234' es 1.234 con '.,'). Si no lo tiene se recurre a la
+    heurística: con '.,' el texto '146004,84' (formato PESOS, ej. fixtures o cachés
+    anteriores a fijar el NLS) no es 14600484, porque la ',' de miles exige grupos de 3.
+    """
+    if valor is None:
+        return Decimal(0)
+    if isinstance(valor, Decimal):
+        return valor
+    if isinstance(valor, (int, float)):
+        return Decimal(str(valor))
+    s = str(valor).strip()
+    if not s:
+        return Decimal(0)
+
+    separadores = separadores_sesion()
+    if separadores is not None:
+        decimal, miles = separadores
+        if _formato_sesion(decimal, miles).match(s):
+            try:
+                return Decimal(s.replace(miles, '').replace(decimal, '.'))
+            except InvalidOperation:
+                pass
+    return _parse_heuristico(s)
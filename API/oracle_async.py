@@ -0,0 +1,268 @@
+# oracle_async.py
+#? Variante asyncio de oracle_pool/oracle_exec para las vistas async servidas por ASGI.
+import asyncio
+import logging
+import os
+import time
+
+import oracledb
+from django.conf import settings
+
+from .deadline import DeadlineAgotadoError, limitar_timeout_ms, tiempo_restante, verificar_deadline
+from .metrics import VentanaLatencias
+from .oracle_exec import (
+    _handler_lobs_inline,
+    configuracion_procedimiento,
+    es_timeout_por_deadline,
+    fabrica_filas,
+    preparar_lectura,
+    registrar_ejecucion,
+    registrar_error,
+)
+from .oracle_pool import (
+    GETMODES,
+    ParticionPool,
+    PoolSaturadoError,
+    configuracion_pool,
+    es_pool_agotado,
+    parametros_conexion,
+    sentencia_nls,
+)
+
+logger = logging.getLogger(__name__)
+
+_pool = None  #? Singleton del pool async (uno por worker / event loop)
+_pool_pid = None
+_latencias_acquire = VentanaLatencias()
+_contadores = {"adquisiciones": 0, "rechazos": 0}
+_particiones = {}  #? nombre -> ParticionPoolAsync (del worker actual)
+_particiones_pid = None
+
+
+class ParticionPoolAsync(ParticionPool):
+    """
+    ParticionPool del pool async: la espera por un cupo es un asyncio.Semaphore, así
+    que una línea sin cupo no bloquea el event loop. La cuota es por worker ASGI.
+    """
+
+    def __init__(self, nombre, cuota):
+        super().__init__(nombre, cuota)
+        self._semaforo = asyncio.BoundedSemaphore(cuota) if cuota else None
+
+    async def entrar(self, timeout_s):
+        """Ocupa un cupo; retorna False si no se liberó ninguno dentro de timeout_s."""
+        inicio = time.perf_counter()
+        if self._semaforo is not None and not self._semaforo.locked():
+            await self._semaforo.acquire()  #? Hay cupo: no se suspende
+        elif self._semaforo is not None:
+            with self._lock:
+                self.esperas += 1
+            try:
+                await asyncio.wait_for(self._semaforo.acquire(), timeout_s)
+            except asyncio.TimeoutError:
+                with self._lock:
+                    self.rechazos += 1
+                return False
+        self._latencias_espera.registrar((time.perf_counter() - inicio) * 1000)
+        with self._lock:
+            self.en_uso += 1
+            self.adquisiciones += 1
+            self.max_en_uso = max(self.max_en_uso, self.en_uso)
+        return True
+
+
+async def _configurar_sesion(conn, tag_solicitado):
+    sentencia = sentencia_nls()
+    if sentencia:
+        with conn.cursor() as cursor:
+            await cursor.execute(sentencia)
+
+
+def get_pool_async():
+    """Crea el pool async si no existe (o si fue heredado de otro proceso) y lo devuelve."""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        conf = configuracion_pool()
+        #? Un worker async atiende muchas peticiones a la vez: su máximo se configura aparte
+        maximo = max(getattr(settings, "ORACLE_ASYNC_POOL_MAX", conf['max']), conf['min'])
+        _pool = oracledb.create_pool_async(
+            **parametros_conexion(),
+            min=conf['min'],
+            max=maximo,
+            increment=conf['increment'],
+            timeout=conf['timeout'],
+            getmode=GETMODES[conf['getmode']],
+            wait_timeout=conf['wait_timeout_ms'],
+            homogeneous=True,
+            session_callback=_configurar_sesion,
+        )
+        _pool_pid = os.getpid()
+        logger.info("Pool Oracle async creado (pid=%s): max=%s", _pool_pid, maximo)
+    return _pool
+
+
+def obtener_particion_async(nombre):
+    """Partición del pool async con la cuota de ORACLE_ASYNC_POOL_CUOTAS[nombre] (sin cuota si no está)."""
+    global _particiones, _particiones_pid
+    if _particiones_pid != os.getpid():
+        _particiones, _particiones_pid = {}, os.getpid()
+    particion = _particiones.get(nombre)
+    if particion is None:
+        cuota = getattr(settings, "ORACLE_ASYNC_POOL_CUOTAS", {}).get(nombre)
+        particion = _particiones[nombre] = ParticionPoolAsync(nombre, cuota)
+    return particion
+
+
+async def acquire_connection_async(particion=None):
+    """
+    Equivalente async de acquire_connection(): la conexión cuenta contra la cuota de
+    'particion' en ORACLE_ASYNC_POOL_CUOTAS. Lanza PoolSaturadoError al agotarse la
+    espera y DeadlineAgotadoError si la petición agotó su deadline.
+    El llamador devuelve la conexión y luego llama liberar_particion_async(particion).
+    """
+    verificar_deadline('pool')
+    cupo = obtener_particion_async(particion) if particion else None
+    if cupo is not None:
+        wait_timeout_ms = getattr(settings, "ORACLE_POOL_WAIT_TIMEOUT_MS", 5000)
+        espera_ms = limitar_timeout_ms(wait_timeout_ms, 'pool')
+        if not await cupo.entrar(espera_ms / 1000):
+            if espera_ms != wait_timeout_ms:
+                raise DeadlineAgotadoError('pool')
+            _contadores["rechazos"] += 1
+            logger.warning("Cuota Oracle async agotada para %s (pid=%s, cuota=%s)", particion, os.getpid(), cupo.cuota)
+            raise PoolSaturadoError(
+                f"No hay conexiones Oracle disponibles para {particion} en este momento.",
+                retry_after=getattr(settings, "ORACLE_POOL_RETRY_AFTER_S", 5),
+            )
+    try:
+        return await _adquirir_del_pool_async()
+    except BaseException:
+        if cupo is not None:
+            cupo.salir()
+        raise
+
+
+def liberar_particion_async(particion):
+    if particion:
+        obtener_particion_async(particion).salir()
+
+
+def _pool_saturado_async():
+    _contadores["rechazos"] += 1
+    return PoolSaturadoError(
+        "No hay conexiones Oracle disponibles en este momento.",
+        retry_after=getattr(settings, "ORACLE_POOL_RETRY_AFTER_S", 5),
+    )
+
+
+async def _adquirir_del_pool_async():
+    pool = get_pool_async()
+    #? El pool solo conoce su wait_timeout: la espera también se corta al agotarse el deadline
+    conf = configuracion_pool()
+    wait_timeout_ms = conf['wait_timeout_ms'] if conf['getmode'] == 'timedwait' else 0
+    try:
+        espera_ms = limitar_timeout_ms(wait_timeout_ms, 'pool')
+    except DeadlineAgotadoError:
+        _contadores["rechazos"] += 1
+        raise
+    inicio = time.perf_counter()
+    try:
+        conn = await asyncio.wait_for(pool.acquire(), espera_ms / 1000 if espera_ms else None)
+    except asyncio.TimeoutError:
+        if espera_ms != wait_timeout_ms:
+            #? La espera se recortó al deadline: lo que se agotó es el tiempo de la petición
+            _contadores["rechazos"] += 1
+            raise DeadlineAgotadoError('pool')
+        raise _pool_saturado_async()
+    except oracledb.DatabaseError as exc:
+        if not es_pool_agotado(exc):
+            raise
+        raise _pool_saturado_async() from exc
+    _latencias_acquire.registrar((time.perf_counter() - inicio) * 1000)
+    _contadores["adquisiciones"] += 1
+    restante = tiempo_restante()
+    if restante is not None and restante <= 0:
+        await pool.release(conn)
+        raise DeadlineAgotadoError('pool')
+    return conn
+
+
+async def ejecutar_procedimiento_async(nombre, parametros, max_filas=None, lectura=None, particion=None):
+    """
+    Equivalente async de oracle_exec.ejecutar_procedimiento() con la misma configuración por SP.
+    'particion' es la línea de producto que llama (cuota en ORACLE_ASYNC_POOL_CUOTAS).
+    """
+    conf = configuracion_procedimiento(nombre)
+    inicio = time.perf_counter()
+    medicion = {}
+    try:
+        filas = await _ejecutar_async(nombre, parametros, max_filas, conf, inicio, medicion, lectura, particion)
+    except Exception:
+        registrar_error(nombre)
+        raise
+
+    registrar_ejecucion(nombre, (time.perf_counter() - inicio) * 1000, filas, **medicion)
+    return filas
+
+
+async def _ejecutar_async(nombre, parametros, max_filas, conf, inicio, medicion, lectura=None, particion=None):
+    conn = await acquire_connection_async(particion)
+    medicion['espera_pool_ms'] = (time.perf_counter() - inicio) * 1000
+    try:
+        return await _ejecutar_en_conexion_async(conn, nombre, parametros, max_filas, conf, medicion, lectura)
+    finally:
+        liberar_particion_async(particion)
+
+
+async def _ejecutar_en_conexion_async(conn, nombre, parametros, max_filas, conf, medicion, lectura):
+    async with conn:
+        conn.call_timeout = limitar_timeout_ms(conf['call_timeout_ms'] or 0, f"oracle:{nombre}")
+        try:
+            with conn.cursor() as cursor:
+                ref_cursor = conn.cursor()
+                ref_cursor.arraysize = conf['arraysize']
+                ref_cursor.prefetchrows = conf['prefetchrows']
+                if conf['lobs_inline']:
+                    ref_cursor.outputtypehandler = _handler_lobs_inline
+                try:
+                    t0 = time.perf_counter()
+                    await cursor.callproc(nombre, [*parametros, ref_cursor])
+                    medicion['ejecucion_ms'] = (time.perf_counter() - t0) * 1000
+                    if ref_cursor.description is None:
+                        return []
+                    t0 = time.perf_counter()
+                    if lectura is None:
+                        ref_cursor.rowfactory = fabrica_filas(conf, ref_cursor.description)
+                        filas = await (ref_cursor.fetchmany(max_filas) if max_filas else ref_cursor.fetchall())
+                    else:
+                        #? Como oracle_exec.leer_cursor: normaliza y filtra en la misma pasada del fetch
+                        por_fila = preparar_lectura(conf, ref_cursor.description, lectura)
+                        if max_filas:
+                            filas = [f for f in map(por_fila, await ref_cursor.fetchmany(max_filas)) if f is not None]
+                        else:
+                            filas = [f async for fila in ref_cursor if (f := por_fila(fila)) is not None]
+                    medicion['fetch_ms'] = (time.perf_counter() - t0) * 1000
+                    return filas
+                finally:
+                    ref_cursor.close()
+        except oracledb.DatabaseError as exc:
+            if es_timeout_por_deadline(exc):
+                raise DeadlineAgotadoError(f"oracle:{nombre}") from exc
+            raise
+        finally:
+            conn.call_timeout = 0
+
+
+def estadisticas_pool_async():
+    datos = {
+        "creado": _pool is not None and _pool_pid == os.getpid(),
+        "adquisiciones": _contadores["adquisiciones"],
+        "rechazos": _contadores["rechazos"],
+        "latencia_acquire_ms": _latencias_acquire.resumen(),
+        "particiones": {
+            nombre: p.estadisticas() for nombre, p in sorted(_particiones.items())
+        } if _particiones_pid == os.getpid() else {},
+    }
+    if datos["creado"]:
+        datos.update({"opened": _pool.opened, "busy": _pool.busy, "max": _pool.max})
+    return datos
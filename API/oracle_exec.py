@@ -0,0 +1,334 @@
+# oracle_exec.py
+import logging
+import re
+import threading
+import time
+from collections import defaultdict
+
+import oracledb
+from django.conf import settings
+
+from .flujos import Flujo, tipo_flujo
+from .deadline import DeadlineAgotadoError, limitar_timeout_ms, tiempo_restante
+from .metrics import MetricasProcedimiento
+from .oracle_pool import acquire_connection
+
+logger = logging.getLogger(__name__)
+
+#? Métricas por procedimiento (espera del pool, callproc, fetch, filas, bytes) en este worker
+_metricas_sp = defaultdict(MetricasProcedimiento)
+_metricas_lock = threading.Lock()
+
+
+def configuracion_procedimiento(nombre):
+    """
+    Ajustes de ejecución del procedimiento: ORACLE_SP_DEFAULTS combinado con
+    la entrada de ORACLE_SP_CONFIG para ese nombre.
+    """
+    conf = {
+        'arraysize': 100,
+        'prefetchrows': 2,
+        'call_timeout_ms': getattr(settings, "ORACLE_CALL_TIMEOUT_MS", 60000),
+        'row_factory': 'dict',
+        'lobs_inline': True,
+    }
+    conf.update(getattr(settings, "ORACLE_SP_DEFAULTS", {}))
+    conf.update(getattr(settings, "ORACLE_SP_CONFIG", {}).get(nombre, {}))
+    return conf
+
+
+def _handler_lobs_inline(cursor, metadata):
+    """
+    Trae CLOB/NCLOB/BLOB como str/bytes en el mismo fetch, sin una ida y vuelta
+    extra por cada LOB al leerlo (ej. columnas del plan unidas con ';').
+    """
+    if metadata.type_code is oracledb.DB_TYPE_CLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_NCLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_NVARCHAR, arraysize=cursor.arraysize)
+    if metadata.type_code is oracledb.DB_TYPE_BLOB:
+        return cursor.var(oracledb.DB_TYPE_LONG_RAW, arraysize=cursor.arraysize)
+
+
+#? Nombre de procedimiento permitido en el bloque PL/SQL de lote (se interpola en el SQL)
+_NOMBRE_SP = re.compile(r'^[A-Za-z][A-Za-z0-9_$#]*(\.[A-Za-z][A-Za-z0-9_$#]*)?$')
+
+#? Códigos de error de call_timeout vencido (thin / thick)
+CODIGOS_CALL_TIMEOUT = ('DPY-4024', 'DPI-1067')
+
+
+def es_timeout_por_deadline(exc):
+    """True si el error es un call_timeout vencido porque la petición agotó su deadline."""
+    error = exc.args[0] if exc.args else None
+    if getattr(error, "full_code", None) not in CODIGOS_CALL_TIMEOUT:
+        return False
+    restante = tiempo_restante()
+    return restante is not None and restante <= 0.05
+
+
+def _fabrica_dict(cols):
+    def fabrica(*valores):
+        return dict(zip(cols, valores))
+    return fabrica
+
+
+def fabrica_filas(conf, description):
+    """
+    rowfactory del cursor según conf['row_factory']: 'dict', 'flujo' (registro con
+    __slots__ de API/flujos.py, la clase se arma una vez por forma de cursor) o None (tuplas).
+    """
+    if conf['row_factory'] == 'dict':
+        return _fabrica_dict([c[0] for c in description])
+    if conf['row_factory'] == 'flujo':
+        return tipo_flujo(tuple(c[0] for c in description))
+    return None
+
+
+def preparar_lectura(conf, description, lectura):
+    """Función por fila de 'lectura' (ver leer_cursor) con la fábrica de filas de conf (dict si es 'tuple')."""
+    columnas = tuple(c[0] for c in description)
+    fabrica = fabrica_filas(conf, description) or _fabrica_dict(list(columnas))
+    return lectura(columnas, fabrica)
+
+
+def leer_cursor(ref_cursor, conf, max_filas=None, lectura=None):
+    """
+    Filas de un REF CURSOR ya abierto: todas o las primeras 'max_filas', armadas con
+    conf['row_factory'].
+    'lectura(columnas, fabrica)' retorna una función por fila (tupla -> fila armada, o None
+    para descartarla): el cursor se recorre en lotes de arraysize y normaliza y filtra en
+    la misma pasada, sin armar las filas descartadas (ej. LecturaListado de API/flujos.py).
+    """
+    if lectura is None:
+        ref_cursor.rowfactory = fabrica_filas(conf, ref_cursor.description)
+        return ref_cursor.fetchmany(max_filas) if max_filas else ref_cursor.fetchall()
+    por_fila = preparar_lectura(conf, ref_cursor.description, lectura)
+    crudas = ref_cursor.fetchmany(max_filas) if max_filas else ref_cursor
+    return [fila for fila in map(por_fila, crudas) if fila is not None]
+
+
+#? Filas que mide tamano_aproximado; en resultados más grandes se extrapola
+MUESTRA_TAMANO = 200
+
+
+def _tamano_fila(fila):
+    if isinstance(fila, Flujo):
+        #? Sin calcular los Diferido (ej. PLAN_PAGO)
+        valores = [valor for _, valor in fila._items_crudos()]
+    else:
+        valores = fila.values() if isinstance(fila, dict) else fila
+    total = 0
+    for valor in valores:
+        if valor is None:
+            continue
+        total += len(valor) if isinstance(valor, (str, bytes)) else 8
+    return total
+
+
+def tamano_aproximado(filas):
+    """
+    Bytes aproximados de las filas: largo de textos y binarios, 8 por número o fecha.
+    Con más de MUESTRA_TAMANO filas mide una muestra repartida en todo el resultado y
+    extrapola: recorrer todas las celdas costaría tanto como armar las filas.
+    """
+    total = len(filas)
+    if total <= MUESTRA_TAMANO:
+        return sum(map(_tamano_fila, filas))
+    paso = total / MUESTRA_TAMANO
+    muestra = sum(_tamano_fila(filas[int(i * paso)]) for i in range(MUESTRA_TAMANO))
+    return round(muestra * total / MUESTRA_TAMANO)
+
+
+def ejecutar_en_conexion(conn, nombre, parametros, max_filas=None, conf=None, medicion=None, lectura=None):
+    """
+    Ejecuta el procedimiento sobre una conexión ya adquirida.
+    'conf' permite sobrescribir la configuración del procedimiento (ej. benchmarks).
+    Si se pasa el dict 'medicion' se le agregan 'ejecucion_ms' (callproc) y 'fetch_ms'
+    (con 'lectura', fetch_ms incluye normalizar y filtrar las filas; ver leer_cursor).
+    """
+    medicion = {} if medicion is None else medicion
+    conf = conf or configuracion_procedimiento(nombre)
+    #? call_timeout es de la conexión: se restablece antes de devolverla al pool.
+    #? Nunca supera el tiempo que le queda a la petición.
+    conn.call_timeout = limitar_timeout_ms(conf['call_timeout_ms'] or 0, f"oracle:{nombre}")
+    try:
+        with conn.cursor() as cursor:
+            #? Pasar un cursor ya creado permite fijar prefetchrows/arraysize del REF CURSOR
+            ref_cursor = conn.cursor()
+            ref_cursor.arraysize = conf['arraysize']
+            ref_cursor.prefetchrows = conf['prefetchrows']
+            if conf['lobs_inline']:
+                ref_cursor.outputtypehandler = _handler_lobs_inline
+            try:
+                inicio = time.perf_counter()
+                cursor.callproc(nombre, [*parametros, ref_cursor])
+                medicion['ejecucion_ms'] = (time.perf_counter() - inicio) * 1000
+                if ref_cursor.description is None:
+                    #? El procedimiento no abrió el cursor
+                    return []
+                inicio = time.perf_counter()
+                filas = leer_cursor(ref_cursor, conf, max_filas=max_filas, lectura=lectura)
+                medicion['fetch_ms'] = (time.perf_counter() - inicio) * 1000
+                return filas
+            finally:
+                ref_cursor.close()
+    except oracledb.DatabaseError as exc:
+        if es_timeout_por_deadline(exc):
+            raise DeadlineAgotadoError(f"oracle:{nombre}") from exc
+        raise
+    finally:
+        conn.call_timeout = 0
+
+
+def ejecutar_procedimiento(nombre, parametros, max_filas=None, particion=None, lectura=None):
+    """
+    Ejecuta un procedimiento cuyo último parámetro es un REF CURSOR de salida y
+    retorna sus filas (dict por defecto, Flujo con row_factory='flujo' o tuplas con 'tuple').
+
+    'parametros' son los parámetros de entrada; el REF CURSOR lo agrega esta función.
+    Con 'max_filas' solo se leen esas filas (ej. búsquedas de un único registro).
+    'particion' es la app que llama (PARTICION_ORACLE de cada views.py) y define la
+    cuota del pool que consume (ver acquire_connection).
+    'lectura' normaliza y filtra las filas mientras se leen (ver leer_cursor).
+    """
+    inicio = time.perf_counter()
+    medicion = {}
+    try:
+        with acquire_connection(particion) as conn:
+            medicion['espera_pool_ms'] = (time.perf_counter() - inicio) * 1000
+            filas = ejecutar_en_conexion(conn, nombre, parametros, max_filas=max_filas, medicion=medicion, lectura=lectura)
+    except Exception:
+        registrar_error(nombre)
+        raise
+
+    registrar_ejecucion(nombre, (time.perf_counter() - inicio) * 1000, filas, **medicion)
+    return filas
+
+
+def bloque_lote(nombre, lista_parametros):
+    """
+    Bloque PL/SQL anónimo que llama al procedimiento una vez por juego de parámetros
+    y devuelve cada REF CURSOR como resultado implícito (DBMS_SQL.RETURN_RESULT).
+    Retorna (sql, binds).
+    """
+    if not _NOMBRE_SP.match(nombre):
+        raise ValueError(f"Nombre de procedimiento inválido: {nombre}")
+    llamadas = []
+    binds = {}
+    for i, parametros in enumerate(lista_parametros):
+        nombres = []
+        for j, valor in enumerate(parametros):
+            bind = f"p{i}_{j}"
+            binds[bind] = valor
+            nombres.append(f":{bind}")
+        #? RETURN_RESULT deja el cursor en NULL, así que la variable se reutiliza
+        llamadas.append(f"  {nombre}({', '.join([*nombres, 'c'])}); DBMS_SQL.RETURN_RESULT(c);")
+    sql = "DECLARE\n  c SYS_REFCURSOR;\nBEGIN\n" + "\n".join(llamadas) + "\nEND;"
+    return sql, binds
+
+
+def ejecutar_lote_en_conexion(conn, nombre, lista_parametros, conf=None, medicion=None):
+    """
+    Ejecuta el procedimiento para todos los juegos de parámetros en una sola ida y
+    vuelta. Retorna una lista de listas de filas, en el orden de 'lista_parametros'.
+    'medicion' acumula 'ejecucion_ms' y 'fetch_ms' como en ejecutar_en_conexion().
+    """
+    if not lista_parametros:
+        return []
+    medicion = {} if medicion is None else medicion
+    conf = conf or configuracion_procedimiento(nombre)
+    sql, binds = bloque_lote(nombre, lista_parametros)
+    handler_previo = conn.outputtypehandler
+    conn.call_timeout = limitar_timeout_ms(conf['call_timeout_ms'] or 0, f"oracle:{nombre}")
+    if conf['lobs_inline']:
+        #? Los cursores implícitos heredan el handler de la conexión
+        conn.outputtypehandler = _handler_lobs_inline
+    try:
+        with conn.cursor() as cursor:
+            cursor.arraysize = conf['arraysize']
+            cursor.prefetchrows = conf['prefetchrows']
+            inicio = time.perf_counter()
+            cursor.execute(sql, binds)
+            medicion['ejecucion_ms'] = medicion.get('ejecucion_ms', 0) + (time.perf_counter() - inicio) * 1000
+            inicio = time.perf_counter()
+            resultados = []
+            for ref_cursor in cursor.getimplicitresults():
+                if ref_cursor.description is None:
+                    #? Como en ejecutar_en_conexion: una llamada sin cursor abierto no trae filas
+                    resultados.append([])
+                    continue
+                ref_cursor.arraysize = conf['arraysize']
+                ref_cursor.rowfactory = fabrica_filas(conf, ref_cursor.description)
+                resultados.append(ref_cursor.fetchall())
+            medicion['fetch_ms'] = medicion.get('fetch_ms', 0) + (time.perf_counter() - inicio) * 1000
+        if len(resultados) != len(lista_parametros):
+            raise RuntimeError(
+                f"{nombre}: se esperaban {len(lista_parametros)} resultados implícitos y llegaron {len(resultados)}"
+            )
+        return resultados
+    except oracledb.DatabaseError as exc:
+        if es_timeout_por_deadline(exc):
+            raise DeadlineAgotadoError(f"oracle:{nombre}") from exc
+        raise
+    finally:
+        conn.call_timeout = 0
+        conn.outputtypehandler = handler_previo
+
+
+def ejecutar_procedimiento_lote(nombre, lista_parametros, particion=None):
+    """
+    Variante por lotes de ejecutar_procedimiento(): una conexión del pool y una ida y
+    vuelta por cada ORACLE_LOTE_MAX juegos de parámetros, en vez de una por juego.
+    """
+    tamano = max(1, getattr(settings, "ORACLE_LOTE_MAX", 50))
+    resultados = []
+    inicio = time.perf_counter()
+    medicion = {}
+    try:
+        with acquire_connection(particion) as conn:
+            medicion['espera_pool_ms'] = (time.perf_counter() - inicio) * 1000
+            for i in range(0, len(lista_parametros), tamano):
+                resultados.extend(
+                    ejecutar_lote_en_conexion(conn, nombre, lista_parametros[i:i + tamano], medicion=medicion)
+                )
+    except Exception:
+        registrar_error(f"{nombre}[lote]")
+        raise
+
+    filas = [fila for resultado in resultados for fila in resultado]
+    registrar_ejecucion(f"{nombre}[lote]", (time.perf_counter() - inicio) * 1000, filas, **medicion)
+    return resultados
+
+
+def _metricas(nombre):
+    with _metricas_lock:
+        return _metricas_sp[nombre]
+
+
+def registrar_ejecucion(nombre, duracion_ms, filas, espera_pool_ms=None, ejecucion_ms=None, fetch_ms=None):
+    """Registra una ejecución con el detalle por etapa (también la usa la variante async)."""
+    num_bytes = tamano_aproximado(filas)
+    _metricas(nombre).registrar(
+        total_ms=duracion_ms,
+        espera_pool_ms=espera_pool_ms,
+        ejecucion_ms=ejecucion_ms,
+        fetch_ms=fetch_ms,
+        filas=len(filas),
+        bytes=num_bytes,
+    )
+    logger.info(
+        "%s: %s filas (~%s bytes) en %.1f ms [pool %s | ejecución %s | fetch %s]",
+        nombre, len(filas), num_bytes, duracion_ms,
+        *(f"{v:.1f} ms" if v is not None else "-" for v in (espera_pool_ms, ejecucion_ms, fetch_ms)),
+    )
+
+
+def registrar_error(nombre):
+    _metricas(nombre).registrar_error()
+
+
+def estadisticas_procedimientos():
+    """Ventanas por etapa (p50/p95/p99/max) y errores de cada procedimiento del worker actual."""
+    with _metricas_lock:
+        metricas = dict(_metricas_sp)
+    return {nombre: m.resumen() for nombre, m in sorted(metricas.items())}
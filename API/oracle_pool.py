@@ -1,29 +1,430 @@
 # oracle_pool.py
+import contextlib
+import logging
+import os
+import threading
+import time
+
 import oracledb
 from django.conf import settings
 
+from .deadline import DeadlineAgotadoError, limitar_timeout_ms, tiempo_restante, verificar_deadline
+from .metrics import VentanaLatencias
+from .oracle_replay import ConexionGrabadora, PoolReplay, modo_oracle
+
+logger = logging.getLogger(__name__)
+
 _pool = None  #? Singleton de pool
+_pool_pid = None  #? PID del proceso que creó el pool (fork-safety con gunicorn --preload)
+_pool_lock = threading.Lock()
+
+#? Métricas de adquisición del worker actual
+_latencias_acquire = VentanaLatencias()
+_contadores = {"adquisiciones": 0, "esperas": 0, "rechazos": 0}
+_contadores_lock = threading.Lock()
+_precalentamiento = None  #? Resultado del último precalentamiento del worker
+_particiones = {}  #? nombre -> ParticionPool (se crean al primer uso)
+_particiones_lock = threading.Lock()
+#? Sesiones del pool del worker: pool.acquire() no acepta un tiempo de espera por llamada,
+#? así que la espera (recortada al deadline) se hace aquí y el acquire no tiene que esperar
+_sesiones = None
+
+#? Códigos de error cuando el pool no entrega conexión a tiempo (thin / thick)
+CODIGOS_POOL_AGOTADO = ('DPY-4005', 'ORA-24459', 'ORA-24496')
+
+
+class PoolSaturadoError(Exception):
+    """El pool Oracle no entregó una conexión dentro de ORACLE_POOL_WAIT_TIMEOUT_MS."""
+
+    def __init__(self, mensaje, retry_after):
+        super().__init__(mensaje)
+        self.retry_after = retry_after
+
+
+class ParticionPool:
+    """
+    Cupo de conexiones del pool para una línea de producto (API, APIConsumo, ...).
+    Un semáforo limita cuántas sesiones del worker puede ocupar la partición a la vez,
+    de modo que una ráfaga de una línea no deje sin sesiones a las demás.
+    cuota=None: sin límite propio (solo el máximo del pool).
+    """
+
+    def __init__(self, nombre, cuota):
+        self.nombre = nombre
+        self.cuota = cuota
+        self._semaforo = threading.BoundedSemaphore(cuota) if cuota else None
+        self._lock = threading.Lock()
+        self._latencias_espera = VentanaLatencias()
+        self.en_uso = 0
+        self.max_en_uso = 0
+        self.adquisiciones = 0
+        self.esperas = 0
+        self.rechazos = 0
+
+    def entrar(self, timeout_s):
+        """Ocupa un cupo; retorna False si no se liberó ninguno dentro de timeout_s."""
+        inicio = time.perf_counter()
+        if self._semaforo is not None and not self._semaforo.acquire(blocking=False):
+            with self._lock:
+                self.esperas += 1
+            if not self._semaforo.acquire(timeout=timeout_s):
+                with self._lock:
+                    self.rechazos += 1
+                return False
+        self._latencias_espera.registrar((time.perf_counter() - inicio) * 1000)
+        with self._lock:
+            self.en_uso += 1
+            self.adquisiciones += 1
+            self.max_en_uso = max(self.max_en_uso, self.en_uso)
+        return True
+
+    def salir(self):
+        with self._lock:
+            self.en_uso -= 1
+        if self._semaforo is not None:
+            self._semaforo.release()
+
+    def estadisticas(self):
+        return {
+            "cuota": self.cuota,
+            "en_uso": self.en_uso,
+            "max_en_uso": self.max_en_uso,
+            "utilizacion": round(self.en_uso / self.cuota, 2) if self.cuota else None,
+            "adquisiciones": self.adquisiciones,
+            "esperas": self.esperas,
+            "rechazos": self.rechazos,
+            "latencia_espera_ms": self._latencias_espera.resumen(),
+        }
+
+
+GETMODES = {
+    'wait': oracledb.POOL_GETMODE_WAIT,
+    'nowait': oracledb.POOL_GETMODE_NOWAIT,
+    'forceget': oracledb.POOL_GETMODE_FORCEGET,
+    'timedwait': oracledb.POOL_GETMODE_TIMEDWAIT,
+}
+
+
+def configuracion_pool():
+    """Parámetros del pool leídos desde settings (ver ORACLE_POOL_* en settings.py)."""
+    minimo = getattr(settings, "ORACLE_POOL_MIN", 1)
+    maximo = max(getattr(settings, "ORACLE_POOL_MAX", 1), minimo)
+    getmode = str(getattr(settings, "ORACLE_POOL_GETMODE", "timedwait")).lower()
+    if getmode not in GETMODES:
+        raise ValueError(f"ORACLE_POOL_GETMODE inválido: {getmode}")
+    return {
+        'min': minimo,
+        'max': maximo,
+        'increment': getattr(settings, "ORACLE_POOL_INCREMENT", 1),
+        'timeout': getattr(settings, "ORACLE_POOL_TIMEOUT", 300),
+        'getmode': getmode,
+        'wait_timeout_ms': getattr(settings, "ORACLE_POOL_WAIT_TIMEOUT_MS", 5000),
+    }
+
+
+def _reiniciar_estado_en_hijo():
+    """
+    Tras un fork el hijo no debe usar el pool (ni los sockets) del padre.
+    Se descarta la referencia sin cerrarla: cerrarla desde el hijo cortaría las sesiones del padre.
+    """
+    global _pool, _pool_pid, _pool_lock, _latencias_acquire, _contadores_lock, _precalentamiento
+    global _particiones, _particiones_lock, _sesiones
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+    _latencias_acquire = VentanaLatencias()
+    _contadores_lock = threading.Lock()
+    _contadores.update(adquisiciones=0, esperas=0, rechazos=0)
+    _precalentamiento = None
+    _particiones = {}
+    _particiones_lock = threading.Lock()
+    _sesiones = None
+
+
+os.register_at_fork(after_in_child=_reiniciar_estado_en_hijo)
+
+
+def parametros_conexion():
+    """Usuario, contraseña y DSN de DATABASES['oracle'] (compartido con el pool async)."""
+    db = settings.DATABASES['oracle']
+    return {
+        'user': db['USER'],
+        'password': db['PASSWORD'],
+        'dsn': f"{db['HOST']}:{db['PORT']}/{db['NAME']}",
+    }
+
+
+def sentencia_nls():
+    """ALTER SESSION con los formatos NLS configurados, o None si no hay nada que fijar."""
+    ajustes = []
+    numericos = getattr(settings, "ORACLE_NLS_NUMERIC_CHARACTERS", "")
+    if numericos:
+        ajustes.append(f"NLS_NUMERIC_CHARACTERS = '{numericos}'")
+    formato_fecha = getattr(settings, "ORACLE_NLS_DATE_FORMAT", "")
+    if formato_fecha:
+        ajustes.append(f"NLS_DATE_FORMAT = '{formato_fecha}'")
+    if not ajustes:
+        return None
+    return "ALTER SESSION SET " + " ".join(ajustes)
+
+
+def _configurar_sesion(conn, tag_solicitado):
+    """
+    Callback del pool: se ejecuta una sola vez por sesión nueva y fija los formatos
+    NLS, de modo que los SP devuelvan números y fechas con un formato conocido.
+    """
+    sentencia = sentencia_nls()
+    if sentencia:
+        with conn.cursor() as cursor:
+            cursor.execute(sentencia)
+
 
 def get_pool():
-    """Crea el pool si no existe y lo devuelve."""
-    global _pool
+    """Crea el pool si no existe y lo devuelve (con ORACLE_MODO='replay', un PoolReplay)."""
+    global _pool, _pool_pid
+    if _pool is not None and _pool_pid != os.getpid():
+        #? Pool heredado de otro proceso: se recrea en este
+        _reiniciar_estado_en_hijo()
     if _pool is None:
-        db = settings.DATABASES['oracle']
-        dsn = f"{db['HOST']}:{db['PORT']}/{db['NAME']}"
-        _pool = oracledb.create_pool(
-            user=db['USER'],
-            password=db['PASSWORD'],
-            dsn=dsn,
-            min=1,            #? mínimo de conexiones
-            max=5,            #? máximo de conexiones activas
-            increment=1,      #? crecimiento del pool
-            timeout=300,      #? segundos para reciclar conexiones inactivas
-            homogeneous=True  #? mismo usuario/credenciales
-        )
+        with _pool_lock:
+            if _pool is None:
+                conf = configuracion_pool()
+                if modo_oracle() == 'replay':
+                    _pool = PoolReplay(conf)
+                    _pool_pid = os.getpid()
+                    logger.info("Pool Oracle en modo replay (pid=%s): %s", _pool_pid, conf)
+                    return _pool
+                _pool = oracledb.create_pool(
+                    **parametros_conexion(),
+                    min=conf['min'],              #? mínimo de conexiones
+                    max=conf['max'],              #? máximo de conexiones activas
+                    increment=conf['increment'],  #? crecimiento del pool
+                    timeout=conf['timeout'],      #? segundos para reciclar conexiones inactivas
+                    getmode=GETMODES[conf['getmode']],
+                    wait_timeout=conf['wait_timeout_ms'],  #? solo aplica con getmode 'timedwait'
+                    homogeneous=True,             #? mismo usuario/credenciales
+                    session_callback=_configurar_sesion,
+                )
+                _pool_pid = os.getpid()
+                logger.info("Pool Oracle creado (pid=%s): %s", _pool_pid, conf)
     return _pool
 
-def acquire_connection():
-    """Obtiene una conexión del pool lista para usarse."""
+
+def es_pool_agotado(exc):
+    error = exc.args[0] if exc.args else None
+    return getattr(error, "full_code", None) in CODIGOS_POOL_AGOTADO
+
+
+def obtener_particion(nombre):
+    """Partición del pool con la cuota de ORACLE_POOL_CUOTAS[nombre] (sin cuota si no está)."""
+    particion = _particiones.get(nombre)
+    if particion is None:
+        with _particiones_lock:
+            particion = _particiones.get(nombre)
+            if particion is None:
+                cuota = getattr(settings, "ORACLE_POOL_CUOTAS", {}).get(nombre)
+                particion = _particiones[nombre] = ParticionPool(nombre, cuota)
+    return particion
+
+
+@contextlib.contextmanager
+def acquire_connection(particion=None):
+    """
+    Obtiene una conexión del pool lista para usarse y la devuelve al salir del 'with'.
+    'particion' es la línea de producto que hace la llamada (API, APIConsumo, ...):
+    la conexión cuenta contra su cuota (ORACLE_POOL_CUOTAS).
+    Si el pool (o la cuota) no la entrega dentro del tiempo de espera configurado lanza
+    PoolSaturadoError, para que la vista responda 503 en vez de bloquear el worker.
+    Si la petición agotó su deadline (API/deadline.py) lanza DeadlineAgotadoError.
+    """
+    verificar_deadline('pool')
+    cupo = obtener_particion(particion) if particion else None
+    if cupo is not None:
+        wait_timeout_ms = getattr(settings, "ORACLE_POOL_WAIT_TIMEOUT_MS", 5000)
+        espera_ms = limitar_timeout_ms(wait_timeout_ms, 'pool')
+        if not cupo.entrar(espera_ms / 1000):
+            if espera_ms != wait_timeout_ms:
+                #? La espera se recortó al deadline: lo que se agotó es el tiempo de la petición
+                raise DeadlineAgotadoError('pool')
+            logger.warning("Cuota Oracle agotada para %s (pid=%s, cuota=%s)", particion, os.getpid(), cupo.cuota)
+            raise PoolSaturadoError(
+                f"No hay conexiones Oracle disponibles para {particion} en este momento.",
+                retry_after=getattr(settings, "ORACLE_POOL_RETRY_AFTER_S", 5),
+            )
+    try:
+        conn = _adquirir_del_pool()
+        try:
+            if modo_oracle() == 'grabar':
+                conn = ConexionGrabadora(conn)
+            yield conn
+        finally:
+            conn.close()
+            _liberar_sesion()
+    finally:
+        if cupo is not None:
+            cupo.salir()
+
+
+def _semaforo_sesiones():
+    """Semáforo con las 'max' sesiones del pool del worker (None con getmode 'forceget')."""
+    global _sesiones
+    if _sesiones is None:
+        conf = configuracion_pool()
+        if conf['getmode'] == 'forceget':
+            return None
+        with _pool_lock:
+            if _sesiones is None:
+                _sesiones = threading.BoundedSemaphore(conf['max'])
+    return _sesiones
+
+
+def _esperar_sesion():
+    """
+    Espera una sesión libre como mucho ORACLE_POOL_WAIT_TIMEOUT_MS, recortado al tiempo
+    que le queda a la petición (igual que la cuota y el call_timeout).
+    Retorna False si no se liberó ninguna y lanza DeadlineAgotadoError si la espera
+    se recortó al deadline y tampoco alcanzó.
+    """
+    sesiones = _semaforo_sesiones()
+    if sesiones is None or sesiones.acquire(blocking=False):
+        return True
+    conf = configuracion_pool()
+    if conf['getmode'] == 'nowait':
+        return False
+    wait_timeout_ms = conf['wait_timeout_ms'] if conf['getmode'] == 'timedwait' else 0
+    espera_ms = limitar_timeout_ms(wait_timeout_ms, 'pool')
+    if sesiones.acquire(timeout=espera_ms / 1000 if espera_ms else None):
+        return True
+    if espera_ms != wait_timeout_ms:
+        raise DeadlineAgotadoError('pool')
+    return False
+
+
+def _liberar_sesion():
+    if _sesiones is not None:
+        _sesiones.release()
+
+
+def _pool_saturado(pool, detalle):
+    with _contadores_lock:
+        _contadores["rechazos"] += 1
+    logger.warning("Pool Oracle saturado (pid=%s, busy=%s/%s): %s", os.getpid(), pool.busy, pool.max, detalle)
+    return PoolSaturadoError(
+        "No hay conexiones Oracle disponibles en este momento.",
+        retry_after=getattr(settings, "ORACLE_POOL_RETRY_AFTER_S", 5),
+    )
+
+
+def _adquirir_del_pool():
+    """Conexión del pool; quien la recibe la cierra y luego llama a _liberar_sesion()."""
     pool = get_pool()
-    conn = pool.acquire()
+    #? Si no hay sesiones libres la adquisición tendrá que esperar (o abrir una nueva)
+    sin_libres = pool.busy >= pool.opened
+    inicio = time.perf_counter()
+    try:
+        obtenida = _esperar_sesion()
+    except DeadlineAgotadoError:
+        with _contadores_lock:
+            _contadores["rechazos"] += 1
+        raise
+    if not obtenida:
+        raise _pool_saturado(pool, "sin sesiones libres en el tiempo de espera")
+    try:
+        conn = pool.acquire()
+    except oracledb.DatabaseError as exc:
+        _liberar_sesion()
+        if not es_pool_agotado(exc):
+            raise
+        raise _pool_saturado(pool, exc) from exc
+    except BaseException:
+        _liberar_sesion()
+        raise
+    _latencias_acquire.registrar((time.perf_counter() - inicio) * 1000)
+    with _contadores_lock:
+        _contadores["adquisiciones"] += 1
+        if sin_libres:
+            _contadores["esperas"] += 1
+    restante = tiempo_restante()
+    if restante is not None and restante <= 0:
+        #? La espera por la conexión consumió el presupuesto de la petición
+        pool.release(conn)
+        _liberar_sesion()
+        raise DeadlineAgotadoError('pool')
     return conn
+
+
+def precalentar_pool():
+    """
+    Crea el pool y abre las 'min' sesiones antes de la primera petición.
+    Opcionalmente hace un ping (ida y vuelta a Oracle) por sesión.
+    Pensado para el hook post_worker_init de gunicorn (ver gunicorn.conf.py).
+    """
+    global _precalentamiento
+    inicio = time.perf_counter()
+    pool = get_pool()
+    hacer_ping = getattr(settings, "ORACLE_POOL_WARMUP_PING", True)
+    conexiones = []
+    try:
+        #? Se retienen las conexiones para forzar la apertura de 'min' sesiones distintas
+        for _ in range(pool.min):
+            conn = pool.acquire()
+            conexiones.append(conn)
+            if hacer_ping:
+                conn.ping()
+    finally:
+        for conn in conexiones:
+            pool.release(conn)
+    duracion_ms = round((time.perf_counter() - inicio) * 1000, 2)
+    _precalentamiento = {
+        "duracion_ms": duracion_ms,
+        "sesiones": len(conexiones),
+        "ping": hacer_ping,
+    }
+    logger.info("Pool Oracle precalentado (pid=%s) en %.2f ms: %s sesiones abiertas", os.getpid(), duracion_ms, pool.opened)
+    return _precalentamiento
+
+
+def cerrar_pool(espera_s=None):
+    """
+    Cierra el pool del proceso actual drenando las conexiones en uso.
+    Espera hasta 'espera_s' segundos (ORACLE_POOL_DRAIN_S) a que terminen las
+    llamadas en curso y luego cierra forzando las que queden.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        return
+    if espera_s is None:
+        espera_s = getattr(settings, "ORACLE_POOL_DRAIN_S", 10)
+    with _pool_lock:
+        pool, _pool, _pool_pid = _pool, None, None
+    limite = time.monotonic() + espera_s
+    while pool.busy and time.monotonic() < limite:
+        time.sleep(0.1)
+    ocupadas = pool.busy
+    if ocupadas:
+        logger.warning("Cerrando pool Oracle (pid=%s) con %s conexiones aún en uso", os.getpid(), ocupadas)
+    pool.close(force=True)
+    logger.info("Pool Oracle cerrado (pid=%s)", os.getpid())
+
+
+def estadisticas_pool():
+    """Estado del pool del worker actual, para dimensionarlo contra el cupo de sesiones Oracle."""
+    datos = {
+        "pid": os.getpid(),
+        "configuracion": configuracion_pool(),
+        "creado": _pool is not None and _pool_pid == os.getpid(),
+        "adquisiciones": _contadores["adquisiciones"],
+        "esperas": _contadores["esperas"],
+        "rechazos": _contadores["rechazos"],
+        "latencia_acquire_ms": _latencias_acquire.resumen(),
+        "precalentamiento": _precalentamiento,
+        "particiones": {nombre: p.estadisticas() for nombre, p in sorted(_particiones.items())},
+    }
+    if datos["creado"]:
+        datos.update({
+            "opened": _pool.opened,
+            "busy": _pool.busy,
+            "min": _pool.min,
+            "max": _pool.max,
+        })
+    return datos
@@ -0,0 +1,390 @@
+# oracle_replay.py
+#? Grabación y reproducción de respuestas de Oracle para medir y perfilar sin base de datos.
+#?   ORACLE_MODO='grabar': las conexiones del pool real guardan en ORACLE_FIXTURES_DIR la
+#?     descripción y las filas de cada REF CURSOR (callproc y bloques de lote).
+#?   ORACLE_MODO='replay': get_pool() entrega un PoolReplay que responde con esos archivos,
+#?     con ORACLE_REPLAY_LATENCIA_MS +/- ORACLE_REPLAY_JITTER_MS por ida y vuelta.
+#? Los fixtures tienen datos reales de asociados: no se versionan (ver .gitignore).
+import base64
+import datetime
+import decimal
+import hashlib
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from pathlib import Path
+
+import oracledb
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MODOS = ('real', 'grabar', 'replay')
+
+#? Una llamada del bloque de ejecutar_lote_en_conexion: "  SP(:p0_0, c); DBMS_SQL.RETURN_RESULT(c);"
+_LLAMADA_LOTE = re.compile(r'^\s*([A-Za-z][\w$#.]*)\(([^)]*)\);\s*DBMS_SQL\.RETURN_RESULT\(c\);', re.MULTILINE)
+
+
+def modo_oracle():
+    modo = str(getattr(settings, "ORACLE_MODO", "real")).lower()
+    if modo not in MODOS:
+        raise ValueError(f"ORACLE_MODO inválido: {modo}")
+    return modo
+
+
+def directorio_fixtures():
+    return Path(getattr(settings, "ORACLE_FIXTURES_DIR", Path(settings.BASE_DIR) / 'oracle_fixtures'))
+
+
+# Serialización de valores (JSON no tiene Decimal, fechas ni bytes)
+
+def _codificar(valor):
+    if isinstance(valor, decimal.Decimal):
+        return {"$decimal": str(valor)}
+    if isinstance(valor, datetime.datetime):
+        return {"$datetime": valor.isoformat()}
+    if isinstance(valor, datetime.date):
+        return {"$date": valor.isoformat()}
+    if isinstance(valor, (bytes, bytearray)):
+        return {"$bytes": base64.b64encode(valor).decode('ascii')}
+    return valor
+
+
+def _decodificar(valor):
+    if isinstance(valor, dict) and len(valor) == 1:
+        (tipo, dato), = valor.items()
+        if tipo == "$decimal":
+            return decimal.Decimal(dato)
+        if tipo == "$datetime":
+            return datetime.datetime.fromisoformat(dato)
+        if tipo == "$date":
+            return datetime.date.fromisoformat(dato)
+        if tipo == "$bytes":
+            return base64.b64decode(dato)
+    return valor
+
+
+def _resumen_parametros(parametros):
+    texto = json.dumps([_codificar(p) for p in parametros], sort_keys=True, default=str)
+    return hashlib.blake2b(texto.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def ruta_fixture(nombre, parametros):
+    """<ORACLE_FIXTURES_DIR>/<procedimiento>/<hash de los parámetros>.json"""
+    return directorio_fixtures() / nombre.upper() / f"{_resumen_parametros(parametros)}.json"
+
+
+def ruta_fixture_defecto(nombre):
+    """Respuesta para parámetros sin fixture propio (copiar ahí cualquier fixture del SP)."""
+    return directorio_fixtures() / nombre.upper() / "_default.json"
+
+
+def guardar_fixture(nombre, parametros, description, filas, parcial=False):
+    """Escribe el fixture de una llamada; 'filas' son tuplas tal como las entrega el cursor."""
+    ruta = ruta_fixture(nombre, parametros)
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    datos = {
+        "procedimiento": nombre,
+        "parametros": [_codificar(p) for p in parametros],
+        #? El tipo (DbType) se guarda por nombre: DB_TYPE_VARCHAR, DB_TYPE_NUMBER, ...
+        "description": None if description is None else [
+            [getattr(v, 'name', v) for v in columna] for columna in description
+        ],
+        "filas": [[_codificar(v) for v in fila] for fila in filas],
+        #? Lectura con max_filas: el fixture solo tiene las primeras filas
+        "parcial": parcial,
+        "grabado": datetime.datetime.now().isoformat(timespec='seconds'),
+    }
+    temporal = ruta.with_suffix('.tmp')
+    temporal.write_text(json.dumps(datos, ensure_ascii=False, default=str), encoding='utf-8')
+    os.replace(temporal, ruta)
+    logger.info("Fixture Oracle grabado: %s (%s filas)", ruta, len(filas))
+    return ruta
+
+
+_fixtures = {}  #? ruta -> (description, filas) ya decodificados; los archivos no cambian durante la prueba
+_fixtures_lock = threading.Lock()
+
+
+def _leer(ruta):
+    with _fixtures_lock:
+        if ruta in _fixtures:
+            return _fixtures[ruta]
+    if not ruta.exists():
+        resultado = None
+    else:
+        datos = json.loads(ruta.read_text(encoding='utf-8'))
+        description = None
+        if datos["description"] is not None:
+            description = [
+                tuple(getattr(oracledb, v, v) if isinstance(v, str) and v.startswith('DB_TYPE_') else v for v in c)
+                for c in datos["description"]
+            ]
+        resultado = (description, [tuple(_decodificar(v) for v in fila) for fila in datos["filas"]])
+    with _fixtures_lock:
+        _fixtures[ruta] = resultado
+    return resultado
+
+
+def cargar_fixture(nombre, parametros):
+    """(description, filas) grabados para la llamada, el _default del SP, o None."""
+    return _leer(ruta_fixture(nombre, parametros)) or _leer(ruta_fixture_defecto(nombre))
+
+
+def llamadas_lote(sql, binds):
+    """[(procedimiento, parámetros)] de un bloque armado por oracle_exec.bloque_lote()."""
+    llamadas = []
+    for nombre, argumentos in _LLAMADA_LOTE.findall(sql):
+        nombres = [a.strip() for a in argumentos.split(',')][:-1]  #? el último es el cursor 'c'
+        llamadas.append((nombre, [binds[a.lstrip(':')] for a in nombres]))
+    return llamadas
+
+
+# Replay
+
+class _ErrorSimulado:
+    """Imita el _Error de oracledb (full_code/message) para es_pool_agotado y es_timeout_por_deadline."""
+
+    def __init__(self, full_code, message):
+        self.full_code = full_code
+        self.code = 0
+        self.message = f"{full_code}: {message}"
+
+    def __str__(self):
+        return self.message
+
+
+def _ida_y_vuelta(conexion):
+    """Duerme la latencia simulada; respeta call_timeout como lo haría el driver."""
+    latencia_ms = getattr(settings, "ORACLE_REPLAY_LATENCIA_MS", 0)
+    jitter_ms = getattr(settings, "ORACLE_REPLAY_JITTER_MS", 0)
+    espera_ms = max(0.0, latencia_ms + random.uniform(-jitter_ms, jitter_ms))
+    if conexion.call_timeout and espera_ms > conexion.call_timeout:
+        time.sleep(conexion.call_timeout / 1000)
+        raise oracledb.DatabaseError(_ErrorSimulado('DPY-4024', f"call timeout of {conexion.call_timeout} ms exceeded"))
+    if espera_ms:
+        time.sleep(espera_ms / 1000)
+
+
+class CursorReplay:
+    """Cursor con la interfaz que usan oracle_exec y el pool; las filas salen de los fixtures."""
+
+    def __init__(self, conexion):
+        self.connection = conexion
+        self.arraysize = 100
+        self.prefetchrows = 2
+        self.outputtypehandler = None
+        self.rowfactory = None
+        self.description = None
+        self._filas = []
+        self._posicion = 0
+        self._implicitos = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self._filas = []
+
+    def _abrir(self, nombre, parametros):
+        fixture = cargar_fixture(nombre, parametros)
+        if fixture is None:
+            if getattr(settings, "ORACLE_REPLAY_ESTRICTO", False):
+                raise LookupError(f"Sin fixture para {nombre}{tuple(parametros)} en {directorio_fixtures()}")
+            logger.warning("Sin fixture para %s %s: cursor sin abrir", nombre, parametros)
+            fixture = (None, [])
+        self.description, self._filas = fixture
+        self._posicion = 0
+
+    def callproc(self, nombre, parametros):
+        _ida_y_vuelta(self.connection)
+        cursor = parametros[-1]
+        cursor._abrir(nombre, list(parametros[:-1]))
+
+    def execute(self, sql, binds=None):
+        _ida_y_vuelta(self.connection)
+        self._implicitos = []
+        for nombre, parametros in llamadas_lote(sql, binds or {}):
+            cursor = CursorReplay(self.connection)
+            cursor._abrir(nombre, parametros)
+            self._implicitos.append(cursor)
+
+    def getimplicitresults(self):
+        return self._implicitos
+
+    def _convertir(self, filas):
+        if self.rowfactory is None:
+            return list(filas)
+        return [self.rowfactory(*fila) for fila in filas]
+
+    def fetchmany(self, num_filas=None):
+        num_filas = num_filas or self.arraysize
+        filas = self._filas[self._posicion:self._posicion + num_filas]
+        self._posicion += len(filas)
+        return self._convertir(filas)
+
+    def fetchall(self):
+        filas = self._filas[self._posicion:]
+        self._posicion = len(self._filas)
+        return self._convertir(filas)
+
+    def fetchone(self):
+        filas = self.fetchmany(1)
+        return filas[0] if filas else None
+
+    def __iter__(self):
+        #? Como el cursor real: recorre las filas pendientes en lotes de arraysize
+        while filas := self.fetchmany():
+            yield from filas
+
+
+class ConexionReplay:
+    def __init__(self, pool):
+        self._pool = pool
+        self.call_timeout = 0
+        self.outputtypehandler = None
+
+    def cursor(self):
+        return CursorReplay(self)
+
+    def ping(self):
+        _ida_y_vuelta(self)
+
+    def close(self):
+        #? Igual que una conexión del pool real: close() la devuelve al pool
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.release(self)
+
+
+class PoolReplay:
+    """
+    Sustituto de oracledb.ConnectionPool (misma interfaz que usa oracle_pool): 'max'
+    sesiones simultáneas y, al agotarse, espera hasta wait_timeout_ms y falla con DPY-4005
+    como el pool real, así las cuotas, el 503 y el deadline se comportan igual.
+    """
+
+    def __init__(self, conf):
+        self.min = conf['min']
+        self.max = conf['max']
+        self._espera_s = conf['wait_timeout_ms'] / 1000 if conf['getmode'] == 'timedwait' else None
+        self._sin_espera = conf['getmode'] == 'nowait'
+        self._disponibles = threading.BoundedSemaphore(self.max)
+        self._lock = threading.Lock()
+        self.busy = 0
+        self.opened = self.min
+
+    def acquire(self):
+        if self._sin_espera:
+            obtenida = self._disponibles.acquire(blocking=False)
+        else:
+            obtenida = self._disponibles.acquire(timeout=self._espera_s)
+        if not obtenida:
+            raise oracledb.DatabaseError(_ErrorSimulado('DPY-4005', "timed out waiting for the connection pool"))
+        with self._lock:
+            self.busy += 1
+            self.opened = max(self.opened, self.busy)
+        return ConexionReplay(self)
+
+    def release(self, conexion):
+        conexion._pool = None
+        with self._lock:
+            self.busy -= 1
+        self._disponibles.release()
+
+    def close(self, force=False):
+        pass
+
+
+# Grabación
+
+class CursorGrabador:
+    """Envuelve un cursor real: deja pasar todo y graba lo que se lee de los REF CURSOR."""
+
+    def __init__(self, cursor):
+        object.__setattr__(self, '_cursor', cursor)
+        object.__setattr__(self, 'rowfactory', None)
+        object.__setattr__(self, '_llamada', None)
+        object.__setattr__(self, '_lote', [])
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __setattr__(self, nombre, valor):
+        #? La rowfactory se aplica aquí para grabar las tuplas originales
+        if nombre == 'rowfactory':
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self._cursor, nombre, valor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def callproc(self, nombre, parametros):
+        reales = [p._cursor if isinstance(p, CursorGrabador) else p for p in parametros]
+        entrada = [p for p in parametros if not isinstance(p, CursorGrabador)]
+        resultado = self._cursor.callproc(nombre, reales)
+        for p in parametros:
+            if isinstance(p, CursorGrabador):
+                object.__setattr__(p, '_llamada', (nombre, entrada))
+        return resultado
+
+    def execute(self, sql, binds=None):
+        resultado = self._cursor.execute(sql, binds) if binds is not None else self._cursor.execute(sql)
+        object.__setattr__(self, '_lote', llamadas_lote(sql, binds or {}))
+        return resultado
+
+    def getimplicitresults(self):
+        cursores = []
+        for llamada, cursor in zip(self._lote, self._cursor.getimplicitresults()):
+            grabador = CursorGrabador(cursor)
+            object.__setattr__(grabador, '_llamada', llamada)
+            cursores.append(grabador)
+        return cursores
+
+    def _grabar(self, filas, parcial):
+        if self._llamada is not None:
+            try:
+                guardar_fixture(*self._llamada, self._cursor.description, filas, parcial=parcial)
+            except Exception as e:
+                logger.warning("No se pudo grabar el fixture de %s: %s", self._llamada[0], e)
+        if self.rowfactory is None:
+            return filas
+        return [self.rowfactory(*fila) for fila in filas]
+
+    def fetchall(self):
+        return self._grabar(self._cursor.fetchall(), parcial=False)
+
+    def fetchmany(self, num_filas=None):
+        filas = self._cursor.fetchmany(num_filas) if num_filas else self._cursor.fetchmany()
+        return self._grabar(filas, parcial=True)
+
+    def __iter__(self):
+        #? Se lee todo para grabar el fixture completo del cursor
+        return iter(self.fetchall())
+
+
+class ConexionGrabadora:
+    """Envuelve una conexión del pool real para que sus cursores graben fixtures."""
+
+    def __init__(self, conexion):
+        object.__setattr__(self, '_conexion', conexion)
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def __setattr__(self, nombre, valor):
+        setattr(self._conexion, nombre, valor)
+
+    def cursor(self):
+        return CursorGrabador(self._conexion.cursor())
@@ -0,0 +1,156 @@
+# plan_pagos.py
+#? Procesamiento de las filas de detalle SP_PLANPAGOS* (todas las líneas de producto):
+#? el plan de pagos llega como columnas de texto con un valor por cuota separado por ';'.
+from decimal import Decimal
+
+from .flujos import Diferido, Flujo
+from .numeros import parse_numero
+
+#? Columnas del plan, en el orden de las claves de cada cuota
+COLUMNAS_PLAN = (
+    'NO', 'FECHA', 'ABONO_CAPITAL', 'ABONO_INTERES', 'SEGURO_VIDA',
+    'OTROS_CONCEPTOS', 'CAPITALIZACION', 'VALOR_CUOTA', 'SALDO_PARCIAL',
+)
+
+#? Columnas numéricas (las que se formatean y suman en la tabla del PDF)
+COLUMNAS_NUMERICAS = COLUMNAS_PLAN[2:]
+
+_INDICE = {columna: i for i, columna in enumerate(COLUMNAS_PLAN)}
+
+
+class PlanPago:
+    """
+    Plan de pagos por columnas: una tupla de textos por columna de COLUMNAS_PLAN, todas
+    de largo num_cuotas, en vez de una lista con un dict de 9 claves por cuota.
+    El render y los totales leen las columnas directamente; iterar o indexar con un
+    entero entrega la cuota como dict, igual que la lista anterior.
+    """
+
+    __slots__ = ('columnas', 'num_cuotas', '_totales')
+
+    def __init__(self, columnas):
+        self.columnas = tuple(columnas)
+        self.num_cuotas = len(self.columnas[0]) if self.columnas else 0
+        self._totales = None
+
+    def __len__(self):
+        return self.num_cuotas
+
+    def __bool__(self):
+        return self.num_cuotas > 0
+
+    def columna(self, nombre):
+        return self.columnas[_INDICE[nombre]]
+
+    def filas(self, inicio=0, fin=None):
+        """Tuplas (NO, FECHA, ...) de las cuotas [inicio, fin), sin armar dicts."""
+        return zip(*(valores[inicio:fin] for valores in self.columnas))
+
+    def cuota(self, i):
+        return dict(zip(COLUMNAS_PLAN, (valores[i] for valores in self.columnas)))
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return PlanPago(valores[i] for valores in self.columnas)
+        return self.cuota(i)
+
+    def __iter__(self):
+        for fila in self.filas():
+            yield dict(zip(COLUMNAS_PLAN, fila))
+
+    def totales(self):
+        """Suma (Decimal) de cada columna numérica; se calcula una vez por plan."""
+        if self._totales is None:
+            self._totales = {
+                columna: sum((parse_numero(v) for v in self.columna(columna) if v), Decimal(0))
+                for columna in COLUMNAS_NUMERICAS
+            }
+        return self._totales
+
+    def fecha_ultima(self):
+        for fecha in reversed(self.columna('FECHA')):
+            if fecha:
+                return fecha
+        return None
+
+    def valor_cuota(self):
+        """VALOR_CUOTA de la cuota 1 o, si no lo tiene, el primero no vacío."""
+        primero = None
+        for no, valor in zip(self.columna('NO'), self.columna('VALOR_CUOTA')):
+            if valor:
+                if no == '1':
+                    return valor
+                if primero is None:
+                    primero = valor
+        return primero
+
+    def __eq__(self, otro):
+        if isinstance(otro, PlanPago):
+            return self.columnas == otro.columnas
+        return NotImplemented
+
+    __hash__ = None
+
+    def __reduce__(self):
+        #? Para la caché compartida: se guardan solo las columnas (los totales se recalculan)
+        return (PlanPago, (self.columnas,))
+
+
+def armar_plan_pago(row):
+    """
+    PlanPago de la fila: una cuota por valor de NO, valores sin espacios, '' donde la
+    columna trae menos valores y sin los valores de más de otras columnas.
+    """
+    columnas = [str(row.get(columna, '')).split(';') for columna in COLUMNAS_PLAN]
+    num_cuotas = len(columnas[0])
+    plan = []
+    for valores in columnas:
+        if len(valores) < num_cuotas:
+            valores.extend([''] * (num_cuotas - len(valores)))
+        plan.append(tuple(map(str.strip, valores[:num_cuotas])))
+    return PlanPago(plan)
+
+
+def _plan_de(flujo, respaldo):
+    return armar_plan_pago(flujo)
+
+
+def _fecha_ultima_de(flujo, respaldo):
+    return flujo['PLAN_PAGO'].fecha_ultima() or respaldo
+
+
+def _valor_cuota_de(flujo, respaldo):
+    return flujo['PLAN_PAGO'].valor_cuota() or respaldo
+
+
+#? El plan no tiene respaldo: un solo Diferido para todas las filas
+_PLAN_DIFERIDO = Diferido(_plan_de)
+
+
+def procesar_flujos(all_rows):
+    """
+    Normaliza las filas del SP de detalle (None -> '', MAIL por defecto) y agrega
+    PLAN_PAGO (PlanPago), FECHAULTIMA y VALORCUOTA a cada una. Modifica y retorna 'all_rows'.
+    En un Flujo los tres se calculan al leerlos: las filas que no se usan (o de las que
+    solo se leen datos del encabezado) no arman el plan.
+    """
+    for row in all_rows:
+        for key, value in row.items():
+            if value is None:
+                row[key] = ''
+
+        if not row.get('MAIL'):
+            row['MAIL'] = 'no-email@example.com'
+
+        if isinstance(row, Flujo):
+            row['PLAN_PAGO'] = _PLAN_DIFERIDO
+            row['FECHAULTIMA'] = Diferido(_fecha_ultima_de, row.get('FECHAULTIMA', 'N/A'))
+            row['VALORCUOTA'] = Diferido(_valor_cuota_de, row.get('VALORCUOTA', 'N/A'))
+            continue
+
+        plan_pago = armar_plan_pago(row)
+        row['PLAN_PAGO'] = plan_pago
+        row['FECHAULTIMA'] = _fecha_ultima_de(row, row.get('FECHAULTIMA', 'N/A'))
+        row['VALORCUOTA'] = _valor_cuota_de(row, row.get('VALORCUOTA', 'N/A'))
+
+    return all_rows
@@ -0,0 +1,120 @@
+# prefetch.py
+#? Precarga de los detalles SP_PLANPAGOS* de los pagarés recién listados: n8n pide el
+#? PDF de cada uno segundos después, y así GenerarPDF no espera a Oracle.
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .cache import cache_detalles
+from .negativos import Fallo, consultar_lote
+
+logger = logging.getLogger(__name__)
+
+#? Partición del pool (ORACLE_POOL_CUOTAS) de la precarga: nunca ocupa más que su cuota
+PARTICION_PREFETCH = 'prefetch'
+
+
+def prefetch_activo():
+    return getattr(settings, "PREFETCH_DETALLES", False)
+
+
+def _ttl():
+    return getattr(settings, "PREFETCH_TTL_S", 120)
+
+
+class PrefetchDetalles:
+    """
+    Cola acotada de precargas por worker. Cada tarea trae un bloque de pagarés con una
+    sola llamada en lote (negativos.consultar_lote) y guarda los flujos ya procesados
+    en cache_detalles, de donde GenerarPDF los toma una sola vez. La caché es del worker
+    salvo con PREFETCH_CACHE_COMPARTIDA.
+    """
+
+    def __init__(self):
+        self._reiniciar()
+        os.register_at_fork(after_in_child=self._reiniciar)
+
+    def _reiniciar(self):
+        self._ejecutor = None
+        self._lock = threading.Lock()
+        self._en_curso = set()
+        self._contadores = {"programados": 0, "descartados": 0, "cargados": 0, "errores": 0, "usados": 0, "ausentes": 0}
+
+    def _get_ejecutor(self):
+        if self._ejecutor is None:
+            self._ejecutor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "PREFETCH_HILOS", 1),
+                thread_name_prefix='prefetch',
+            )
+        return self._ejecutor
+
+    def programar(self, procedimiento, pagares, procesar):
+        """Encola la precarga de los pagarés que no estén ya en caché o en curso."""
+        if not prefetch_activo():
+            return 0
+        ttl = _ttl()
+        maximo = getattr(settings, "PREFETCH_MAX_PENDIENTES", 500)
+        candidatos = [(procedimiento, p) for p in dict.fromkeys(pagares) if p]
+        #? Ya precargados por este u otro worker (nivel compartido de la caché)
+        vigentes = cache_detalles.vigentes(candidatos, ttl)
+        with self._lock:
+            nuevos = [clave[1] for clave in candidatos if clave not in self._en_curso and clave not in vigentes]
+            cupo = max(0, maximo - len(self._en_curso))
+            self._contadores["descartados"] += max(0, len(nuevos) - cupo)
+            nuevos = nuevos[:cupo]
+            self._en_curso.update((procedimiento, p) for p in nuevos)
+            self._contadores["programados"] += len(nuevos)
+            ejecutor = self._get_ejecutor()
+
+        tamano = max(1, getattr(settings, "ORACLE_LOTE_MAX", 50))
+        for i in range(0, len(nuevos), tamano):
+            ejecutor.submit(self._cargar, procedimiento, nuevos[i:i + tamano], procesar)
+        if nuevos:
+            logger.info("Prefetch %s: %s pagarés encolados", procedimiento, len(nuevos))
+        return len(nuevos)
+
+    def _cargar(self, procedimiento, pagares, procesar):
+        try:
+            #? Sin los pagarés en la caché negativa; un fallo de uno no descarta el lote
+            resultados = consultar_lote(procedimiento, pagares, particion=PARTICION_PREFETCH)
+            for pagare, filas in zip(pagares, resultados):
+                #? Sin filas (o con error) no se guarda nada: la petición del PDF responde
+                #? desde la caché negativa
+                if not isinstance(filas, Fallo):
+                    cache_detalles.guardar((procedimiento, pagare), procesar(filas), _ttl())
+            with self._lock:
+                self._contadores["cargados"] += len(pagares)
+        except Exception as e:
+            logger.warning("Prefetch %s falló para %s pagarés: %s", procedimiento, len(pagares), e)
+            with self._lock:
+                self._contadores["errores"] += 1
+        finally:
+            with self._lock:
+                self._en_curso.difference_update((procedimiento, p) for p in pagares)
+            #? El hilo no pasa por el ciclo de petición: se cierra su conexión a Postgres (caché compartida)
+            close_old_connections()
+
+    def tomar(self, procedimiento, pagare):
+        """Flujos precargados del pagaré si siguen vigentes (se retiran de la caché), o None."""
+        if not prefetch_activo() or not pagare:
+            return None
+        flujos = cache_detalles.tomar((procedimiento, pagare), _ttl())
+        with self._lock:
+            self._contadores["usados" if flujos is not None else "ausentes"] += 1
+        return flujos
+
+    async def tomar_async(self, procedimiento, pagare):
+        """tomar() para vistas async: el nivel compartido usa el ORM, que no corre en el event loop."""
+        return await sync_to_async(self.tomar)(procedimiento, pagare)
+
+    def estadisticas(self):
+        with self._lock:
+            return {"activo": prefetch_activo(), "en_curso": len(self._en_curso), **self._contadores}
+
+
+prefetch_detalles = PrefetchDetalles()
@@ -0,0 +1,35 @@
+# respuestas.py
+from django.conf import settings
+from django.http import JsonResponse
+from rest_framework import status
+
+
+def respuesta_pool_saturado(exc):
+    """503 con Retry-After cuando el pool Oracle no entrega conexión a tiempo (PoolSaturadoError)."""
+    response = JsonResponse(
+        {"error": "SERVICIO_SATURADO", "detail": str(exc)},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+    response['Retry-After'] = str(exc.retry_after)
+    return response
+
+
+def respuesta_deadline_agotado(exc):
+    """504 cuando la petición agotó su deadline (DeadlineAgotadoError) antes de terminar."""
+    return JsonResponse(
+        {"error": "DEADLINE_AGOTADO", "etapa": exc.etapa, "detail": str(exc)},
+        status=status.HTTP_504_GATEWAY_TIMEOUT,
+    )
+
+
+def respuesta_generacion_en_curso(obligacion):
+    """409 con Retry-After cuando otro worker sigue generando el PDF de la misma obligación."""
+    response = JsonResponse(
+        {
+            "error": "GENERACION_EN_CURSO",
+            "detail": f"El PDF para la obligación {obligacion} se está generando en otra petición.",
+        },
+        status=status.HTTP_409_CONFLICT,
+    )
+    response['Retry-After'] = str(getattr(settings, "PDF_BLOQUEO_RETRY_AFTER_S", 15))
+    return response
@@ -0,0 +1,87 @@
+import json
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from API.oracle_exec import estadisticas_procedimientos
+from API.views import ValidarAsociado, ValidarAsociadoLote
+
+from .utils import OracleReplayMixin
+
+
+def llamadas_oracle():
+    return estadisticas_procedimientos()['SP_CONSULTACAPA']['total_ms']['total']
+
+
+@override_settings(ASOCIADO_CACHE_TTL_S=300, ASOCIADO_CACHE_TTL_NO_S=30)
+class ValidarAsociadoCacheTests(OracleReplayMixin, SimpleTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.grabar('SP_CONSULTACAPA', ['123'], [{'CEDULA': '123', 'NOMBRE': 'ASOCIADO'}])
+        self.ahora = 1000.0
+        reloj = mock.patch('API.cache.time.time', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def _get(self, cedula, **cabeceras):
+        request = APIRequestFactory().get(f'/api/validar-asociado/{cedula}/', headers=cabeceras)
+        return ValidarAsociado.as_view()(request, identificacion=cedula)
+
+    def test_miss_hit_y_bypass(self):
+        estados = [self._get('123')['X-Cache'], self._get('123')['X-Cache']]
+        bypass = self._get('123', **{'Cache-Control': 'no-cache'})
+        estados.append(bypass['X-Cache'])
+
+        self.assertEqual(estados, ['MISS', 'HIT', 'BYPASS'])
+        self.assertEqual(json.loads(bypass.content), {'CEDULA': '123', 'NOMBRE': 'ASOCIADO'})
+        self.assertEqual(llamadas_oracle(), 2)
+        #? El BYPASS refrescó la entrada
+        self.assertEqual(self._get('123')['X-Cache'], 'HIT')
+
+    def test_los_no_duran_menos(self):
+        self.assertEqual(json.loads(self._get('999').content), {'respuesta': 'NO'})
+        self._get('123')
+        self.ahora += 31
+
+        no_asociado, asociado = self._get('999'), self._get('123')
+
+        self.assertEqual((no_asociado['X-Cache'], asociado['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(asociado['Age'], '31')
+
+    def test_post_sin_cedula(self):
+        request = APIRequestFactory().post('/api/validar-asociado/', {}, format='json')
+        self.assertEqual(ValidarAsociado.as_view()(request).status_code, 400)
+
+
+@override_settings(ASOCIADO_LOTE_MAX=3, ASOCIADO_LOTE_HILOS=2)
+class ValidarAsociadoLoteTests(OracleReplayMixin, SimpleTestCase):
+
+    def _post(self, cedulas):
+        request = APIRequestFactory().post('/api/validar-asociado-lote/', {'cedulas': cedulas}, format='json')
+        return ValidarAsociadoLote.as_view()(request)
+
+    def test_una_linea_por_cedula_distinta(self):
+        self.grabar('SP_CONSULTACAPA', ['123'], [{'CEDULA': '123', 'NOMBRE': 'ASOCIADO'}])
+
+        response = self._post(['123', ' 123 ', '999', 456, None, ''])
+        lineas = [json.loads(linea) for linea in b''.join(response.streaming_content).splitlines()]
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(response['X-Total-Cedulas'], '3')
+        por_cedula = {linea['cedula']: linea for linea in lineas}
+        self.assertEqual(len(lineas), 3)
+        self.assertEqual(por_cedula['123']['respuesta'], 'SI')
+        self.assertEqual(por_cedula['123']['asociado'], {'CEDULA': '123', 'NOMBRE': 'ASOCIADO'})
+        self.assertEqual((por_cedula['999']['respuesta'], por_cedula['456']['respuesta']), ('NO', 'NO'))
+        self.assertEqual({linea['cache'] for linea in lineas}, {'MISS'})
+        #? La validación individual aprovecha lo que cacheó el lote
+        individual = ValidarAsociado.as_view()(APIRequestFactory().get('/api/validar-asociado/123/'),
+                                               identificacion='123')
+        self.assertEqual(individual['X-Cache'], 'HIT')
+
+    def test_lista_vacia_o_demasiadas_cedulas(self):
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post('123').status_code, 400)
+        self.assertEqual(self._post(['1', '2', '3', '4', '1']).status_code, 400)
@@ -0,0 +1,50 @@
+import json
+import time
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from API.bloqueos import _espera_maxima, bloqueo_generacion, clave_bloqueo, intentar_bloqueo, liberar_bloqueo
+from API.deadline import establecer_deadline, restablecer_deadline
+from API.views import GenerarPDF
+
+
+class EsperaMaximaTests(SimpleTestCase):
+
+    def test_por_defecto_corta(self):
+        self.assertLessEqual(_espera_maxima(), 5)
+
+    @override_settings(PDF_BLOQUEO_ESPERA_S=30)
+    def test_acotada_por_el_deadline(self):
+        token = establecer_deadline(2)
+        try:
+            self.assertLessEqual(_espera_maxima(), 2)
+        finally:
+            restablecer_deadline(token)
+
+
+@override_settings(PDF_BLOQUEO_ESPERA_S=1, PDF_BLOQUEO_RETRY_AFTER_S=15)
+class GeneracionEnCursoTests(TestCase):
+    """El lock lo tiene otra petición: GenerarPDF no llega a consultar el historial ni Oracle."""
+
+    def setUp(self):
+        clave = clave_bloqueo("pdf:API:111")
+        self.assertTrue(intentar_bloqueo(clave))
+        self.addCleanup(liberar_bloqueo, clave)
+
+    def test_responde_409_con_retry_after(self):
+        inicio = time.monotonic()
+        response = GenerarPDF.as_view()(APIRequestFactory().get('/api/generar-pdf/10-111/'), obligacion='10-111')
+        espera = time.monotonic() - inicio
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '15')
+        self.assertEqual(json.loads(response.content)['error'], 'GENERACION_EN_CURSO')
+        #? Esperó PDF_BLOQUEO_ESPERA_S, no los 30 s de antes
+        self.assertLess(espera, 3)
+
+    def test_sin_espera(self):
+        inicio = time.monotonic()
+        with bloqueo_generacion("pdf:API", "111", espera_s=0) as lider:
+            self.assertFalse(lider)
+        self.assertLess(time.monotonic() - inicio, 0.5)
@@ -0,0 +1,136 @@
+import json
+import threading
+import time
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from API.cache import CacheTTL
+from API.views import ListarFlujosPendientes
+
+from .utils import OracleReplayMixin
+
+
+class CacheTTLTests(SimpleTestCase):
+
+    def setUp(self):
+        self.cache = CacheTTL('pruebas', compartida=False)
+        self.ahora = 1000.0
+        reloj = mock.patch('API.cache.time.time', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def test_hit_hasta_que_vence(self):
+        cargar = mock.Mock(side_effect=['uno', 'dos'])
+
+        primero = self.cache.obtener('clave', cargar, 60)
+        self.ahora += 59
+        segundo = self.cache.obtener('clave', cargar, 60)
+        self.ahora += 1
+        tercero = self.cache.obtener('clave', cargar, 60)
+
+        self.assertEqual((primero.valor, primero.estado), ('uno', 'MISS'))
+        self.assertEqual((segundo.valor, segundo.estado, segundo.edad_s), ('uno', 'HIT', 59))
+        self.assertEqual((tercero.valor, tercero.estado), ('dos', 'MISS'))
+        self.assertEqual(cargar.call_count, 2)
+
+    def test_refrescar_no_mira_la_cache(self):
+        self.cache.obtener('clave', lambda: 'viejo', 60)
+        resultado = self.cache.obtener('clave', lambda: 'nuevo', 60, refrescar=True)
+
+        self.assertEqual((resultado.valor, resultado.estado), ('nuevo', 'BYPASS'))
+        self.assertEqual(self.cache.obtener('clave', lambda: 'otro', 60).valor, 'nuevo')
+
+    def test_ttl_por_valor(self):
+        ttl = lambda valor: 10 if valor else 100  # noqa: E731
+        self.cache.obtener('vacio', lambda: [], ttl)
+        self.cache.obtener('lleno', lambda: [1], ttl)
+        self.ahora += 50
+
+        self.assertEqual(self.cache.vigentes(['vacio', 'lleno'], ttl), {'vacio'})
+
+    def test_errores_no_se_guardan(self):
+        with self.assertRaises(ValueError):
+            self.cache.obtener('clave', mock.Mock(side_effect=ValueError), 60)
+        self.assertEqual(self.cache.obtener('clave', lambda: 'ok', 60).estado, 'MISS')
+
+    @override_settings(CACHE_LOCAL_MAX_ENTRADAS=2)
+    def test_lru_acotado(self):
+        for clave in ('a', 'b', 'c'):
+            self.cache.guardar(clave, clave, 60)
+        self.assertEqual(self.cache.vigentes(['a', 'b', 'c'], 60), {'b', 'c'})
+
+    def test_estadisticas(self):
+        self.cache.obtener(('SP_X', '1'), lambda: 1, 60)
+        self.cache.obtener(('SP_X', '1'), lambda: 1, 60)
+
+        datos = self.cache.estadisticas()['procedimientos']['SP_X']
+        self.assertEqual((datos['miss'], datos['hit'], datos['tasa_acierto']), (1, 1, 0.5))
+
+
+class SingleFlightTests(SimpleTestCase):
+
+    def test_una_sola_carga_para_peticiones_simultaneas(self):
+        cache = CacheTTL('pruebas', compartida=False)
+        liberar = threading.Event()
+        cargar = mock.Mock(side_effect=lambda: liberar.wait() and 'valor')
+        estados = []
+
+        def pedir():
+            estados.append(cache.obtener('clave', cargar, 60).estado)
+
+        hilos = [threading.Thread(target=pedir) for _ in range(5)]
+        for hilo in hilos:
+            hilo.start()
+        #? Que los seguidores alcancen a encontrar la carga en curso
+        time.sleep(0.1)
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        cargar.assert_called_once()
+        self.assertEqual(sorted(estados), ['MISS'] + ['SHARED'] * 4)
+
+    def test_el_error_del_lider_llega_a_los_seguidores(self):
+        cache = CacheTTL('pruebas', compartida=False)
+        liberar = threading.Event()
+
+        def cargar():
+            liberar.wait()
+            raise ValueError("Oracle")
+
+        errores = []
+
+        def pedir():
+            try:
+                cache.obtener('clave', cargar, 60)
+            except ValueError as e:
+                errores.append(e)
+
+        hilos = [threading.Thread(target=pedir) for _ in range(3)]
+        for hilo in hilos:
+            hilo.start()
+        time.sleep(0.1)
+        liberar.set()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(errores), 3)
+        self.assertEqual(cache.obtener('clave', lambda: 'ok', 60).estado, 'MISS')
+
+
+@override_settings(PREFETCH_DETALLES=False, LISTADO_CACHE_TTL_S=60)
+class ListadoCacheadoTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_miss_y_luego_hit(self):
+        filas = [{'CEDULA': '1', 'NOMBRE': 'A', 'MAIL': 'a@example.com', 'OBLIGACION': '10-111'}]
+        #? SP_PLANPAGOS1 recibe la fecha actual: el fixture responde a cualquier parámetro
+        self.grabar('SP_PLANPAGOS1', ['*'], filas, defecto=True)
+        vista = ListarFlujosPendientes.as_view()
+
+        primera = vista(APIRequestFactory().get('/api/listar-flujos-pendientes/'))
+        segunda = vista(APIRequestFactory().get('/api/listar-flujos-pendientes/'))
+
+        self.assertEqual((primera['X-Cache'], segunda['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(json.loads(segunda.content), [dict(filas[0], PAGARE='111')])
@@ -0,0 +1,85 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+
+from django.test import AsyncRequestFactory, SimpleTestCase, TestCase, override_settings
+
+from API.cache import CacheTTL, cache_asociados, cache_detalles
+from API.views import _procesar_flujos
+from API.views_async import GenerarPDFAsync
+
+from .utils import OracleReplayMixin, fila_detalle
+
+CACHE_EN_MEMORIA = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'oracle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'pruebas-compartida'},
+}
+
+
+@override_settings(CACHES=CACHE_EN_MEMORIA)
+class NivelCompartidoTests(SimpleTestCase):
+
+    def setUp(self):
+        #? Dos workers: cada uno con su nivel local, los dos con el mismo nivel compartido
+        self.worker_1 = CacheTTL('pruebas')
+        self.worker_2 = CacheTTL('pruebas')
+        self.cargar = mock.Mock(return_value='valor')
+        self.addCleanup(self.worker_1.invalidar, 'clave')
+
+    def test_otro_worker_lee_el_nivel_compartido(self):
+        primero = self.worker_1.obtener('clave', self.cargar, 60)
+        segundo = self.worker_2.obtener('clave', self.cargar, 60)
+        tercero = self.worker_2.obtener('clave', self.cargar, 60)
+
+        self.assertEqual([r.estado for r in (primero, segundo, tercero)], ['MISS', 'HIT-DB', 'HIT'])
+        self.cargar.assert_called_once()
+
+    def test_tomar_retira_del_nivel_compartido(self):
+        self.worker_1.guardar('clave', 'valor', 60)
+        self.assertEqual(self.worker_2.tomar('clave', 60), 'valor')
+        self.assertIsNone(CacheTTL('pruebas').tomar('clave', 60))
+
+    def test_sin_nivel_compartido_sigue_con_oracle(self):
+        with mock.patch('API.cache.caches') as caches:
+            caches.__getitem__.return_value.get.side_effect = ConnectionError("Postgres caído")
+            caches.__getitem__.return_value.set.side_effect = ConnectionError("Postgres caído")
+            with self.assertLogs('API.cache', 'WARNING') as logs:
+                resultado = self.worker_1.obtener('clave', self.cargar, 0)
+
+        self.assertEqual((resultado.valor, resultado.estado), ('valor', 'MISS'))
+        self.assertIn("Caché compartida no disponible", logs.output[0])
+
+    def test_clave_compartida_con_version(self):
+        self.assertEqual(self.worker_1._clave_compartida(('SP_PLANPAGOS', '123')), 'pruebas:SP_PLANPAGOS:123')
+        versionada = CacheTTL('detalles', compartida=False, version=2)
+        self.assertEqual(versionada._clave_compartida(('SP_PLANPAGOS', '123')), 'detalles:v2:SP_PLANPAGOS:123')
+
+    def test_datos_personales_solo_en_el_worker(self):
+        #? PREFETCH_CACHE_COMPARTIDA y ASOCIADO_CACHE_COMPARTIDA en False por defecto
+        self.assertFalse(cache_detalles.compartida)
+        self.assertFalse(cache_asociados.compartida)
+
+
+@override_settings(PREFETCH_DETALLES=True, PREFETCH_TTL_S=120)
+class GenerarPDFAsyncPrecargadoTests(OracleReplayMixin, TestCase):
+    ajustes_oracle = {'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        #? La tabla de la migración 0003: el nivel compartido usa el ORM
+        'oracle': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'oracle_cache'},
+    }}
+
+    async def test_usa_el_detalle_precargado_sin_consultar_oracle(self):
+        with mock.patch.object(cache_detalles, 'compartida', True), \
+                mock.patch('API.views_async.ejecutar_procedimiento_async', new_callable=mock.AsyncMock) as oracle:
+            await sync_to_async(cache_detalles.guardar)(
+                ('SP_PLANPAGOS', '111'), _procesar_flujos([fila_detalle('10-111')]), 120
+            )
+            #? Otro worker: solo el nivel compartido tiene la entrada
+            cache_detalles._reiniciar()
+
+            request = AsyncRequestFactory().get('/api/async/generar-pdf/10-111/')
+            response = await GenerarPDFAsync.as_view()(request, obligacion='10-111')
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        oracle.assert_not_awaited()
@@ -0,0 +1,131 @@
+import asyncio
+import json
+import time
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from API import oracle_async
+from API.deadline import (
+    DeadlineAgotadoError,
+    DeadlineMiddleware,
+    deadline_para,
+    establecer_deadline,
+    restablecer_deadline,
+    tiempo_restante,
+)
+from API.models import HistorialPDFs
+from API.oracle_async import _adquirir_del_pool_async
+from API.oracle_pool import PoolSaturadoError, acquire_connection
+from API.views import GenerarPDF, ValidarAsociado
+
+from .utils import OracleReplayMixin, fila_detalle
+
+
+def con_deadline(vista, ruta, timeout, **kwargs):
+    """GET a la vista pasando por DeadlineMiddleware con la cabecera X-Request-Timeout."""
+    request = RequestFactory().get(ruta, headers={'X-Request-Timeout': timeout})
+    return DeadlineMiddleware(lambda request: vista(request, **kwargs))(request)
+
+
+@override_settings(REQUEST_DEADLINE_S=55, REQUEST_DEADLINE_MAX_S=115, REQUEST_DEADLINE_RUTAS={'generar-pdf': 115})
+class DeadlineParaTests(SimpleTestCase):
+
+    def _deadline(self, ruta, **cabeceras):
+        return deadline_para(RequestFactory().get(ruta, headers=cabeceras))
+
+    def test_por_ruta_y_por_defecto(self):
+        self.assertEqual(self._deadline('/api/generar-pdf/10-1/'), 115)
+        self.assertEqual(self._deadline('/api/validar-asociado/1/'), 55)
+
+    def test_cabecera_acotada(self):
+        self.assertEqual(self._deadline('/api/validar-asociado/1/', **{'X-Request-Timeout': '2.5'}), 2.5)
+        self.assertEqual(self._deadline('/api/validar-asociado/1/', **{'X-Request-Timeout': '600'}), 115)
+        self.assertEqual(self._deadline('/api/validar-asociado/1/', **{'X-Request-Timeout': 'ya'}), 55)
+
+
+class DeadlineMiddlewareTests(SimpleTestCase):
+    request = RequestFactory().get('/api/validar-asociado/1/', headers={'X-Request-Timeout': '10'})
+
+    def test_fija_y_restablece_el_deadline(self):
+        vistos = []
+        middleware = DeadlineMiddleware(lambda request: vistos.append(tiempo_restante()))
+
+        middleware(self.request)
+
+        self.assertTrue(9 < vistos[0] <= 10)
+        self.assertIsNone(tiempo_restante())
+
+    async def test_variante_async(self):
+        vistos = []
+
+        async def get_response(request):
+            vistos.append(tiempo_restante())
+
+        await DeadlineMiddleware(get_response)(self.request)
+
+        self.assertTrue(9 < vistos[0] <= 10)
+        self.assertIsNone(tiempo_restante())
+
+
+@override_settings(ORACLE_POOL_MAX=1, ORACLE_POOL_WAIT_TIMEOUT_MS=5000, ORACLE_POOL_CUOTAS={})
+class EtapaPoolTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_espera_del_pool_recortada_al_deadline(self):
+        self.grabar('SP_CONSULTACAPA', ['1'], [{'CEDULA': '1'}])
+        with acquire_connection():
+            inicio = time.monotonic()
+            response = con_deadline(ValidarAsociado.as_view(), '/api/validar-asociado/1/', '0.2',
+                                    identificacion='1')
+            espera = time.monotonic() - inicio
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(json.loads(response.content)['etapa'], 'pool')
+        #? No esperó ORACLE_POOL_WAIT_TIMEOUT_MS (5 s) sino lo que le quedaba a la petición
+        self.assertLess(espera, 2)
+
+
+class PoolLento:
+    """Pool async que nunca entrega una sesión."""
+
+    async def acquire(self):
+        await asyncio.sleep(10)
+
+
+@override_settings(ORACLE_POOL_GETMODE='timedwait', ORACLE_POOL_WAIT_TIMEOUT_MS=5000)
+class AdquirirAsyncTests(SimpleTestCase):
+
+    def setUp(self):
+        parche = mock.patch.object(oracle_async, 'get_pool_async', return_value=PoolLento())
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    async def test_espera_recortada_al_deadline(self):
+        token = establecer_deadline(0.1)
+        try:
+            inicio = time.monotonic()
+            with self.assertRaises(DeadlineAgotadoError) as error:
+                await _adquirir_del_pool_async()
+        finally:
+            restablecer_deadline(token)
+        self.assertEqual(error.exception.etapa, 'pool')
+        self.assertLess(time.monotonic() - inicio, 2)
+
+    @override_settings(ORACLE_POOL_WAIT_TIMEOUT_MS=50)
+    async def test_sin_deadline_agota_el_wait_timeout(self):
+        with self.assertRaises(PoolSaturadoError):
+            await _adquirir_del_pool_async()
+
+
+class EtapaRenderTests(OracleReplayMixin, TestCase):
+
+    def test_render_que_agota_el_deadline(self):
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111', cuotas=40)])
+        #? Cada encabezado tarda más de lo que le queda a la petición
+        with mock.patch.object(GenerarPDF, '_draw_header', side_effect=lambda *args: time.sleep(0.3)):
+            response = con_deadline(GenerarPDF.as_view(), '/api/generar-pdf/10-111/', '0.2',
+                                    obligacion='10-111')
+
+        self.assertEqual(response.status_code, 504)
+        self.assertEqual(json.loads(response.content)['etapa'], 'render')
+        self.assertFalse(HistorialPDFs.objects.exists())
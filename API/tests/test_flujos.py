@@ -0,0 +1,83 @@
+import pickle
+
+from django.test import SimpleTestCase
+
+from API.flujos import Flujo, FlujoResumen, resumen_json, resumen_listado, tipo_flujo
+
+COLUMNAS = ('CEDULA', 'NOMBRE', 'MAIL', 'OBLIGACION', 'VALOR-CUOTA')
+
+
+def flujo(*valores, columnas=COLUMNAS):
+    """Fila como la arma el cursor con row_factory='flujo'."""
+    return tipo_flujo(columnas)(*valores)
+
+
+class FlujoTests(SimpleTestCase):
+
+    def test_interfaz_de_dict(self):
+        fila = flujo('1', 'ANA', 'ana@example.com', '10', '5.000')
+
+        self.assertEqual(fila['NOMBRE'], 'ANA')
+        #? Las columnas que no son identificadores van a un slot posicional
+        self.assertEqual(fila['VALOR-CUOTA'], '5.000')
+        self.assertEqual(fila.get('NO_EXISTE', 'x'), 'x')
+        self.assertEqual(list(fila), list(COLUMNAS))
+        self.assertEqual(len(fila), 5)
+        self.assertEqual(fila, dict(zip(COLUMNAS, ('1', 'ANA', 'ana@example.com', '10', '5.000'))))
+        with self.assertRaises(KeyError):
+            fila['NO_EXISTE']
+
+    def test_campos_agregados(self):
+        fila = flujo('1', 'ANA', 'ana@example.com', '10', '5.000')
+
+        #? Los campos agregados sin asignar no son claves
+        self.assertNotIn('PAGARE', fila)
+        self.assertIsNone(fila.get('PAGARE'))
+        with self.assertRaises(KeyError):
+            fila['PAGARE']
+        fila['PAGARE'] = 'P-10'
+        self.assertEqual(fila['PAGARE'], 'P-10')
+        self.assertEqual(list(fila)[-1], 'PAGARE')
+        #? Solo se pueden asignar sus campos
+        with self.assertRaises(KeyError):
+            fila['OTRO'] = 1
+
+    def test_una_clase_por_forma_de_cursor(self):
+        self.assertIs(type(flujo(*'12345')), type(flujo(*'abcde')))
+        self.assertIsNot(type(flujo('1', columnas=('CEDULA',))), type(flujo(*'12345')))
+        self.assertFalse(hasattr(flujo(*'12345'), '__dict__'))
+
+    def test_columnas_repetidas(self):
+        with self.assertRaisesMessage(ValueError, 'CEDULA'):
+            tipo_flujo(('CEDULA', 'NOMBRE', 'CEDULA'))
+
+    def test_pickle(self):
+        fila = flujo('1', 'ANA', 'ana@example.com', '10', '5.000')
+        fila['PAGARE'] = 'P-10'
+        copia = pickle.loads(pickle.dumps(fila))
+
+        self.assertIsInstance(copia, Flujo)
+        self.assertIs(type(copia), type(fila))
+        self.assertEqual(copia, fila)
+
+
+class ResumenListadoTests(SimpleTestCase):
+
+    def test_flujos_y_dicts(self):
+        con_pagare = flujo('1', 'ANA', 'ana@example.com', '10', '5.000')
+        con_pagare['PAGARE'] = 'P-10'
+        sin_pagare = flujo('2', 'LUIS', 'luis@example.com', '20', '')
+        como_dict = {'CEDULA': '3', 'NOMBRE': 'EVA', 'MAIL': 'eva@example.com', 'OBLIGACION': '30', 'PAGARE': 'P-30'}
+
+        resumen = resumen_listado([con_pagare, sin_pagare, como_dict])
+        self.assertEqual(resumen, [
+            FlujoResumen('1', 'ANA', 'ana@example.com', '10', 'P-10'),
+            #? Campo sin asignar: None, igual que get()
+            FlujoResumen('2', 'LUIS', 'luis@example.com', '20', None),
+            FlujoResumen('3', 'EVA', 'eva@example.com', '30', 'P-30'),
+        ])
+        self.assertEqual(resumen_json(resumen)[0]['PAGARE'], 'P-10')
+
+    def test_cursor_sin_todas_las_columnas(self):
+        fila = flujo('1', 'ANA', columnas=('CEDULA', 'NOMBRE'))
+        self.assertEqual(resumen_listado([fila]), [FlujoResumen('1', 'ANA', None, None, None)])
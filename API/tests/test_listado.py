@@ -0,0 +1,88 @@
+import io
+from contextlib import redirect_stdout
+
+from django.test import SimpleTestCase
+
+import API.views
+import APIComercial.views
+import APIConsumo.views
+import APIMicro.views
+from API.flujos import MAIL_POR_DEFECTO, Flujo, FlujoResumen, LecturaListado, resumen_listado, tipo_flujo
+from API.views import _LECTURA_LISTADO, _obtener_pagare
+
+from .utils import OracleReplayMixin
+
+#? Listado de cada línea de producto: (views, SP del listado)
+LISTADOS = (
+    (API.views, 'SP_PLANPAGOS1'),
+    (APIConsumo.views, 'SP_PLANPAGOSCONSUMO1'),
+    (APIComercial.views, 'SP_PLANPAGOSCOMERCIAL1'),
+    (APIMicro.views, 'SP_PLANPAGOSMICROCREDITO1'),
+)
+
+COLUMNAS = ('CEDULA', 'NOMBRE', 'MAIL', 'OBLIGACION')
+
+#? Filas del cursor: solo la primera y la última entran al listado
+FILAS = [
+    ('1', 'A', 'a@example.com', '10-111'),
+    ('2', 'B', None, '10-222'),
+    ('3', 'C', '', '10-333'),
+    ('4', 'D', MAIL_POR_DEFECTO, '10-444'),
+    (None, 'E', 'e@example.com', '10-555'),
+    ('  ', 'F', 'f@example.com', '10-666'),
+    ('7', None, 'g@example.com', None),
+]
+
+
+class LecturaListadoTests(SimpleTestCase):
+
+    def _leer(self, filas, columnas=COLUMNAS):
+        por_fila = _LECTURA_LISTADO(columnas, tipo_flujo(columnas))
+        return [f for f in map(por_fila, filas) if f is not None]
+
+    def test_descarta_sin_mail_o_cedula(self):
+        leidas = self._leer(FILAS)
+
+        self.assertEqual([f['CEDULA'] for f in leidas], ['1', '7'])
+        self.assertEqual(leidas[0]['PAGARE'], _obtener_pagare('10-111'))
+        #? None -> '' y sin OBLIGACION el PAGARE queda vacío
+        self.assertEqual(leidas[1]['NOMBRE'], '')
+        self.assertEqual(leidas[1]['OBLIGACION'], '')
+        self.assertEqual(leidas[1]['PAGARE'], '')
+
+    def test_sin_columna_mail_no_entra_ninguna(self):
+        self.assertEqual(self._leer([('1', 'A', '10-111')], columnas=('CEDULA', 'NOMBRE', 'OBLIGACION')), [])
+
+    def test_dict_y_flujo_iguales(self):
+        fila = ('1', 'A', 'a@example.com', ' 10-111 ')
+        como_dict = _LECTURA_LISTADO(COLUMNAS, lambda *valores: dict(zip(COLUMNAS, valores)))(fila)
+        como_flujo = self._leer([fila])[0]
+
+        self.assertEqual(como_flujo, como_dict)
+        self.assertEqual(como_dict['PAGARE'], _obtener_pagare(' 10-111 '))
+
+    def test_pagare_propio(self):
+        por_fila = LecturaListado(lambda obligacion: f"P{obligacion}")(COLUMNAS, tipo_flujo(COLUMNAS))
+        self.assertEqual(por_fila(('1', 'A', 'a@example.com', '5'))['PAGARE'], 'P5')
+
+
+class ListadoPorLineaTests(OracleReplayMixin, SimpleTestCase):
+    """El listado de las cuatro líneas de producto, del cursor al resumen."""
+
+    def test_resumen_del_listado(self):
+        for vistas, procedimiento in LISTADOS:
+            with self.subTest(app=vistas.__name__):
+                self.grabar(procedimiento, ['-'], FILAS, columnas=COLUMNAS, defecto=True)
+                salida = io.StringIO()
+                with redirect_stdout(salida):
+                    filas = vistas._obtener_datos_basicos()
+                    resumen = vistas._resumen_flujos(filas)
+
+                self.assertTrue(all(isinstance(fila, Flujo) for fila in filas))
+                self.assertEqual(resumen, [
+                    FlujoResumen('1', 'A', 'a@example.com', '10-111', vistas._obtener_pagare('10-111')),
+                    FlujoResumen('7', '', 'g@example.com', '', ''),
+                ])
+                self.assertEqual(resumen_listado([fila.a_dict() for fila in filas]), resumen)
+                #? Las filas del listado (datos personales) no se imprimen
+                self.assertEqual(salida.getvalue(), '')
@@ -0,0 +1,79 @@
+import io
+import json
+import zipfile
+
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from API.models import HistorialPDFs, PagareFallido
+from API.oracle_exec import bloque_lote, ejecutar_procedimiento_lote, estadisticas_procedimientos
+from API.oracle_replay import llamadas_lote
+from API.views import GenerarPDFLote
+
+from .utils import OracleReplayMixin, fila_detalle
+
+
+class BloqueLoteTests(SimpleTestCase):
+
+    def test_una_llamada_por_juego_de_parametros(self):
+        sql, binds = bloque_lote('SP_PLANPAGOS', [['111'], ['222']])
+
+        self.assertIn("SP_PLANPAGOS(:p0_0, c); DBMS_SQL.RETURN_RESULT(c);", sql)
+        self.assertIn("SP_PLANPAGOS(:p1_0, c); DBMS_SQL.RETURN_RESULT(c);", sql)
+        self.assertEqual(binds, {'p0_0': '111', 'p1_0': '222'})
+        #? El replay reconoce las mismas llamadas
+        self.assertEqual(llamadas_lote(sql, binds), [('SP_PLANPAGOS', ['111']), ('SP_PLANPAGOS', ['222'])])
+
+    def test_nombre_invalido(self):
+        with self.assertRaises(ValueError):
+            bloque_lote('SP_X; DROP TABLE Y', [['1']])
+
+
+@override_settings(ORACLE_LOTE_MAX=2)
+class EjecutarLoteTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_resultados_en_el_orden_pedido(self):
+        for pagare in ('111', '222', '333'):
+            self.grabar('SP_PLANPAGOS', [pagare], [fila_detalle(f'10-{pagare}')])
+
+        resultados = ejecutar_procedimiento_lote('SP_PLANPAGOS', [['333'], ['sin-fixture'], ['111'], ['222']])
+
+        self.assertEqual([[f['OBLIGACION'] for f in filas] for filas in resultados],
+                         [['10-333'], [], ['10-111'], ['10-222']])
+        #? Dos idas y vueltas (ORACLE_LOTE_MAX=2) registradas como una ejecución del lote
+        metricas = estadisticas_procedimientos()['SP_PLANPAGOS[lote]']
+        self.assertEqual((metricas['total_ms']['total'], metricas['filas']['max']), (1, 3))
+
+
+class GenerarPDFLoteTests(OracleReplayMixin, TestCase):
+
+    def _post(self, obligaciones):
+        request = APIRequestFactory().post('/api/generar-pdf-lote/', {'obligaciones': obligaciones}, format='json')
+        return GenerarPDFLote.as_view()(request)
+
+    def test_zip_con_resultado_por_obligacion(self):
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111', cedula='111111')])
+        self.grabar('SP_PLANPAGOS', ['222'], [fila_detalle('10-222', cedula='')])
+        HistorialPDFs.objects.create(obligacion='10-333', cedula_cliente='333333')
+
+        response = self._post(['10-111', '10-222', '10-333', '10-444', '10-111'])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(response.content)) as archivo:
+            resultado = json.loads(archivo.read('resultado.json'))
+            self.assertEqual(list(resultado), ['10-111', '10-222', '10-333', '10-444'])
+            self.assertEqual(resultado['10-111']['estado'], 'generado')
+            self.assertTrue(archivo.read(resultado['10-111']['archivo']).startswith(b'%PDF'))
+        self.assertEqual(
+            {o: r['estado'] for o, r in resultado.items() if o != '10-111'},
+            {'10-222': 'sin_cedula', '10-333': 'duplicado', '10-444': 'no_encontrado'},
+        )
+        self.assertTrue(HistorialPDFs.objects.filter(obligacion='10-111', cedula_cliente='111111').exists())
+        #? El pagaré sin filas queda en la caché negativa
+        self.assertTrue(PagareFallido.objects.filter(procedimiento='SP_PLANPAGOS', pagare='444').exists())
+
+    @override_settings(PDF_LOTE_MAX=2)
+    def test_lista_invalida_o_muy_larga(self):
+        self.assertEqual(self._post([]).status_code, 400)
+        self.assertEqual(self._post(['10-1', '10-2', '10-3']).status_code, 400)
@@ -0,0 +1,84 @@
+import oracledb
+from django.test import SimpleTestCase
+
+from API.flujos import Diferido, tipo_flujo
+from API.metrics import MetricasProcedimiento, VentanaLatencias, _percentil
+from API.oracle_exec import MUESTRA_TAMANO, ejecutar_procedimiento, estadisticas_procedimientos, tamano_aproximado
+
+from .utils import OracleReplayMixin
+
+
+class VentanaLatenciasTests(SimpleTestCase):
+
+    def test_percentil_por_rango_mas_cercano(self):
+        ordenadas = list(range(1, 101))
+        self.assertEqual([_percentil(ordenadas, p) for p in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertEqual(_percentil([7], 99), 7)
+
+    def test_resumen(self):
+        ventana = VentanaLatencias()
+        self.assertEqual(ventana.resumen(), {"total": 0, "muestras": 0, "p50": None, "p95": None, "p99": None, "max": None})
+        for valor in (30, 10, 20, 40):
+            ventana.registrar(valor)
+        self.assertEqual(ventana.resumen(), {"total": 4, "muestras": 4, "p50": 20, "p95": 40, "p99": 40, "max": 40})
+
+    def test_ventana_deslizante(self):
+        ventana = VentanaLatencias(tamano=3)
+        for valor in (1000, 1, 2, 3):
+            ventana.registrar(valor)
+        resumen = ventana.resumen()
+        #? La muestra más vieja salió de la ventana, pero cuenta en el total
+        self.assertEqual((resumen['total'], resumen['muestras'], resumen['max']), (4, 3, 3))
+
+    def test_etapas_sin_valor_no_registran(self):
+        metricas = MetricasProcedimiento()
+        metricas.registrar(total_ms=5.0, espera_pool_ms=None, filas=2)
+        resumen = metricas.resumen()
+        self.assertEqual((resumen['total_ms']['muestras'], resumen['espera_pool_ms']['muestras']), (1, 0))
+        self.assertEqual(resumen['filas']['max'], 2)
+
+
+class TamanoAproximadoTests(SimpleTestCase):
+
+    def test_textos_binarios_y_numeros(self):
+        filas = [{'A': 'abc', 'B': b'\x00\x01', 'C': 12, 'D': None}, ('xy', 1.5)]
+        self.assertEqual(tamano_aproximado(filas), (3 + 2 + 8) + (2 + 8))
+
+    def test_flujo_sin_calcular_diferidos(self):
+        def no_calcular():
+            raise AssertionError("No debe calcular el Diferido")
+
+        fila = tipo_flujo(('NOMBRE', 'PLAN_PAGO'))('ANA', None)
+        fila['PLAN_PAGO'] = Diferido(no_calcular)
+        #? El Diferido sin calcular cuenta como cualquier valor que no es texto
+        self.assertEqual(tamano_aproximado([fila]), 3 + 8)
+
+    def test_muestra_en_resultados_grandes(self):
+        filas = [('x' * 10,)] * (MUESTRA_TAMANO * 5)
+        self.assertEqual(tamano_aproximado(filas), 10 * MUESTRA_TAMANO * 5)
+
+
+class EstadisticasProcedimientosTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_etapas_por_procedimiento(self):
+        self.grabar('SP_PRUEBA', ['1'], [{'CEDULA': '1', 'NOMBRE': 'ANA'}, {'CEDULA': '2', 'NOMBRE': 'LUIS'}])
+        ejecutar_procedimiento('SP_PRUEBA', ['1'])
+        ejecutar_procedimiento('SP_PRUEBA', ['1'])
+
+        datos = estadisticas_procedimientos()['SP_PRUEBA']
+        self.assertEqual(set(datos), set(MetricasProcedimiento.ETAPAS) | {'errores'})
+        for etapa in MetricasProcedimiento.ETAPAS:
+            with self.subTest(etapa=etapa):
+                self.assertEqual(datos[etapa]['muestras'], 2)
+        self.assertEqual((datos['filas']['max'], datos['bytes']['max']), (2, 1 + 3 + 1 + 4))
+        self.assertEqual(datos['errores'], 0)
+
+    def test_errores(self):
+        self.grabar('SP_PRUEBA', ['1'], [{'CEDULA': '1'}])
+        with self.settings(ORACLE_REPLAY_LATENCIA_MS=100, ORACLE_SP_CONFIG={'SP_PRUEBA': {'call_timeout_ms': 10}}):
+            with self.assertRaises(oracledb.DatabaseError):
+                ejecutar_procedimiento('SP_PRUEBA', ['1'])
+
+        datos = estadisticas_procedimientos()['SP_PRUEBA']
+        #? La llamada fallida no deja muestras de latencia
+        self.assertEqual((datos['errores'], datos['total_ms']['muestras']), (1, 0))
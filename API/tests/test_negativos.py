@@ -0,0 +1,112 @@
+from datetime import timedelta
+from unittest import mock
+
+import oracledb
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from API.models import PagareFallido
+from API.negativos import (
+    MOTIVO_ORA_01422,
+    MOTIVO_SIN_FILAS,
+    Fallo,
+    consultar_lote,
+    espera_backoff,
+    registrar_negativo,
+)
+from API.oracle_exec import ejecutar_procedimiento_lote
+
+from .utils import OracleReplayMixin, fila_detalle
+
+
+@override_settings(NEGATIVO_BACKOFF_BASE_S=60, NEGATIVO_BACKOFF_MAX_S=600)
+class EsperaBackoffTests(SimpleTestCase):
+
+    def test_duplica_hasta_el_maximo(self):
+        esperas = [espera_backoff(n).total_seconds() for n in range(0, 7)]
+        self.assertEqual(esperas, [60, 60, 120, 240, 480, 600, 600])
+
+
+@override_settings(NEGATIVO_CACHE=True, NEGATIVO_BACKOFF_BASE_S=60, NEGATIVO_BACKOFF_MAX_S=600)
+class RegistrarNegativoTests(TestCase):
+
+    def setUp(self):
+        self.ahora = timezone.now()
+        reloj = mock.patch('API.negativos.timezone.now', side_effect=lambda: self.ahora)
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def test_backoff_exponencial(self):
+        primero = registrar_negativo('SP_PLANPAGOS', '123', MOTIVO_SIN_FILAS)
+        self.assertEqual(primero.intentos, 1)
+        self.assertEqual(primero.reintentar_despues, self.ahora + timedelta(seconds=60))
+
+        self.ahora += timedelta(seconds=61)
+        segundo = registrar_negativo('SP_PLANPAGOS', '123', MOTIVO_ORA_01422, 'ORA-01422: ...')
+        self.assertEqual(segundo.pk, primero.pk)
+        self.assertEqual(segundo.intentos, 2)
+        self.assertEqual(segundo.motivo, MOTIVO_ORA_01422)
+        self.assertEqual(segundo.reintentar_despues, self.ahora + timedelta(seconds=120))
+
+        for _ in range(4):
+            fallido = registrar_negativo('SP_PLANPAGOS', '123', MOTIVO_SIN_FILAS)
+        self.assertEqual(fallido.intentos, 6)
+        self.assertEqual(fallido.reintentar_despues, self.ahora + timedelta(seconds=600))
+        self.assertEqual(PagareFallido.objects.count(), 1)
+
+    def test_por_procedimiento(self):
+        registrar_negativo('SP_PLANPAGOS', '123', MOTIVO_SIN_FILAS)
+        otro = registrar_negativo('SP_PLANPAGOSCONSUMO', '123', MOTIVO_SIN_FILAS)
+        self.assertEqual(otro.intentos, 1)
+
+    def test_sin_pagare_o_desactivada(self):
+        self.assertIsNone(registrar_negativo('SP_PLANPAGOS', '', MOTIVO_SIN_FILAS))
+        with self.settings(NEGATIVO_CACHE=False):
+            self.assertIsNone(registrar_negativo('SP_PLANPAGOS', '123', MOTIVO_SIN_FILAS))
+        self.assertFalse(PagareFallido.objects.exists())
+
+
+@override_settings(NEGATIVO_CACHE=True, NEGATIVO_BACKOFF_BASE_S=60)
+class ConsultarLoteTests(OracleReplayMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111')])
+        parche = mock.patch('API.negativos.ejecutar_procedimiento_lote', wraps=ejecutar_procedimiento_lote)
+        self.lote = parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_sin_filas_no_se_repite_durante_el_backoff(self):
+        primero = consultar_lote('SP_PLANPAGOS', ['111', '222'])
+        segundo = consultar_lote('SP_PLANPAGOS', ['111', '222'])
+
+        self.assertEqual(primero[0][0]['OBLIGACION'], '10-111')
+        self.assertEqual(primero[1], Fallo(MOTIVO_SIN_FILAS, ''))
+        self.assertEqual(segundo[1], Fallo(MOTIVO_SIN_FILAS, ''))
+        #? La segunda vez solo se consultó el pagaré que responde
+        self.assertEqual(self.lote.call_args_list[1].args[1], [['111']])
+        self.assertEqual(PagareFallido.objects.get(pagare='222').intentos, 1)
+
+    def test_olvida_el_fallo_vencido_si_ya_responde(self):
+        PagareFallido.objects.create(
+            procedimiento='SP_PLANPAGOS', pagare='111', motivo=MOTIVO_SIN_FILAS,
+            ultimo_fallo=timezone.now(), reintentar_despues=timezone.now() - timedelta(seconds=1),
+        )
+        self.assertEqual(len(consultar_lote('SP_PLANPAGOS', ['111'])[0]), 1)
+        self.assertFalse(PagareFallido.objects.exists())
+
+    def test_lote_fallido_se_consulta_uno_por_uno(self):
+        ora_01422 = oracledb.DatabaseError("ORA-01422: exact fetch returns more than requested number of rows")
+        self.lote.side_effect = ora_01422
+
+        def por_pagare(procedimiento, parametros, particion=None):
+            if parametros == ['333']:
+                raise ora_01422
+            return [fila_detalle('10-111')]
+
+        with mock.patch('API.negativos.ejecutar_procedimiento', side_effect=por_pagare):
+            resultados = consultar_lote('SP_PLANPAGOS', ['111', '333'])
+
+        self.assertEqual(len(resultados[0]), 1)
+        self.assertEqual(resultados[1].motivo, MOTIVO_ORA_01422)
+        self.assertEqual(PagareFallido.objects.get(pagare='333').motivo, MOTIVO_ORA_01422)
@@ -0,0 +1,60 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase, override_settings
+
+from API.numeros import parse_numero, separadores_sesion
+
+
+class ParseNumeroTests(SimpleTestCase):
+
+    def setUp(self):
+        separadores_sesion.cache_clear()
+        self.addCleanup(separadores_sesion.cache_clear)
+
+    def _comprobar(self, casos):
+        for texto, esperado in casos.items():
+            with self.subTest(texto=texto):
+                self.assertEqual(parse_numero(texto), Decimal(esperado))
+
+    def test_valores_no_texto(self):
+        self.assertEqual(parse_numero(None), Decimal(0))
+        self.assertEqual(parse_numero('  '), Decimal(0))
+        self.assertEqual(parse_numero(12), Decimal(12))
+        self.assertEqual(parse_numero(1.5), Decimal('1.5'))
+        self.assertEqual(parse_numero(Decimal('2.25')), Decimal('2.25'))
+
+    @override_settings(ORACLE_NLS_NUMERIC_CHARACTERS='.,')
+    def test_sesion_punto_decimal(self):
+        self._comprobar({
+            '1.234': '1.234',
+            '3,791,706': '3791706',
+            '146004.84': '146004.84',
+            #? La ',' de miles exige grupos de 3: es formato PESOS, no 14600484
+            '146004,84': '146004.84',
+            '1.234.567,89': '1234567.89',
+            '1.234.567': '1234567',
+            'abc': '0',
+        })
+
+    @override_settings(ORACLE_NLS_NUMERIC_CHARACTERS=',.')
+    def test_sesion_formato_pesos(self):
+        self._comprobar({
+            '1.234': '1234',
+            '146004,84': '146004.84',
+            '1.234.567,89': '1234567.89',
+            '150.000,00': '150000.00',
+            #? ',' decimal con varios grupos no tiene sentido: se adivina el formato
+            '3,791,706': '3791706',
+        })
+
+    @override_settings(ORACLE_NLS_NUMERIC_CHARACTERS='')
+    def test_heuristica_sin_separadores_de_sesion(self):
+        self.assertIsNone(separadores_sesion())
+        self._comprobar({
+            '1.234': '1234',
+            '146004,84': '146004.84',
+            '146004.84': '146004.84',
+            '159.200,60': '159200.60',
+            '1.234.567,89': '1234567.89',
+            '3,791,706': '3791706',
+        })
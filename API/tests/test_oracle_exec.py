@@ -0,0 +1,71 @@
+from unittest import mock
+
+import oracledb
+from django.test import SimpleTestCase, override_settings
+
+from API.flujos import Flujo
+from API.oracle_exec import _handler_lobs_inline, configuracion_procedimiento, ejecutar_procedimiento
+
+from .utils import OracleReplayMixin
+
+
+class ConfiguracionProcedimientoTests(SimpleTestCase):
+
+    @override_settings(
+        ORACLE_CALL_TIMEOUT_MS=1000,
+        ORACLE_SP_DEFAULTS={'arraysize': 200},
+        ORACLE_SP_CONFIG={'SP_LISTADO': {'arraysize': 500, 'prefetchrows': 501, 'row_factory': 'flujo'}},
+    )
+    def test_defaults_y_ajustes_por_procedimiento(self):
+        listado = configuracion_procedimiento('SP_LISTADO')
+        otro = configuracion_procedimiento('SP_OTRO')
+
+        self.assertEqual((listado['arraysize'], listado['prefetchrows'], listado['row_factory']), (500, 501, 'flujo'))
+        self.assertEqual((otro['arraysize'], otro['prefetchrows'], otro['row_factory']), (200, 2, 'dict'))
+        self.assertEqual(otro['call_timeout_ms'], 1000)
+        self.assertTrue(otro['lobs_inline'])
+
+
+class EjecutarProcedimientoTests(OracleReplayMixin, SimpleTestCase):
+    filas = [{'CEDULA': str(i), 'NOMBRE': f'ASOCIADO {i}'} for i in range(5)]
+
+    def test_filas_como_dict(self):
+        self.grabar('SP_PRUEBA', ['x'], self.filas)
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['x']), self.filas)
+
+    def test_max_filas(self):
+        self.grabar('SP_PRUEBA', ['x'], self.filas)
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['x'], max_filas=1), self.filas[:1])
+
+    def test_row_factory_por_procedimiento(self):
+        self.grabar('SP_PRUEBA', ['x'], self.filas)
+        with self.settings(ORACLE_SP_CONFIG={'SP_PRUEBA': {'row_factory': 'tuple'}}):
+            self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['x'])[0], ('0', 'ASOCIADO 0'))
+        with self.settings(ORACLE_SP_CONFIG={'SP_PRUEBA': {'row_factory': 'flujo'}}):
+            fila = ejecutar_procedimiento('SP_PRUEBA', ['x'])[0]
+        self.assertIsInstance(fila, Flujo)
+        self.assertEqual(fila, self.filas[0])
+
+    def test_cursor_sin_abrir(self):
+        #? Sin fixture el cursor queda sin description, como un SP que no abre el REF CURSOR
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['sin-datos']), [])
+
+
+class LobsInlineTests(SimpleTestCase):
+
+    def _metadata(self, tipo):
+        return mock.Mock(type_code=tipo)
+
+    def test_lobs_como_long(self):
+        cursor = mock.Mock(arraysize=10)
+        for lob, largo in ((oracledb.DB_TYPE_CLOB, oracledb.DB_TYPE_LONG),
+                           (oracledb.DB_TYPE_NCLOB, oracledb.DB_TYPE_LONG_NVARCHAR),
+                           (oracledb.DB_TYPE_BLOB, oracledb.DB_TYPE_LONG_RAW)):
+            with self.subTest(lob=lob):
+                self.assertIs(_handler_lobs_inline(cursor, self._metadata(lob)), cursor.var.return_value)
+                cursor.var.assert_called_with(largo, arraysize=10)
+
+    def test_otros_tipos_sin_cambio(self):
+        cursor = mock.Mock(arraysize=10)
+        self.assertIsNone(_handler_lobs_inline(cursor, self._metadata(oracledb.DB_TYPE_VARCHAR)))
+        cursor.var.assert_not_called()
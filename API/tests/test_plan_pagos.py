@@ -0,0 +1,179 @@
+import pickle
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+import API.views
+import APIComercial.views
+import APIConsumo.views
+import APIMicro.views
+from API.flujos import MAIL_POR_DEFECTO, Diferido, tipo_flujo
+from API.management.commands.bench_plan_pagos import _plan_pago_referencia, fila_sintetica
+from API.numeros import separadores_sesion
+from API.oracle_exec import tamano_aproximado
+from API.plan_pagos import COLUMNAS_PLAN, PlanPago, armar_plan_pago, procesar_flujos
+
+#? Las cuatro líneas de producto procesan el detalle con el mismo parser
+VISTAS = (API.views, APIConsumo.views, APIComercial.views, APIMicro.views)
+
+
+def _fila_flujo(fila):
+    """La fila como la arma el cursor con row_factory='flujo'."""
+    return tipo_flujo(tuple(fila))(*fila.values())
+
+
+class PlanPagoTests(SimpleTestCase):
+    """PlanPago: las cuotas como columnas."""
+
+    def test_cuotas_como_dict(self):
+        plan = armar_plan_pago(fila_sintetica(3))
+        self.assertEqual(plan[1], dict(zip(COLUMNAS_PLAN, list(plan.filas())[1])))
+        self.assertEqual(list(plan), [plan.cuota(i) for i in range(3)])
+        self.assertEqual(list(plan.filas(1, 2)), [tuple(plan[1].values())])
+        self.assertEqual(plan[1:], PlanPago(valores[1:] for valores in plan.columnas))
+
+    @override_settings(ORACLE_NLS_NUMERIC_CHARACTERS=',.')
+    def test_totales_suma_columnas_numericas(self):
+        #? fila_sintetica trae los montos en formato PESOS (',' decimal, '.' miles)
+        separadores_sesion.cache_clear()
+        self.addCleanup(separadores_sesion.cache_clear)
+        plan = armar_plan_pago(fila_sintetica(3))
+        totales = plan.totales()
+
+        self.assertEqual(totales['ABONO_CAPITAL'], Decimal('450000.00'))
+        self.assertEqual(totales['SEGURO_VIDA'], Decimal('3600'))
+        self.assertEqual(totales['VALOR_CUOTA'], Decimal('477601.80'))
+        #? Los '' no suman
+        self.assertEqual(totales['SALDO_PARCIAL'], Decimal('750000'))
+        self.assertIs(plan.totales(), totales)
+
+    def test_fecha_y_valor_cuota(self):
+        plan = armar_plan_pago(dict(fila_sintetica(3), FECHA='15/01/2025;15/02/2025;', VALOR_CUOTA=';10;20'))
+        self.assertEqual(plan.fecha_ultima(), '15/02/2025')
+        #? La cuota 1 no trae VALOR_CUOTA: se usa el primero no vacío
+        self.assertEqual(plan.valor_cuota(), '10')
+
+    def test_plan_vacio(self):
+        plan = armar_plan_pago({})
+        self.assertEqual(len(plan), 1)
+        self.assertIsNone(plan.fecha_ultima())
+        self.assertIsNone(plan.valor_cuota())
+        self.assertFalse(PlanPago([]))
+
+    def test_igualdad_y_pickle(self):
+        plan = armar_plan_pago(fila_sintetica(6))
+        plan.totales()
+        copia = pickle.loads(pickle.dumps(plan))
+
+        self.assertEqual(copia, plan)
+        self.assertNotEqual(copia, armar_plan_pago(fila_sintetica(5)))
+        #? Los totales no viajan a la caché compartida
+        self.assertIsNone(copia._totales)
+        with self.assertRaises(TypeError):
+            hash(plan)
+
+
+class ParserPlanPagosTests(SimpleTestCase):
+    """armar_plan_pago / procesar_flujos (API/plan_pagos.py) con filas dict."""
+
+    def test_igual_a_la_implementacion_anterior(self):
+        filas = [
+            fila_sintetica(1),
+            fila_sintetica(12),
+            dict(fila_sintetica(3), VALOR_CUOTA='1;2;3;4;5'),
+            {'NO': '1;2', 'FECHA': ' 15/01/2025 ;15/02/2025 '},
+            {},
+        ]
+        for fila in filas:
+            with self.subTest(fila=fila.get('NO')):
+                self.assertEqual(list(armar_plan_pago(fila)), _plan_pago_referencia(fila))
+
+    def test_completa_y_recorta_columnas(self):
+        fila = fila_sintetica(3)
+        fila['ABONO_INTERES'] = '4.500 ; 3.000;1.500;999'
+        plan = armar_plan_pago(fila)
+
+        self.assertEqual(len(plan), 3)
+        self.assertEqual(plan.columna('NO'), ('1', '2', '3'))
+        #? Sin espacios y sin el valor de más
+        self.assertEqual(plan.columna('ABONO_INTERES'), ('4.500', '3.000', '1.500'))
+        #? SALDO_PARCIAL trae un valor menos: la última cuota queda en ''
+        self.assertEqual(plan.columna('SALDO_PARCIAL'), ('450000', '300000', ''))
+        self.assertEqual(list(plan)[2]['FECHA'], '15/03/2025')
+
+    def test_procesar_flujos(self):
+        fila = fila_sintetica(12)
+        fila['MAIL'] = None
+        fila['VALOR_CUOTA'] = ';' + ';'.join('159.200,60' for _ in range(11))
+        filas = procesar_flujos([fila])
+
+        self.assertIs(filas[0], fila)
+        self.assertEqual(fila['MAIL'], MAIL_POR_DEFECTO)
+        self.assertEqual(fila['FECHAULTIMA'], '15/12/2025')
+        #? La cuota 1 no trae VALOR_CUOTA: se usa el primero no vacío
+        self.assertEqual(fila['VALORCUOTA'], '159.200,60')
+        self.assertEqual(fila['PLAN_PAGO'][0], dict(zip(COLUMNAS_PLAN, next(fila['PLAN_PAGO'].filas()))))
+
+    def test_respaldo_sin_cuotas(self):
+        fila = dict(fila_sintetica(1), FECHA='', VALOR_CUOTA='')
+        del fila['FECHAULTIMA']
+        procesar_flujos([fila])
+
+        self.assertEqual(fila['FECHAULTIMA'], 'N/A')
+        self.assertEqual(fila['VALORCUOTA'], 'N/A')
+
+    def test_mismo_resultado_en_todas_las_lineas(self):
+        esperado = procesar_flujos([fila_sintetica(6)])[0]
+        for vistas in VISTAS:
+            with self.subTest(app=vistas.__name__):
+                self.assertEqual(vistas._procesar_flujos([fila_sintetica(6)])[0], esperado)
+
+
+class PlanDiferidoTests(SimpleTestCase):
+    """procesar_flujos sobre Flujo: PLAN_PAGO, FECHAULTIMA y VALORCUOTA se calculan al leerlos."""
+
+    def test_calcula_al_leer_una_sola_vez(self):
+        flujo = _fila_flujo(fila_sintetica(6))
+        procesar_flujos([flujo])
+
+        with mock.patch('API.plan_pagos.armar_plan_pago', wraps=armar_plan_pago) as armar:
+            #? Ni los datos del encabezado ni las métricas de tamaño arman el plan
+            self.assertEqual(flujo['NOMBRE'], 'ASOCIADO DE PRUEBA')
+            tamano_aproximado([flujo])
+            armar.assert_not_called()
+            self.assertEqual(flujo['FECHAULTIMA'], '15/06/2025')
+            self.assertEqual(flujo.get('VALORCUOTA'), '159.200,60')
+            self.assertEqual(len(flujo['PLAN_PAGO']), 6)
+            self.assertIs(flujo['PLAN_PAGO'], flujo['PLAN_PAGO'])
+        #? El plan se arma una sola vez y queda en el campo
+        armar.assert_called_once()
+
+    def test_igual_al_dict(self):
+        fila = fila_sintetica(12)
+        flujo = _fila_flujo(fila)
+        procesar_flujos([fila])
+        procesar_flujos([flujo])
+
+        self.assertEqual(flujo['PLAN_PAGO'], fila['PLAN_PAGO'])
+        self.assertEqual(flujo.a_dict(), fila)
+        self.assertEqual(flujo, fila)
+        self.assertNotIn(Diferido, map(type, flujo.values()))
+
+    def test_respaldo_sin_cuotas(self):
+        fila = dict(fila_sintetica(1), FECHA='', VALOR_CUOTA='')
+        del fila['FECHAULTIMA']
+        flujo = _fila_flujo(fila)
+        procesar_flujos([flujo])
+
+        self.assertEqual(flujo['FECHAULTIMA'], 'N/A')
+        self.assertEqual(flujo['VALORCUOTA'], 'N/A')
+
+    def test_pickle_sin_calcular(self):
+        flujo = _fila_flujo(fila_sintetica(3))
+        procesar_flujos([flujo])
+        copia = pickle.loads(pickle.dumps(flujo))
+
+        #? La copia (ej. la caché compartida) guarda el plan sin calcular
+        self.assertIs(type(getattr(copia, copia._atributos['PLAN_PAGO'])), Diferido)
+        self.assertEqual(copia, flujo)
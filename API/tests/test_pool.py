@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from API import oracle_pool
+from API.oracle_exec import ejecutar_procedimiento
+from API.oracle_pool import PoolSaturadoError, acquire_connection, cerrar_pool, configuracion_pool, estadisticas_pool, get_pool, precalentar_pool
+from API.views import EstadisticasOracle, ValidarAsociado
+
+from .utils import OracleReplayMixin
+
+
+class ConfiguracionPoolTests(OracleReplayMixin, SimpleTestCase):
+
+    @override_settings(ORACLE_POOL_MIN=2, ORACLE_POOL_MAX=6, ORACLE_POOL_GETMODE='TimedWait',
+                       ORACLE_POOL_WAIT_TIMEOUT_MS=250)
+    def test_desde_settings(self):
+        conf = configuracion_pool()
+        self.assertEqual((conf['min'], conf['max']), (2, 6))
+        self.assertEqual(conf['getmode'], 'timedwait')
+        self.assertEqual(conf['wait_timeout_ms'], 250)
+
+    @override_settings(ORACLE_POOL_MIN=3, ORACLE_POOL_MAX=1)
+    def test_maximo_no_menor_que_minimo(self):
+        self.assertEqual(configuracion_pool()['max'], 3)
+
+    @override_settings(ORACLE_POOL_GETMODE='siempre')
+    def test_getmode_invalido(self):
+        with self.assertRaises(ValueError):
+            configuracion_pool()
+
+    @override_settings(ORACLE_POOL_MIN=1, ORACLE_POOL_MAX=4)
+    def test_estadisticas_del_worker(self):
+        self.assertFalse(estadisticas_pool()['creado'])
+        self.grabar('SP_CONSULTACAPA', ['1'], [{'CEDULA': '1'}])
+        ejecutar_procedimiento('SP_CONSULTACAPA', ['1'])
+
+        datos = estadisticas_pool()
+        self.assertTrue(datos['creado'])
+        self.assertEqual(datos['pid'], os.getpid())
+        self.assertEqual((datos['min'], datos['max'], datos['busy']), (1, 4, 0))
+        self.assertEqual(datos['adquisiciones'], 1)
+        self.assertEqual(datos['latencia_acquire_ms']['muestras'], 1)
+
+
+class EstadisticasOracleTests(OracleReplayMixin, SimpleTestCase):
+
+    def _get(self, usuario):
+        request = APIRequestFactory().get('/api/oracle/estadisticas/')
+        force_authenticate(request, user=usuario)
+        return EstadisticasOracle.as_view()(request)
+
+    def test_solo_staff(self):
+        self.assertEqual(self._get(User(username='n8n')).status_code, 403)
+
+    def test_estado_del_pool(self):
+        response = self._get(User(username='admin', is_staff=True))
+        self.assertEqual(response.status_code, 200)
+        datos = json.loads(response.content)
+        self.assertEqual(datos['pool']['pid'], os.getpid())
+        self.assertIn('configuracion', datos['pool'])
+        self.assertIn('procedimientos', datos)
+
+
+@override_settings(ORACLE_POOL_MIN=2, ORACLE_POOL_MAX=4)
+class PrecalentamientoTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_abre_las_sesiones_minimas(self):
+        resultado = precalentar_pool()
+
+        self.assertEqual(resultado['sesiones'], 2)
+        datos = estadisticas_pool()
+        self.assertEqual(datos['precalentamiento'], resultado)
+        self.assertEqual((datos['opened'], datos['busy']), (2, 0))
+
+
+class PoolHeredadoTests(OracleReplayMixin, SimpleTestCase):
+    """gunicorn --preload: el pool creado en el master no se usa en los workers."""
+
+    def test_se_recrea_en_otro_proceso(self):
+        pool_padre = get_pool()
+        ejecutar_procedimiento('SP_CONSULTACAPA', ['1'])
+        #? Como si este proceso fuera un hijo del que creó el pool
+        oracle_pool._pool_pid = os.getpid() + 1
+
+        pool_hijo = get_pool()
+        self.assertIsNot(pool_hijo, pool_padre)
+        self.assertEqual(oracle_pool._pool_pid, os.getpid())
+        #? Las métricas del padre tampoco se heredan
+        self.assertEqual(estadisticas_pool()['adquisiciones'], 0)
+
+    def test_cerrar_no_toca_el_pool_del_padre(self):
+        pool = get_pool()
+        oracle_pool._pool_pid = os.getpid() + 1
+        with mock.patch.object(pool, 'close') as cerrar:
+            cerrar_pool(espera_s=0)
+        cerrar.assert_not_called()
+        self.assertIs(oracle_pool._pool, pool)
+
+    def test_cerrar_drena_y_cierra(self):
+        pool = get_pool()
+        with mock.patch.object(pool, 'close') as cerrar:
+            cerrar_pool(espera_s=0)
+        cerrar.assert_called_once_with(force=True)
+        self.assertFalse(estadisticas_pool()['creado'])
+
+
+@override_settings(ORACLE_POOL_MAX=1, ORACLE_POOL_WAIT_TIMEOUT_MS=50, ORACLE_POOL_RETRY_AFTER_S=7,
+                   ORACLE_POOL_CUOTAS={})
+class PoolSaturadoTests(OracleReplayMixin, SimpleTestCase):
+
+    def _validar(self, cedula):
+        request = APIRequestFactory().get(f'/api/validar-asociado/{cedula}/')
+        return ValidarAsociado.as_view()(request, identificacion=cedula)
+
+    def test_sin_sesiones_libres_responde_503(self):
+        self.grabar('SP_CONSULTACAPA', ['1'], [{'CEDULA': '1'}])
+        with acquire_connection():
+            inicio = time.monotonic()
+            response = self._validar('1')
+            espera = time.monotonic() - inicio
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(json.loads(response.content)['error'], 'SERVICIO_SATURADO')
+        #? Esperó ORACLE_POOL_WAIT_TIMEOUT_MS, no indefinidamente
+        self.assertLess(espera, 2)
+        self.assertEqual(estadisticas_pool()['rechazos'], 1)
+
+        #? Con la sesión devuelta la misma consulta responde
+        self.assertEqual(self._validar('1').status_code, 200)
+
+    def test_el_error_no_queda_en_cache(self):
+        with acquire_connection():
+            self.assertEqual(self._validar('2').status_code, 503)
+        response = self._validar('2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+
+@override_settings(ORACLE_POOL_MAX=3, ORACLE_POOL_WAIT_TIMEOUT_MS=50,
+                   ORACLE_POOL_CUOTAS={'API': 3, 'APIConsumo': 2})
+class CuotasPoolTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_linea_sin_cupo_no_deja_sin_sesiones_a_api(self):
+        with acquire_connection('APIConsumo'), acquire_connection('APIConsumo'):
+            with self.assertRaises(PoolSaturadoError):
+                with acquire_connection('APIConsumo'):
+                    pass
+            #? ORACLE_POOL_RESERVA_API: queda una sesión del pool para API
+            with acquire_connection('API'):
+                pass
+
+        particiones = estadisticas_pool()['particiones']
+        self.assertEqual(particiones['APIConsumo']['max_en_uso'], 2)
+        self.assertEqual((particiones['APIConsumo']['esperas'], particiones['APIConsumo']['rechazos']), (1, 1))
+        self.assertEqual(particiones['API']['adquisiciones'], 1)
+        self.assertEqual(particiones['APIConsumo']['en_uso'], 0)
+
+    @override_settings(ORACLE_POOL_WAIT_TIMEOUT_MS=2000)
+    def test_espera_a_que_se_libere_un_cupo(self):
+        ocupada = threading.Event()
+
+        def ocupar():
+            with acquire_connection('APIConsumo'), acquire_connection('APIConsumo'):
+                ocupada.set()
+                time.sleep(0.1)
+
+        hilo = threading.Thread(target=ocupar)
+        hilo.start()
+        ocupada.wait()
+        with acquire_connection('APIConsumo'):
+            pass
+        hilo.join()
+
+        datos = estadisticas_pool()['particiones']['APIConsumo']
+        self.assertEqual((datos['adquisiciones'], datos['esperas'], datos['rechazos']), (3, 1, 0))
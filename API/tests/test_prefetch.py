@@ -0,0 +1,88 @@
+import json
+from concurrent.futures import Future
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from API.flujos import FlujoResumen
+from API.models import HistorialPDFs, PagareFallido
+from API.oracle_exec import estadisticas_procedimientos
+from API.prefetch import prefetch_detalles
+from API.views import GenerarPDF, ListarFlujosPendientes, _pagares_pendientes, _procesar_flujos
+
+from .utils import OracleReplayMixin, fila_detalle
+
+
+class EjecutorEnLinea:
+    """Ejecuta las precargas en el hilo de la prueba (y en su transacción)."""
+
+    def submit(self, funcion, *args):
+        futuro = Future()
+        futuro.set_result(funcion(*args))
+        return futuro
+
+
+@override_settings(PREFETCH_DETALLES=True, PREFETCH_TTL_S=120)
+class PrefetchDetallesTests(OracleReplayMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        for parche in (mock.patch.object(prefetch_detalles, '_get_ejecutor', return_value=EjecutorEnLinea()),
+                       mock.patch('API.prefetch.close_old_connections')):
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def test_cargar_y_tomar_una_vez(self):
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111')])
+
+        self.assertEqual(prefetch_detalles.programar('SP_PLANPAGOS', ['111', '222', '111'], _procesar_flujos), 2)
+        flujos = prefetch_detalles.tomar('SP_PLANPAGOS', '111')
+
+        self.assertEqual(flujos[0]['OBLIGACION'], '10-111')
+        self.assertEqual(len(flujos[0]['PLAN_PAGO']), 3)
+        self.assertIsNone(prefetch_detalles.tomar('SP_PLANPAGOS', '111'))
+        #? Sin filas no se guarda nada: el PDF responde desde la caché negativa
+        self.assertIsNone(prefetch_detalles.tomar('SP_PLANPAGOS', '222'))
+        self.assertTrue(PagareFallido.objects.filter(pagare='222').exists())
+        datos = prefetch_detalles.estadisticas()
+        self.assertEqual((datos['programados'], datos['cargados'], datos['usados'], datos['ausentes']), (2, 2, 1, 2))
+
+    def test_no_repite_los_vigentes(self):
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111')])
+        prefetch_detalles.programar('SP_PLANPAGOS', ['111'], _procesar_flujos)
+        self.assertEqual(prefetch_detalles.programar('SP_PLANPAGOS', ['111'], _procesar_flujos), 0)
+
+    def test_pagares_pendientes_consulta_solo_el_listado(self):
+        HistorialPDFs.objects.create(obligacion='10-111')
+        HistorialPDFs.objects.create(obligacion='333')
+        resumen = [FlujoResumen('1', 'A', 'a@example.com', f'10-{p}', p) for p in ('111', '222', '333')]
+
+        with CaptureQueriesContext(connection) as consultas:
+            pendientes = _pagares_pendientes(resumen)
+
+        self.assertEqual(pendientes, ['222'])
+        self.assertEqual(len(consultas), 1)
+        self.assertIn(' IN ', consultas[0]['sql'])
+
+    def test_listado_precarga_y_el_pdf_no_consulta_oracle(self):
+        self.grabar('SP_PLANPAGOS1', ['*'], [
+            {'CEDULA': '1', 'NOMBRE': 'A', 'MAIL': 'a@example.com', 'OBLIGACION': '10-111'},
+            {'CEDULA': '2', 'NOMBRE': 'B', 'MAIL': 'b@example.com', 'OBLIGACION': '10-222'},
+        ], defecto=True)
+        self.grabar('SP_PLANPAGOS', ['111'], [fila_detalle('10-111', cedula='1')])
+        HistorialPDFs.objects.create(obligacion='10-222')
+
+        listado = ListarFlujosPendientes.as_view()(APIRequestFactory().get('/api/listar-flujos-pendientes/'))
+        self.assertEqual(len(json.loads(listado.content)), 2)
+        self.assertEqual(prefetch_detalles.estadisticas()['programados'], 1)
+
+        response = GenerarPDF.as_view()(APIRequestFactory().get('/api/generar-pdf/10-111/'), obligacion='10-111')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(prefetch_detalles.estadisticas()['usados'], 1)
+        #? SP_PLANPAGOS solo se llamó en el lote de la precarga
+        self.assertNotIn('SP_PLANPAGOS', estadisticas_procedimientos())
+        self.assertIn('SP_PLANPAGOS[lote]', estadisticas_procedimientos())
@@ -0,0 +1,116 @@
+import datetime
+import decimal
+from unittest import skipUnless
+
+import oracledb
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+
+from API.deadline import DeadlineAgotadoError, establecer_deadline, restablecer_deadline
+from API.flujos import MAIL_POR_DEFECTO, Flujo
+from API.oracle_exec import ejecutar_procedimiento
+from API.oracle_replay import cargar_fixture, directorio_fixtures, guardar_fixture, modo_oracle, ruta_fixture
+from API.plan_pagos import PlanPago, procesar_flujos
+from API.views import _obtener_datos_basicos, _obtener_pagare
+
+from .utils import OracleReplayMixin
+
+
+class ModoOracleTests(SimpleTestCase):
+
+    def test_modos(self):
+        for modo in ('real', 'GRABAR', 'Replay'):
+            with self.subTest(modo=modo), self.settings(ORACLE_MODO=modo):
+                self.assertEqual(modo_oracle(), modo.lower())
+
+    @override_settings(ORACLE_MODO='prueba')
+    def test_modo_invalido(self):
+        with self.assertRaises(ValueError):
+            modo_oracle()
+
+
+class FixturesTests(OracleReplayMixin, SimpleTestCase):
+
+    def test_tipos_que_json_no_tiene(self):
+        fila = (decimal.Decimal('159200.60'), datetime.date(2025, 1, 15),
+                datetime.datetime(2025, 1, 15, 8, 30), b'\x00PDF', 'texto', None)
+        description = [(c, oracledb.DB_TYPE_VARCHAR, None, None, None, None, True) for c in 'ABCDEF']
+        guardar_fixture('SP_PRUEBA', [decimal.Decimal('1'), datetime.date(2025, 1, 1)], description, [fila])
+
+        cargado_description, filas = cargar_fixture('SP_PRUEBA', [decimal.Decimal('1'), datetime.date(2025, 1, 1)])
+        self.assertEqual(filas, [fila])
+        self.assertEqual([type(v) for v in filas[0]], [type(v) for v in fila])
+        #? El DbType vuelve como el objeto de oracledb, no como su nombre
+        self.assertIs(cargado_description[0][1], oracledb.DB_TYPE_VARCHAR)
+
+    def test_una_ruta_por_parametros(self):
+        self.assertEqual(ruta_fixture('sp_prueba', ['1']), ruta_fixture('SP_PRUEBA', ['1']))
+        self.assertNotEqual(ruta_fixture('SP_PRUEBA', ['1']), ruta_fixture('SP_PRUEBA', ['2']))
+        self.assertEqual(ruta_fixture('SP_PRUEBA', ['1']).parent, self.fixtures_dir / 'SP_PRUEBA')
+
+    def test_fixture_por_defecto(self):
+        self.grabar('SP_PRUEBA', ['1'], [{'CEDULA': '1'}])
+        self.grabar('SP_PRUEBA', ['x'], [{'CEDULA': 'defecto'}], defecto=True)
+
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['1']), [{'CEDULA': '1'}])
+        #? Parámetros sin fixture propio responden con _default.json
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['2']), [{'CEDULA': 'defecto'}])
+
+    @override_settings(ORACLE_REPLAY_ESTRICTO=True)
+    def test_estricto_sin_fixture(self):
+        with self.assertRaisesMessage(LookupError, 'SP_PRUEBA'):
+            ejecutar_procedimiento('SP_PRUEBA', ['1'])
+
+
+class CallTimeoutTests(OracleReplayMixin, SimpleTestCase):
+    ajustes_oracle = {'ORACLE_REPLAY_LATENCIA_MS': 300,
+                      'ORACLE_SP_CONFIG': {'SP_PRUEBA': {'call_timeout_ms': 50}}}
+
+    def setUp(self):
+        super().setUp()
+        self.grabar('SP_PRUEBA', ['1'], [{'CEDULA': '1'}])
+
+    def test_latencia_mayor_que_call_timeout(self):
+        with self.assertRaises(oracledb.DatabaseError) as contexto:
+            ejecutar_procedimiento('SP_PRUEBA', ['1'])
+        self.assertEqual(contexto.exception.args[0].full_code, 'DPY-4024')
+
+    @override_settings(ORACLE_SP_CONFIG={'SP_PRUEBA': {'call_timeout_ms': 5000}})
+    def test_call_timeout_limitado_por_el_deadline(self):
+        token = establecer_deadline(0.05)
+        try:
+            with self.assertRaises(DeadlineAgotadoError) as contexto:
+                ejecutar_procedimiento('SP_PRUEBA', ['1'])
+        finally:
+            restablecer_deadline(token)
+        self.assertEqual(contexto.exception.etapa, 'oracle:SP_PRUEBA')
+
+    @override_settings(ORACLE_SP_CONFIG={'SP_PRUEBA': {'call_timeout_ms': 5000}})
+    def test_latencia_dentro_del_call_timeout(self):
+        self.assertEqual(ejecutar_procedimiento('SP_PRUEBA', ['1']), [{'CEDULA': '1'}])
+
+
+def _hay_fixtures(procedimiento):
+    return getattr(settings, "ORACLE_MODO", "real") == 'replay' and (directorio_fixtures() / procedimiento).is_dir()
+
+
+#? Los fixtures tienen datos reales y no se versionan: con ORACLE_MODO=replay y
+#? ORACLE_FIXTURES_DIR grabados (ver API/oracle_replay.py) se prueban las filas reales
+@skipUnless(_hay_fixtures('SP_PLANPAGOS1') and _hay_fixtures('SP_PLANPAGOS'), "sin fixtures de replay")
+class FixturesGrabadosTests(SimpleTestCase):
+
+    def test_listado(self):
+        for fila in _obtener_datos_basicos():
+            self.assertTrue(fila['MAIL'])
+            self.assertNotEqual(fila['MAIL'], MAIL_POR_DEFECTO)
+            self.assertTrue(str(fila['CEDULA']).strip())
+            self.assertEqual(fila['PAGARE'], _obtener_pagare(fila['OBLIGACION']))
+            self.assertNotIn(None, fila.values())
+
+    def test_detalle(self):
+        for fila in procesar_flujos(ejecutar_procedimiento('SP_PLANPAGOS', ['0'])):
+            plan = fila['PLAN_PAGO']
+            self.assertIsInstance(plan, PlanPago)
+            self.assertEqual(len(plan), len(str(fila['NO']).split(';')))
+            if isinstance(fila, Flujo):
+                self.assertEqual(fila, fila.a_dict())
@@ -0,0 +1,97 @@
+import json
+from unittest import mock
+
+from django.test import AsyncRequestFactory, SimpleTestCase, override_settings
+
+from API import oracle_async
+from API.oracle_async import ParticionPoolAsync, acquire_connection_async, liberar_particion_async
+from API.oracle_pool import PoolSaturadoError
+from API.views_async import ListarFlujosPendientesAsync, ValidarAsociadoAsync
+
+from .utils import OracleReplayMixin
+
+LISTADO = [
+    {'CEDULA': '1', 'NOMBRE': 'A', 'MAIL': 'a@example.com', 'OBLIGACION': '10-111', 'PAGARE': '111'},
+    {'CEDULA': '2', 'NOMBRE': 'B', 'MAIL': 'b@example.com', 'OBLIGACION': '10-222', 'PAGARE': '222'},
+]
+
+
+class VistasAsyncTests(OracleReplayMixin, SimpleTestCase):
+    """La consulta a Oracle (ejecutar_procedimiento_async) se reemplaza por un AsyncMock."""
+
+    def setUp(self):
+        super().setUp()
+        parche = mock.patch('API.views_async.ejecutar_procedimiento_async', new_callable=mock.AsyncMock)
+        self.oracle = parche.start()
+        self.addCleanup(parche.stop)
+        self.factory = AsyncRequestFactory()
+
+    async def test_listado_desde_cache(self):
+        self.oracle.return_value = LISTADO
+        vista = ListarFlujosPendientesAsync.as_view()
+
+        primera = await vista(self.factory.get('/api/async/listar-flujos-pendientes/'))
+        segunda = await vista(self.factory.get('/api/async/listar-flujos-pendientes/'))
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(json.loads(primera.content), LISTADO)
+        self.assertEqual((primera['X-Cache'], segunda['X-Cache']), ('MISS', 'HIT'))
+        self.oracle.assert_awaited_once()
+        self.assertEqual(self.oracle.await_args.args[0], 'SP_PLANPAGOS1')
+
+    async def test_listado_pool_saturado(self):
+        self.oracle.side_effect = PoolSaturadoError("sin sesiones", retry_after=3)
+        response = await ListarFlujosPendientesAsync.as_view()(self.factory.get('/api/async/listar-flujos-pendientes/'))
+
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '3')
+
+    async def test_validar_asociado_get_y_post(self):
+        self.oracle.return_value = [{'CEDULA': '123', 'NOMBRE': 'ASOCIADO'}]
+        vista = ValidarAsociadoAsync.as_view()
+
+        por_get = await vista(self.factory.get('/api/async/validar-asociado/123/'), identificacion='123')
+        por_post = await vista(self.factory.post('/api/async/validar-asociado/', {'cedula': '123'},
+                                                 content_type='application/json'))
+
+        self.assertEqual(json.loads(por_get.content), {'CEDULA': '123', 'NOMBRE': 'ASOCIADO'})
+        self.assertEqual((por_get['X-Cache'], por_post['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(self.oracle.await_args.kwargs['max_filas'], 1)
+
+    async def test_validar_asociado_no_y_sin_cedula(self):
+        self.oracle.return_value = []
+        vista = ValidarAsociadoAsync.as_view()
+
+        response = await vista(self.factory.get('/api/async/validar-asociado/9/'), identificacion='9')
+        self.assertEqual(json.loads(response.content), {'respuesta': 'NO'})
+
+        response = await vista(self.factory.post('/api/async/validar-asociado/', {}, content_type='application/json'))
+        self.assertEqual(response.status_code, 400)
+
+
+class ParticionPoolAsyncTests(OracleReplayMixin, SimpleTestCase):
+
+    async def test_cuota_sin_bloquear_el_event_loop(self):
+        particion = ParticionPoolAsync('API', 1)
+        self.assertTrue(await particion.entrar(0.05))
+        self.assertFalse(await particion.entrar(0.05))
+        particion.salir()
+        self.assertTrue(await particion.entrar(0.05))
+
+        datos = particion.estadisticas()
+        self.assertEqual((datos['adquisiciones'], datos['esperas'], datos['rechazos']), (2, 1, 1))
+
+    @override_settings(ORACLE_ASYNC_POOL_CUOTAS={'API': 1}, ORACLE_POOL_WAIT_TIMEOUT_MS=50,
+                       ORACLE_POOL_RETRY_AFTER_S=4)
+    async def test_cuota_agotada_solo_para_su_linea(self):
+        with mock.patch.object(oracle_async, '_adquirir_del_pool_async', new_callable=mock.AsyncMock) as adquirir:
+            await acquire_connection_async('API')
+            with self.assertRaises(PoolSaturadoError) as error:
+                await acquire_connection_async('API')
+            #? Otra línea de producto sin cuota propia sigue entrando
+            await acquire_connection_async('APIConsumo')
+            liberar_particion_async('API')
+            await acquire_connection_async('API')
+
+        self.assertEqual(error.exception.retry_after, 4)
+        self.assertEqual(adquirir.await_count, 3)
@@ -0,0 +1,83 @@
+# utils.py
+#? Apoyo común de las pruebas: Oracle se reemplaza por el PoolReplay de API/oracle_replay.py
+#? con fixtures sintéticos que cada prueba escribe en un directorio temporal.
+import os
+import tempfile
+from pathlib import Path
+
+import oracledb
+from django.test import override_settings
+
+from API import oracle_async, oracle_exec, oracle_pool, oracle_replay
+from API.asociados import validacion_lote
+from API.cache import cache_asociados, cache_detalles, cache_listados
+from API.management.commands.bench_plan_pagos import fila_sintetica
+from API.numeros import separadores_sesion
+from API.prefetch import prefetch_detalles
+
+
+def reiniciar_estado():
+    """Estado por worker (pool, cachés, métricas, precarga) como recién arrancado."""
+    oracle_pool._reiniciar_estado_en_hijo()
+    oracle_async._particiones, oracle_async._particiones_pid = {}, None
+    with oracle_replay._fixtures_lock:
+        oracle_replay._fixtures.clear()
+    with oracle_exec._metricas_lock:
+        oracle_exec._metricas_sp.clear()
+    for cache in (cache_listados, cache_detalles, cache_asociados):
+        cache._reiniciar()
+    prefetch_detalles._reiniciar()
+    validacion_lote._reiniciar()
+    separadores_sesion.cache_clear()
+
+
+def fila_detalle(obligacion, cedula='1000000', cuotas=3, **campos):
+    """Fila de SP_PLANPAGOS* para la obligación (ver bench_plan_pagos.fila_sintetica)."""
+    return dict(fila_sintetica(cuotas), OBLIGACION=obligacion, CEDULA=cedula, **campos)
+
+
+class OracleReplayMixin:
+    """
+    Pruebas contra el PoolReplay: cada prueba parte de un pool, cachés y métricas vacíos
+    y graba con grabar() las respuestas de los procedimientos que llama.
+    """
+    ajustes_oracle = {}
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.fixtures_dir = Path(directorio.name)
+        ajustes = {
+            'ORACLE_MODO': 'replay',
+            'ORACLE_FIXTURES_DIR': directorio.name,
+            'ORACLE_REPLAY_LATENCIA_MS': 0,
+            'ORACLE_REPLAY_JITTER_MS': 0,
+            'ORACLE_REPLAY_ESTRICTO': False,
+            'MEDIA_ROOT': os.path.join(directorio.name, 'media'),
+            #? Nivel compartido de las cachés en memoria: sin Postgres y vacío en cada prueba
+            'CACHES': {
+                'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+                'oracle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                           'LOCATION': directorio.name},
+            },
+        }
+        ajustes = override_settings(**{**ajustes, **self.ajustes_oracle})
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        reiniciar_estado()
+        self.addCleanup(reiniciar_estado)
+
+    def grabar(self, procedimiento, parametros, filas, columnas=None, defecto=False):
+        """
+        Fixture de procedimiento(*parametros): 'filas' son dicts (o tuplas con 'columnas').
+        Con defecto=True responde a cualquier parámetro sin fixture propio.
+        """
+        if columnas is None:
+            columnas = tuple(filas[0]) if filas else ('CEDULA',)
+        tuplas = [tuple(f[c] for c in columnas) if isinstance(f, dict) else tuple(f) for f in filas]
+        description = [(c, oracledb.DB_TYPE_VARCHAR, None, None, None, None, True) for c in columnas]
+        ruta = oracle_replay.guardar_fixture(procedimiento, parametros, description, tuplas)
+        if defecto:
+            ruta = ruta.replace(oracle_replay.ruta_fixture_defecto(procedimiento))
+        return ruta
@@ -1,8 +1,18 @@
 from django.urls import path
-from .views import ListarFlujosPendientes, GenerarPDF, historial_pdfs, ValidarAsociado
+from .views import ListarFlujosPendientes, GenerarPDF, GenerarPDFLote, historial_pdfs, ValidarAsociado, ValidarAsociadoLote, EstadisticasOracle, NegativosOracle
+from .views_async import ListarFlujosPendientesAsync, GenerarPDFAsync, ValidarAsociadoAsync
 
 urlpatterns = [
     path('listar-flujos-pendientes/', ListarFlujosPendientes.as_view(), name='listar-flujos-pendientes'),
     path('generar-pdf/<str:obligacion>/', GenerarPDF.as_view(), name='generar-pdf'),
+    path('generar-pdf-lote/', GenerarPDFLote.as_view(), name='generar-pdf-lote'),
     path('historial/', historial_pdfs, name='historial_pdfs'),
-    path('validar-asociado/<str:identificacion>/', ValidarAsociado.as_view(), name='validar-asociado'),]
\ No newline at end of file
+    path('validar-asociado/<str:identificacion>/', ValidarAsociado.as_view(), name='validar-asociado'),
+    path('validar-asociado-lote/', ValidarAsociadoLote.as_view(), name='validar-asociado-lote'),
+    path('oracle/estadisticas/', EstadisticasOracle.as_view(), name='oracle-estadisticas'),
+    path('oracle/negativos/', NegativosOracle.as_view(), name='oracle-negativos'),
+    #? Variantes async (servidas por el worker ASGI, ver docker-compose.yml)
+    path('async/listar-flujos-pendientes/', ListarFlujosPendientesAsync.as_view(), name='listar-flujos-pendientes-async'),
+    path('async/generar-pdf/<str:obligacion>/', GenerarPDFAsync.as_view(), name='generar-pdf-async'),
+    path('async/validar-asociado/', ValidarAsociadoAsync.as_view(), name='validar-asociado-async-post'),
+    path('async/validar-asociado/<str:identificacion>/', ValidarAsociadoAsync.as_view(), name='validar-asociado-async'),]
\ No newline at end of file
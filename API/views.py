@@ -1,7 +1,8 @@
 from django.core.files.base import ContentFile
 from rest_framework.views import APIView
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 
 from datetime import datetime
 import logging
@@ -9,6 +10,9 @@ import os
 from django.conf import settings
 import oracledb
 import io
+import contextlib
+import json
+import zipfile
 from decimal import Decimal, InvalidOperation
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import letter
@@ -19,13 +23,37 @@ from itertools import groupby
 from operator import itemgetter
 import textwrap
 from django.shortcuts import render
+from django.db import DatabaseError
 from django.db.models import Q
+from django.utils import timezone
 from django.contrib.auth.decorators import login_required
-from .models import HistorialPDFs
-from .oracle_pool import acquire_connection
+from .models import HistorialPDFs, PagareFallido
+from .oracle_pool import estadisticas_pool, PoolSaturadoError
+from .oracle_exec import ejecutar_procedimiento, estadisticas_procedimientos
+from .oracle_async import estadisticas_pool_async
+from .bloqueos import bloqueo_generacion
+from .asociados import consultar_asociado, normalizar_cedulas, validacion_lote
+from .cache import (
+    cabeceras_cache,
+    cache_asociados,
+    cache_detalles,
+    cache_listados,
+    listado_cacheado,
+    pide_sin_cache,
+)
+from .prefetch import prefetch_activo, prefetch_detalles
+from .negativos import MOTIVO_SIN_FILAS, Fallo, buscar_negativo, consultar_lote, registrar_negativo, serializar_negativo
+from .plan_pagos import procesar_flujos
+from .flujos import LecturaListado, resumen_json, resumen_listado
+from .deadline import DeadlineAgotadoError, verificar_deadline
+from .respuestas import respuesta_deadline_agotado, respuesta_generacion_en_curso, respuesta_pool_saturado
+from .numeros import parse_numero
 
 logger = logging.getLogger(__name__)
 
+#? Partición del pool Oracle (cuota ORACLE_POOL_CUOTAS) que consume esta app
+PARTICION_ORACLE = 'API'
+
 @login_required
 def historial_pdfs(request):
     query = (request.GET.get('q') or '').strip()
@@ -44,11 +72,6 @@ def historial_pdfs(request):
         'not_found': not_found,
     })
 
-def _get_oracle_connection():
-    """Obtiene conexión Oracle desde el pool configurado."""
-    return acquire_connection()
-
-
 def _obtener_pagare(obligacion):
     """Convierte una obligación (ej. 10-123456789) en el pagaré esperado por Oracle."""
     if not obligacion:
@@ -65,152 +88,114 @@ def _filtrar_flujos(pagare=None):
     Llama al procedimiento almacenado SP_PLANPAGOS y retorna los flujos.
     Se puede proporcionar un pagaré para filtrar los resultados.
     """
-    print("FILTRANDO POR PAGARE:", pagare)
-    with _get_oracle_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.callTimeout = getattr(settings, "ORACLE_CALL_TIMEOUT_MS", 60000)
-            ref_cursor_out = cursor.var(oracledb.CURSOR)
-            
-            # Se le pasa el pagare al SP para que filtre en la base de datos.
-            parametros_completos = [pagare, ref_cursor_out]
-            logger.info(f"Llamando SP_PLANPAGOS con parametros: {parametros_completos}")
-            cursor.callproc('SP_PLANPAGOS', parametros_completos)
-            
-            result_cursor = ref_cursor_out.getvalue()
+    #? Si el listado ya precargó el detalle (PREFETCH_DETALLES) no se consulta Oracle
+    flujos = prefetch_detalles.tomar('SP_PLANPAGOS', pagare)
+    if flujos is not None:
+        logger.info(f"SP_PLANPAGOS: usando flujos precargados para el pagaré {pagare}")
+        return flujos
 
-            if not result_cursor:
-                return []
+    #? Caché negativa: tras un fallo reciente se repite el error sin llamar a Oracle
+    fallido = buscar_negativo('SP_PLANPAGOS', pagare)
+    if fallido is not None and fallido.vigente:
+        logger.info(f"SP_PLANPAGOS: fallo en caché para el pagaré {pagare} ({fallido.motivo})")
+        return []
+
+    # Se le pasa el pagare al SP para que filtre en la base de datos.
+    logger.info(f"Llamando SP_PLANPAGOS con parametros: {[pagare]}")
+    all_rows = ejecutar_procedimiento('SP_PLANPAGOS', [pagare], particion=PARTICION_ORACLE)
+
+    if not all_rows:
+        logger.info(f"SP_PLANPAGOS: sin filas para el pagaré {pagare}")
+        registrar_negativo('SP_PLANPAGOS', pagare, MOTIVO_SIN_FILAS)
+        return []
+
+    if fallido is not None:
+        #? El pagaré ya responde: se olvida el fallo anterior
+        fallido.delete()
+
+    logger.debug(f"SP_PLANPAGOS: {len(all_rows)} filas para el pagaré {pagare}")
+    return _procesar_flujos(all_rows)
+
+
+def _filtrar_flujos_lote(pagares):
+    """
+    SP_PLANPAGOS para varios pagarés en una sola ida y vuelta a Oracle, sin los que están
+    en la caché negativa (ver negativos.consultar_lote).
+    Retorna los flujos de cada pagaré (o su Fallo) en el mismo orden de 'pagares'.
+    """
+    logger.info(f"Llamando SP_PLANPAGOS en lote para {len(pagares)} pagarés")
+    resultados = consultar_lote('SP_PLANPAGOS', pagares, particion=PARTICION_ORACLE)
+    return [filas if isinstance(filas, Fallo) else _procesar_flujos(filas) for filas in resultados]
+
+
+def _procesar_flujos(all_rows):
+    """Normaliza las filas de SP_PLANPAGOS y arma el PLAN_PAGO de cada una. Ver API/plan_pagos.py."""
+    return procesar_flujos(all_rows)
+
+#? Normaliza y filtra el listado mientras se lee el cursor (API/flujos.py)
+_LECTURA_LISTADO = LecturaListado(_obtener_pagare)
 
-            try:
-                cols = [c[0] for c in result_cursor.description]
-                all_rows = [dict(zip(cols, row)) for row in result_cursor]
-            finally:
-                # Asegurarse de cerrar el cursor del procedimiento almacenado
-                if result_cursor:
-                    result_cursor.close()
-
-            if not all_rows:
-                print("El SP no retornó filas para el pagaré:", pagare)
-                return []
-
-            print("FILTRADO POR PAGARE - TOTAL ROWS:", len(all_rows))
-
-            # Procesamiento de las filas
-            for row in all_rows:
-                for key, value in row.items():
-                    if value is None:
-                        row[key] = ''
-                
-                if 'MAIL' not in row or not row['MAIL']:
-                    row['MAIL'] = 'no-email@example.com'
-
-                plan_pago = []
-                nos = str(row.get('NO', '')).split(';')
-                fechas = str(row.get('FECHA', '')).split(';')
-                abonos_capital = str(row.get('ABONO_CAPITAL', '')).split(';')
-                abonos_interes = str(row.get('ABONO_INTERES', '')).split(';')
-                seguro_vida = str(row.get('SEGURO_VIDA', '')).split(';')
-                otros_conceptos = str(row.get('OTROS_CONCEPTOS', '')).split(';')
-                capitalizaciones = str(row.get('CAPITALIZACION', '')).split(';')
-                valores_cuota = str(row.get('VALOR_CUOTA', '')).split(';')
-                saldos_parcial = str(row.get('SALDO_PARCIAL', '')).split(';')
-
-                num_cuotas = len(nos)
-                for i in range(num_cuotas):
-                    plan_pago.append({
-                        'NO': (nos[i] if i < len(nos) else '').strip(),
-                        'FECHA': (fechas[i] if i < len(fechas) else '').strip(),
-                        'ABONO_CAPITAL': (abonos_capital[i] if i < len(abonos_capital) else '').strip(),
-                        'ABONO_INTERES': (abonos_interes[i] if i < len(abonos_interes) else '').strip(),
-                        'SEGURO_VIDA': (seguro_vida[i] if i < len(seguro_vida) else '').strip(),
-                        'OTROS_CONCEPTOS': (otros_conceptos[i] if i < len(otros_conceptos) else '').strip(),
-                        'CAPITALIZACION': (capitalizaciones[i] if i < len(capitalizaciones) else '').strip(),
-                        'VALOR_CUOTA': (valores_cuota[i] if i < len(valores_cuota) else '').strip(),
-                        'SALDO_PARCIAL': (saldos_parcial[i] if i < len(saldos_parcial) else '').strip(),
-                    })
-                
-                row['PLAN_PAGO'] = plan_pago
-                
-                fechas_no_vacias = [r['FECHA'] for r in plan_pago if r.get('FECHA')]
-                row['FECHAULTIMA'] = fechas_no_vacias[-1] if fechas_no_vacias else row.get('FECHAULTIMA', 'N/A')
-
-                valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if str(r.get('NO')) == '1' and r.get('VALOR_CUOTA')), None)
-                if not valor_cuota_no1:
-                    valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if r.get('VALOR_CUOTA')), None)
-                row['VALORCUOTA'] = valor_cuota_no1 or row.get('VALORCUOTA', 'N/A')
-
-            return all_rows
 
 def _obtener_datos_basicos():
     """
     Llama al procedimiento almacenado SP_PLANPAGOS1 y retorna los datos básicos.
 
     De este procedimiento, nos interesan principalmente: CEDULA, NOMBRE, MAIL, OBLIGACION.
+    Las filas llegan normalizadas, con su PAGARE y sin las que no tienen MAIL o CEDULA.
     """
     now = datetime.now()
     fecha_actual = now.strftime("%Y/%m/%d %H:%M:%S")
 
-    with _get_oracle_connection() as conn:
-        with conn.cursor() as cursor:
-            ref_cursor_out = cursor.var(oracledb.CURSOR)
-            parametros_completos = [fecha_actual, ref_cursor_out]
-            
-            logger.info(f"Llamando SP_PLANPAGOS1 con parametros: {parametros_completos}")
-            cursor.callproc('SP_PLANPAGOS1', parametros_completos)
-            
-            result_cursor = ref_cursor_out.getvalue()
-            
-            if not result_cursor:
-                return []
+    logger.info(f"Llamando SP_PLANPAGOS1 con parametros: {[fecha_actual]}")
+    return ejecutar_procedimiento('SP_PLANPAGOS1', [fecha_actual], particion=PARTICION_ORACLE, lectura=_LECTURA_LISTADO)
 
-            try:
-                cols = [c[0] for c in result_cursor.description]
-                fetched_rows = result_cursor.fetchall()
-                all_rows = [dict(zip(cols, row)) for row in fetched_rows]
-            finally:
-                # Asegurarse de cerrar el cursor del procedimiento almacenado
-                if result_cursor:
-                    result_cursor.close()
-
-            # Procesar los datos obtenidos
-            for row in all_rows:
-                # Reemplazar valores None por strings vacíos
-                for key, value in row.items():
-                    if value is None:
-                        row[key] = ''
-                
-                # Asignar un email por defecto si no existe o está vacío
-                if 'MAIL' not in row or not row['MAIL']:
-                    row['MAIL'] = 'no-email@example.com'
-
-                # Guardar el pagaré derivado de la obligación para su uso en la API
-                row['PAGARE'] = _obtener_pagare(row.get('OBLIGACION'))
-
-            return all_rows
+
+def _resumen_flujos(all_flows):
+    """
+    Resumen (FlujoResumen) de los flujos pendientes. Las filas sin MAIL válido o sin
+    CEDULA ya las descartó _LECTURA_LISTADO durante el fetch.
+    """
+    return resumen_listado(all_flows)
+
+
+def _obtener_resumen():
+    """Resumen del listado SP_PLANPAGOS1: lo que se guarda en la caché de listados."""
+    return _resumen_flujos(_obtener_datos_basicos())
+
+def _pagares_pendientes(summary_list):
+    """
+    PAGARE de los flujos del resumen que aún no tienen PDF en HistorialPDFs: el listado
+    de API los incluye todos, pero solo los pendientes se van a generar y vale la pena precargarlos.
+    """
+    if not prefetch_activo():
+        return []
+    #? Solo las filas del historial de este listado (el historial crece con cada PDF)
+    claves = {str(valor).strip() for flow in summary_list for valor in (flow.OBLIGACION, flow.PAGARE)}
+    try:
+        existentes = set(
+            HistorialPDFs.objects.filter(obligacion__in=claves).values_list("obligacion", flat=True)
+        )
+    except DatabaseError as e:
+        logger.warning(f"Sin historial para filtrar la precarga: {e}")
+        return []
+    return [
+        flow.PAGARE for flow in summary_list
+        if str(flow.OBLIGACION).strip() not in existentes and str(flow.PAGARE).strip() not in existentes
+    ]
 
 class ListarFlujosPendientes(APIView):
 
     def get(self, request):
         try:
-            all_flows = _obtener_datos_basicos()
-            # Filtrar solo registros con MAIL válido y CEDULA no vacía
-            all_flows = [
-                flow for flow in all_flows
-                if flow.get("MAIL")
-                and flow.get("MAIL") != "no-email@example.com"
-                and str(flow.get("CEDULA", "")).strip()
-            ]
-            summary_list = []
-            for flow in all_flows:
-                pagare = flow.get("PAGARE") or _obtener_pagare(flow.get("OBLIGACION"))
-                summary_list.append({
-                    "CEDULA": flow.get("CEDULA"),
-                    "NOMBRE": flow.get("NOMBRE"),
-                    "MAIL": flow.get("MAIL"),
-                    "OBLIGACION": flow.get("OBLIGACION"),
-                    "PAGARE": pagare,
-                })
-            return JsonResponse(summary_list, safe=False, status=status.HTTP_200_OK)
+            listado = listado_cacheado('SP_PLANPAGOS1', _obtener_resumen)
+            summary_list = listado.valor
+            prefetch_detalles.programar('SP_PLANPAGOS', _pagares_pendientes(summary_list), _procesar_flujos)
+            response = JsonResponse(resumen_json(summary_list), safe=False, status=status.HTTP_200_OK)
+            return cabeceras_cache(response, listado)
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
         except Exception as e:
             logger.error(f"Error en la funcin ListarFlujosPendientes: {e}", exc_info=True)
             return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -218,42 +203,8 @@ class ListarFlujosPendientes(APIView):
 class GenerarPDF(APIView):
 
     def _parse_number(self, s):
-        """
-        Convierte una cadena en Decimal entendiendo formatos:
-        - '1.234.567' -> 1234567
-        - '146004,84' -> 146004.84
-        - '146004.84' -> 146004.84
-        - '3,791,706'  -> 3791706
-        - '' o None    -> 0
-        """
-        if s is None:
-            return Decimal(0)
-        s = str(s).strip()
-        if not s:
-            return Decimal(0)
-
-        # Si tiene ambos separadores, asume . = miles, , = decimal (formato PESOS)
-        if '.' in s and ',' in s:
-            s = s.replace('.', '').replace(',', '.')
-        else:
-            # Si sólo tiene ',', aseume que es decimal
-            if ',' in s:
-                s = s.replace('.', '')  # por si vienen puntos de miles mezclados
-                s = s.replace(',', '.')
-            else:
-                # Sólo tiene puntos. ¿Es decimal?
-                parts = s.split('.')
-                if len(parts) > 1 and len(parts[-1]) <= 2:
-                    # ej: 146004.84 => decimal, se conserva
-                    s = ''.join(parts[:-1]) + '.' + parts[-1]
-                else:
-                    # ej: 1.234.567 => miles, se remueven
-                    s = s.replace('.', '')
-
-        try:
-            return Decimal(s)
-        except InvalidOperation:
-            return Decimal(0)
+        """Convierte una cadena de Oracle en Decimal ('' o None -> 0). Ver API/numeros.py."""
+        return parse_numero(s)
 
     def _format_colombian(self, num_str):
         """Formatea a miles con punto. Acepta str/Decimal/float; sin decimales en la salida."""
@@ -702,31 +653,19 @@ class GenerarPDF(APIView):
         if end_row is None:
             end_row = len(plan_pago_data)
         
-        data_slice = plan_pago_data[start_row:end_row]
-
         headers = ["No.", "Fecha", "Abono\nCapital", "Abono\nInterés", "Seguro de\nvida", "Otros\nconceptos", "Capitalización", "Valor Cuota", "Saldo\nparcial"]
-        col_names = ['NO', 'FECHA', 'ABONO_CAPITAL', 'ABONO_INTERES', 'SEGURO_VIDA', 'OTROS_CONCEPTOS', 'CAPITALIZACION', 'VALOR_CUOTA', 'SALDO_PARCIAL']
-        
+
         table_data = [headers]
-        
-        for row in data_slice:
-            formatted_row = []
-            for idx, col_name in enumerate(col_names):
-                value = row.get(col_name, '')
-                if idx > 1:
-                    formatted_row.append(self._format_colombian(value))
-                else:
-                    formatted_row.append(str(value))
-            table_data.append(formatted_row)
+
+        #? El plan se lee por columnas (API/plan_pagos.py): las cuotas del tramo salen como tuplas
+        for no, fecha, *valores in plan_pago_data.filas(start_row, end_row):
+            table_data.append([no, fecha, *map(self._format_colombian, valores)])
 
         is_last_slice = (end_row >= len(plan_pago_data))
-        # Dentro de _draw_payment_table, en el bloque de totales:
         if is_last_slice and len(plan_pago_data) > 0:
+            #? Totales de las columnas numéricas, calculados una vez por plan
             totales = ['Totales', '']
-            for col_idx, col_name in enumerate(col_names):
-                if col_idx > 1:
-                    total = sum(self._parse_number(row.get(col_name, 0)) for row in plan_pago_data if row.get(col_name) not in (None, ''))
-                    totales.append(self._format_colombian(total))
+            totales.extend(self._format_colombian(total) for total in plan_pago_data.totales().values())
             # Vacía el total de "Saldo parcial"
             totales[-1] = ''
             table_data.append(totales)
@@ -786,105 +725,232 @@ class GenerarPDF(APIView):
         p.setFont("Helvetica", 9.5)
         p.drawRightString(width - 40, 30, f"Página: {page_num}")
 
+    def _respuesta_duplicado(self, obligacion):
+        logger.warning(
+            "Intento de generar un PDF duplicado para la obligación %s. Proceso detenido.",
+            obligacion,
+        )
+        # Devolvemos 409 Conflict para indicar que el recurso ya existe y detener el workflow.
+        # Un 204 (No Content) es una respuesta de ÉXITO, por lo que el workflow continuaría.
+        return HttpResponse(
+            content=f"CONFLICT: El PDF para la obligación {obligacion} ya existe en la base de datos.",
+            status=status.HTTP_409_CONFLICT,
+        )
+
+    def _responder_pdf(self, obligacion, flujos_filtrados):
+        """Genera el PDF del primer flujo, lo guarda en el historial y lo retorna."""
+        if not flujos_filtrados:
+            return JsonResponse({"error": "Flujo no encontrado para la obligación proporcionada"}, status=status.HTTP_404_NOT_FOUND)
+
+        target_flujo = flujos_filtrados[0]
+        cedula = target_flujo.get('CEDULA')
+
+        if not cedula:
+            return JsonResponse({"error": "No se encontró la cédula para la obligación dada."}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_name, contenido = self._construir_pdf(obligacion, target_flujo)
+
+        response = HttpResponse(contenido, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
+        
+        return response
+
+    def _construir_pdf(self, obligacion, target_flujo):
+        """Renderiza el PDF del flujo, lo guarda en el historial y retorna (nombre, bytes)."""
+        cedula = target_flujo.get('CEDULA')
+        file_name, contenido = self._renderizar_pdf(target_flujo)
+
+        verificar_deadline('guardado')
+        # Guardar el nuevo PDF en el historial (ya no se necesita la comprobación aquí).
+        historial = HistorialPDFs(
+            obligacion=obligacion,
+            cedula_cliente=cedula
+        )
+        historial.pdf_file.save(file_name, ContentFile(contenido))
+        historial.save()
+
+        return file_name, contenido
+
+    def _renderizar_pdf(self, target_flujo):
+        """Solo el render (sin historial): retorna (nombre, bytes). Lo usa también bench_replay."""
+        cedula = target_flujo.get('CEDULA')
+
+        #? No se renderiza si el cliente ya no va a esperar el PDF
+        verificar_deadline('render')
+        buffer = io.BytesIO()
+
+        cedula_password = str(cedula)
+        p = canvas.Canvas(buffer, pagesize=letter, encrypt=cedula_password)
+        width, height = letter
+        
+        self._draw_header(p, width, height)
+        
+        y_pos = height - 80
+        y_pos = self._draw_client_data(p, width, y_pos, target_flujo)
+        y_pos -= 4
+        y_pos = self._draw_obligation_data(p, width, y_pos, target_flujo)
+        y_pos -= 4
+        y_pos = self._draw_liquidation_detail(p, width, y_pos, target_flujo)
+        y_pos -= 6
+        y_pos = self._draw_guarantees_data(p, width, y_pos, target_flujo)
+        
+        plan_pago_data = target_flujo.get('PLAN_PAGO', [])
+        rows_per_page = 30
+        num_rows = len(plan_pago_data)
+        
+        num_payment_pages = (num_rows + rows_per_page - 1) // rows_per_page
+        if num_payment_pages == 0:
+            num_payment_pages = 1
+
+        self._draw_page_number(p, width, height, 1)
+
+        page_num = 2
+        start_row = 0
+        for i in range(num_payment_pages):
+            verificar_deadline('render')
+            p.showPage()
+            self._draw_header(p, width, height)
+            y_pos_page = height - 80
+            
+            end_row = start_row + rows_per_page
+            
+            self._draw_payment_table(p, width, y_pos_page, target_flujo, start_row, end_row)
+            
+            self._draw_page_number(p, width, height, page_num)
+            
+            start_row = end_row
+            page_num += 1
+
+        p.save()
+        buffer.seek(0)
+
+        file_name = f'{datetime.now().strftime("%b-%Y").upper()}_ID_{cedula}_SOL.pdf'
+        return file_name, buffer.getvalue()
+
     def get(self, request, obligacion):
+        #? Una sola generación por pagaré entre workers y nodos: si otra petición ya
+        #? la está haciendo se espera a que termine y se responde según el historial.
+        with bloqueo_generacion(f"pdf:{PARTICION_ORACLE}", _obtener_pagare(obligacion) or obligacion) as lider:
+            if not lider:
+                return respuesta_generacion_en_curso(obligacion)
+            return self._generar(request, obligacion)
+
+    def _generar(self, request, obligacion):
         pagare = _obtener_pagare(obligacion)
         # Primero, verificar si el PDF para esta obligación ya existe en el historial.
         if HistorialPDFs.objects.filter(obligacion=obligacion).exists():
-            logger.warning(
-                "Intento de generar un PDF duplicado para la obligación %s. Proceso detenido.",
-                obligacion,
-            )
-            # Devolvemos 409 Conflict para indicar que el recurso ya existe y detener el workflow.
-            # Un 204 (No Content) es una respuesta de ÉXITO, por lo que el workflow continuaría.
-            return HttpResponse(
-                content=f"CONFLICT: El PDF para la obligación {obligacion} ya existe en la base de datos.",
-                status=status.HTTP_409_CONFLICT,
-            )
+            return self._respuesta_duplicado(obligacion)
 
         try:
             # Si no existe, proceder con la lógica de generación de PDF.
             flujos_filtrados = _filtrar_flujos(pagare=pagare or None)
-            
-            if not flujos_filtrados:
-                return JsonResponse({"error": "Flujo no encontrado para la obligación proporcionada"}, status=status.HTTP_404_NOT_FOUND)
-
-            target_flujo = flujos_filtrados[0]
-            cedula = target_flujo.get('CEDULA')
+            return self._responder_pdf(obligacion, flujos_filtrados)
 
-            if not cedula:
-                return JsonResponse({"error": "No se encontró la cédula para la obligación dada."}, status=status.HTTP_400_BAD_REQUEST)
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
+        except Exception as e:
+            logger.error(f"Error en GenerarPDF para obligación {obligacion}: {e}", exc_info=True)
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            buffer = io.BytesIO()
+class GenerarPDFLote(APIView):
+    """
+    POST {"obligaciones": [...]}: genera los PDFs pendientes de varias obligaciones con
+    una sola consulta a Oracle y retorna un ZIP con los PDFs y 'resultado.json'
+    (estado por obligación: generado, duplicado, en_curso, no_encontrado, fallido,
+    sin_cedula o sin_tiempo). Un pagaré con error en Oracle queda como 'fallido' sin
+    afectar a los demás.
+    """
+    generador_class = GenerarPDF
 
-            cedula_password = str(cedula)
-            p = canvas.Canvas(buffer, pagesize=letter, encrypt=cedula_password)
-            width, height = letter
-            
-            self._draw_header(p, width, height)
-            
-            y_pos = height - 80
-            y_pos = self._draw_client_data(p, width, y_pos, target_flujo)
-            y_pos -= 4
-            y_pos = self._draw_obligation_data(p, width, y_pos, target_flujo)
-            y_pos -= 4
-            y_pos = self._draw_liquidation_detail(p, width, y_pos, target_flujo)
-            y_pos -= 6
-            y_pos = self._draw_guarantees_data(p, width, y_pos, target_flujo)
-            
-            plan_pago_data = target_flujo.get('PLAN_PAGO', [])
-            rows_per_page = 30
-            num_rows = len(plan_pago_data)
-            
-            num_payment_pages = (num_rows + rows_per_page - 1) // rows_per_page
-            if num_payment_pages == 0:
-                num_payment_pages = 1
-
-            self._draw_page_number(p, width, height, 1)
-
-            page_num = 2
-            start_row = 0
-            for i in range(num_payment_pages):
-                p.showPage()
-                self._draw_header(p, width, height)
-                y_pos_page = height - 80
-                
-                end_row = start_row + rows_per_page
-                
-                self._draw_payment_table(p, width, y_pos_page, target_flujo, start_row, end_row)
-                
-                self._draw_page_number(p, width, height, page_num)
-                
-                start_row = end_row
-                page_num += 1
-
-            p.save()
-            buffer.seek(0)
-
-            file_name = f'{datetime.now().strftime("%b-%Y").upper()}_ID_{cedula}_SOL.pdf'
-
-            # Guardar el nuevo PDF en el historial (ya no se necesita la comprobación aquí).
-            historial = HistorialPDFs(
-                obligacion=obligacion,
-                cedula_cliente=cedula
+    def post(self, request):
+        obligaciones = request.data.get('obligaciones')
+        if not isinstance(obligaciones, list) or not obligaciones:
+            return JsonResponse(
+                {"error": "El campo 'obligaciones' debe ser una lista no vacía."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        obligaciones = list(dict.fromkeys(str(o).strip() for o in obligaciones if str(o).strip()))
+        maximo = getattr(settings, "PDF_LOTE_MAX", 50)
+        if len(obligaciones) > maximo:
+            return JsonResponse(
+                {"error": f"Se permiten máximo {maximo} obligaciones por lote."},
+                status=status.HTTP_400_BAD_REQUEST
             )
-            historial.pdf_file.save(file_name, ContentFile(buffer.getvalue()))
-            historial.save()
-
-            buffer.seek(0)
 
-            response = HttpResponse(buffer, content_type='application/pdf')
-            response['Content-Disposition'] = f'attachment; filename="{file_name}"'
-            
+        try:
+            with contextlib.ExitStack() as bloqueos:
+                resultado, lideres = self._tomar_bloqueos(bloqueos, obligaciones)
+                flujos = _filtrar_flujos_lote([_obtener_pagare(o) or None for o in lideres]) if lideres else []
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archivo:
+                    self._generar_lote(archivo, resultado, lideres, flujos)
+                    resultado = {o: resultado[o] for o in obligaciones}
+                    archivo.writestr('resultado.json', json.dumps(resultado, ensure_ascii=False, indent=2))
+
+            response = HttpResponse(buffer.getvalue(), content_type='application/zip')
+            response['Content-Disposition'] = f'attachment; filename="LOTE_{datetime.now().strftime("%Y%m%d%H%M%S")}.zip"'
             return response
 
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
         except Exception as e:
-            logger.error(f"Error en GenerarPDF para obligación {obligacion}: {e}", exc_info=True)
+            logger.error(f"Error en GenerarPDFLote: {e}", exc_info=True)
             return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def _tomar_bloqueos(self, bloqueos, obligaciones):
+        """Mismo lock por pagaré que GenerarPDF, sin esperar: las que están en curso se omiten."""
+        resultado = {}
+        candidatas = []
+        for obligacion in obligaciones:
+            lider = bloqueos.enter_context(
+                bloqueo_generacion(f"pdf:{PARTICION_ORACLE}", _obtener_pagare(obligacion) or obligacion, espera_s=0)
+            )
+            if lider:
+                candidatas.append(obligacion)
+            else:
+                resultado[obligacion] = {"estado": "en_curso"}
+        #? Con los locks tomados el historial ya no cambia para estas obligaciones
+        existentes = set(
+            HistorialPDFs.objects.filter(obligacion__in=candidatas).values_list("obligacion", flat=True)
+        )
+        for obligacion in existentes:
+            resultado[obligacion] = {"estado": "duplicado"}
+        return resultado, [o for o in candidatas if o not in existentes]
+
+    def _generar_lote(self, archivo, resultado, obligaciones, flujos):
+        generador = self.generador_class()
+        for i, (obligacion, flujos_filtrados) in enumerate(zip(obligaciones, flujos)):
+            if isinstance(flujos_filtrados, Fallo) and flujos_filtrados.motivo != MOTIVO_SIN_FILAS:
+                resultado[obligacion] = {"estado": "fallido", "motivo": flujos_filtrados.motivo}
+                continue
+            if not flujos_filtrados or isinstance(flujos_filtrados, Fallo):
+                resultado[obligacion] = {"estado": "no_encontrado"}
+                continue
+            if not flujos_filtrados[0].get('CEDULA'):
+                resultado[obligacion] = {"estado": "sin_cedula"}
+                continue
+            try:
+                file_name, contenido = generador._construir_pdf(obligacion, flujos_filtrados[0])
+            except DeadlineAgotadoError:
+                #? Se entrega lo ya generado; el resto queda pendiente para otro lote
+                for pendiente in obligaciones[i:]:
+                    resultado.setdefault(pendiente, {"estado": "sin_tiempo"})
+                break
+            nombre = f"{obligacion}_{file_name}"
+            archivo.writestr(nombre, contenido)
+            resultado[obligacion] = {"estado": "generado", "archivo": nombre}
+
+
 class ValidarAsociado(APIView):
     """
     Endpoint para validar si una cédula corresponde a un asociado.
     Acepta GET con parámetro en la URL y POST con la cédula en el body.
+    Las respuestas se cachean (ASOCIADO_CACHE_TTL_S, los "NO" ASOCIADO_CACHE_TTL_NO_S);
+    con la cabecera Cache-Control: no-cache se consulta Oracle de nuevo.
     """
 
     def get(self, request, identificacion):
@@ -903,28 +969,17 @@ class ValidarAsociado(APIView):
 
     def _consultar_asociado(self, cedula):
         try:
-            with _get_oracle_connection() as conn:
-                with conn.cursor() as cursor:
-                    ref_cursor_out = cursor.var(oracledb.CURSOR)
-                    cursor.callproc('SP_CONSULTACAPA', [str(cedula), ref_cursor_out])
-                    result_cursor = ref_cursor_out.getvalue()
-
-                    if not result_cursor:
-                        return JsonResponse({"respuesta": "NO"}, status=status.HTTP_200_OK)
-
-                    try:
-                        cols = [c[0] for c in result_cursor.description]
-                        row = result_cursor.fetchone()
-
-                        if row:
-                            associate_data = dict(zip(cols, row))
-                            return JsonResponse(associate_data, status=status.HTTP_200_OK)
-                        else:
-                            return JsonResponse({"respuesta": "NO"}, status=status.HTTP_200_OK)
-                    finally:
-                        if result_cursor:
-                            result_cursor.close()
+            resultado = consultar_asociado(cedula, particion=PARTICION_ORACLE, refrescar=pide_sin_cache(self.request))
+            if resultado.valor is not None:
+                response = JsonResponse(resultado.valor, status=status.HTTP_200_OK)
+            else:
+                response = JsonResponse({"respuesta": "NO"}, status=status.HTTP_200_OK)
+            return cabeceras_cache(response, resultado)
 
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
         except oracledb.DatabaseError as e:
             logger.error(f"Error de base de datos en ValidarAsociado: {e}", exc_info=True)
             return JsonResponse(
@@ -937,3 +992,88 @@ class ValidarAsociado(APIView):
                 {"error": "Ocurrió un error inesperado."},
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+
+class ValidarAsociadoLote(APIView):
+    """
+    Valida varias cédulas en una sola petición: POST {"cedulas": [...]} (máximo ASOCIADO_LOTE_MAX).
+    Se quitan duplicados y se consultan en paralelo (ASOCIADO_LOTE_HILOS por worker). La
+    respuesta es NDJSON: una línea por cédula a medida que termina, con
+    {"cedula", "respuesta": "SI"/"NO", "asociado", "cache"} o {"cedula", "error"}.
+    Cache-Control: no-cache consulta Oracle para todas las cédulas.
+    """
+
+    def post(self, request):
+        cedulas = request.data.get('cedulas')
+        if not isinstance(cedulas, list) or not cedulas:
+            return JsonResponse(
+                {"error": "El campo 'cedulas' debe ser una lista no vacía."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        cedulas = normalizar_cedulas(cedulas)
+        maximo = getattr(settings, "ASOCIADO_LOTE_MAX", 1000)
+        if len(cedulas) > maximo:
+            return JsonResponse(
+                {"error": f"Se permiten como máximo {maximo} cédulas distintas por petición."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        logger.info(f"ValidarAsociadoLote: {len(cedulas)} cédulas distintas")
+        resultados = validacion_lote.validar(
+            cedulas, particion=PARTICION_ORACLE, refrescar=pide_sin_cache(request)
+        )
+        response = StreamingHttpResponse(
+            (json.dumps(r, default=str) + "\n" for r in resultados),
+            content_type='application/x-ndjson',
+        )
+        response['X-Total-Cedulas'] = str(len(cedulas))
+        return response
+
+
+class EstadisticasOracle(APIView):
+    """
+    Endpoint interno (solo staff) con el estado del pool Oracle del worker que atiende la petición.
+    Cada worker de gunicorn tiene su propio pool; el campo 'pid' identifica al worker.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return JsonResponse({
+            "pool": estadisticas_pool(),
+            "pool_async": estadisticas_pool_async(),
+            "procedimientos": estadisticas_procedimientos(),
+            "cache_listados": cache_listados.estadisticas(),
+            "cache_detalles": cache_detalles.estadisticas(),
+            "cache_asociados": cache_asociados.estadisticas(),
+            "prefetch": prefetch_detalles.estadisticas(),
+        }, status=status.HTTP_200_OK)
+
+
+class NegativosOracle(APIView):
+    """
+    Endpoint interno (solo staff) de la caché negativa de pagarés (PagareFallido).
+    GET lista los registros (?procedimiento=, ?pagare=, ?vigentes=1).
+    DELETE los borra con los mismos filtros, para forzar que el próximo intento consulte Oracle.
+    """
+    permission_classes = [IsAdminUser]
+
+    def _filtrar(self, request):
+        registros = PagareFallido.objects.all()
+        procedimiento = request.query_params.get('procedimiento')
+        pagare = request.query_params.get('pagare')
+        if procedimiento:
+            registros = registros.filter(procedimiento=procedimiento)
+        if pagare:
+            registros = registros.filter(pagare=pagare)
+        if request.query_params.get('vigentes') in ('1', 'true'):
+            registros = registros.filter(reintentar_despues__gt=timezone.now())
+        return registros
+
+    def get(self, request):
+        registros = [serializar_negativo(f) for f in self._filtrar(request)[:500]]
+        return JsonResponse({"total": len(registros), "registros": registros}, status=status.HTTP_200_OK)
+
+    def delete(self, request):
+        borrados, _ = self._filtrar(request).delete()
+        logger.info("Caché negativa: %s registros borrados por %s", borrados, request.user)
+        return JsonResponse({"borrados": borrados}, status=status.HTTP_200_OK)
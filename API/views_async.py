@@ -0,0 +1,164 @@
+import json
+import logging
+from datetime import datetime
+
+import oracledb
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+
+from .models import HistorialPDFs
+from .oracle_async import ejecutar_procedimiento_async
+from .oracle_pool import PoolSaturadoError
+from .bloqueos import bloqueo_generacion_async
+from .cache import asociado_cacheado_async, cabeceras_cache, listado_cacheado_async, pide_sin_cache
+from .prefetch import prefetch_detalles
+from .flujos import resumen_json
+from .negativos import MOTIVO_SIN_FILAS, buscar_negativo, registrar_negativo
+from .deadline import DeadlineAgotadoError
+from .respuestas import respuesta_deadline_agotado, respuesta_generacion_en_curso, respuesta_pool_saturado
+from .views import (
+    GenerarPDF,
+    PARTICION_ORACLE,
+    _LECTURA_LISTADO,
+    _obtener_pagare,
+    _procesar_flujos,
+    _resumen_flujos,
+)
+
+logger = logging.getLogger(__name__)
+
+#? Vistas async para ASGI (gunicorn -k uvicorn.workers.UvicornWorker APICore.asgi:application).
+#? Mientras un SP está en curso el worker sigue atendiendo otras peticiones.
+#? Como las APIView de DRF, no usan protección CSRF (las consume n8n, no un navegador).
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ListarFlujosPendientesAsync(View):
+    procedimiento = 'SP_PLANPAGOS1'
+
+    async def _consultar(self):
+        fecha_actual = datetime.now().strftime("%Y/%m/%d %H:%M:%S")
+        all_flows = await ejecutar_procedimiento_async(
+            self.procedimiento, [fecha_actual], lectura=_LECTURA_LISTADO, particion=PARTICION_ORACLE
+        )
+        return _resumen_flujos(all_flows)
+
+    async def get(self, request):
+        try:
+            listado = await listado_cacheado_async(self.procedimiento, self._consultar)
+            response = JsonResponse(resumen_json(listado.valor), safe=False, status=status.HTTP_200_OK)
+            return cabeceras_cache(response, listado)
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
+        except Exception as e:
+            logger.error(f"Error en ListarFlujosPendientesAsync: {e}", exc_info=True)
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class GenerarPDFAsync(View):
+    """
+    La consulta a Oracle es async; el render con reportlab y el guardado en el
+    historial reutilizan GenerarPDF y corren en un hilo (sync_to_async).
+    """
+    procedimiento = 'SP_PLANPAGOS'
+    generador_class = GenerarPDF
+
+    async def get(self, request, obligacion):
+        #? Mismo lock que GenerarPDF: el servicio sync y el async no generan el mismo PDF a la vez
+        async with bloqueo_generacion_async(f"pdf:{PARTICION_ORACLE}", _obtener_pagare(obligacion) or obligacion) as lider:
+            if not lider:
+                return respuesta_generacion_en_curso(obligacion)
+            return await self._generar(obligacion)
+
+    async def _consultar_flujos(self, pagare):
+        """Igual que _filtrar_flujos, con la caché negativa por pagaré."""
+        fallido = await sync_to_async(buscar_negativo)(self.procedimiento, pagare)
+        if fallido is not None and fallido.vigente:
+            return []
+        all_rows = await ejecutar_procedimiento_async(self.procedimiento, [pagare or None], particion=PARTICION_ORACLE)
+        if not all_rows:
+            await sync_to_async(registrar_negativo)(self.procedimiento, pagare, MOTIVO_SIN_FILAS)
+            return []
+        if fallido is not None:
+            await fallido.adelete()
+        return _procesar_flujos(all_rows)
+
+    async def _generar(self, obligacion):
+        generador = self.generador_class()
+        pagare = _obtener_pagare(obligacion)
+        if await HistorialPDFs.objects.filter(obligacion=obligacion).aexists():
+            return generador._respuesta_duplicado(obligacion)
+
+        try:
+            flujos_filtrados = await prefetch_detalles.tomar_async(self.procedimiento, pagare)
+            if flujos_filtrados is None:
+                flujos_filtrados = await self._consultar_flujos(pagare)
+            return await sync_to_async(generador._responder_pdf)(obligacion, flujos_filtrados)
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
+        except Exception as e:
+            logger.error(f"Error en GenerarPDFAsync para obligación {obligacion}: {e}", exc_info=True)
+            return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class ValidarAsociadoAsync(View):
+    """Versión async de ValidarAsociado: GET con la cédula en la URL o POST con {"cedula": ...}."""
+
+    async def get(self, request, identificacion):
+        return await self._consultar_asociado(identificacion)
+
+    async def post(self, request):
+        try:
+            cedula = json.loads(request.body or b'{}').get('cedula')
+        except (ValueError, AttributeError):
+            cedula = None
+
+        if not cedula:
+            return JsonResponse(
+                {"error": "El campo 'cedula' es requerido."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return await self._consultar_asociado(cedula)
+
+    async def _consultar_asociado(self, cedula):
+        async def cargar():
+            filas = await ejecutar_procedimiento_async(
+                'SP_CONSULTACAPA', [str(cedula)], max_filas=1, particion=PARTICION_ORACLE
+            )
+            return filas[0] if filas else None
+
+        try:
+            resultado = await asociado_cacheado_async(cedula, cargar, refrescar=pide_sin_cache(self.request))
+            if resultado.valor is not None:
+                response = JsonResponse(resultado.valor, status=status.HTTP_200_OK)
+            else:
+                response = JsonResponse({"respuesta": "NO"}, status=status.HTTP_200_OK)
+            return cabeceras_cache(response, resultado)
+
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
+        except oracledb.DatabaseError as e:
+            logger.error(f"Error de base de datos en ValidarAsociadoAsync: {e}", exc_info=True)
+            return JsonResponse(
+                {"error": "Error al consultar la base de datos."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        except Exception as e:
+            logger.error(f"Error inesperado en ValidarAsociadoAsync: {e}", exc_info=True)
+            return JsonResponse(
+                {"error": "Ocurrió un error inesperado."},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
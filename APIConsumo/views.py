@@ -22,10 +22,23 @@ from django.shortcuts import render
 from django.db.models import Q
 from django.contrib.auth.decorators import login_required
 from API.models import HistorialPDFs
-from API.oracle_pool import acquire_connection
+from API.oracle_pool import PoolSaturadoError
+from API.oracle_exec import ejecutar_procedimiento
+from API.bloqueos import bloqueo_generacion
+from API.cache import cabeceras_cache, listado_cacheado
+from API.prefetch import prefetch_detalles
+from API.negativos import MOTIVO_ORA_01422, MOTIVO_SIN_FILAS, buscar_negativo, registrar_negativo
+from API.plan_pagos import procesar_flujos
+from API.flujos import LecturaListado, resumen_json, resumen_listado
+from API.deadline import DeadlineAgotadoError, verificar_deadline
+from API.respuestas import respuesta_deadline_agotado, respuesta_generacion_en_curso, respuesta_pool_saturado
+from API.numeros import parse_numero
 
 logger = logging.getLogger(__name__)
 
+#? Partición del pool Oracle (cuota ORACLE_POOL_CUOTAS) que consume esta app
+PARTICION_ORACLE = 'APIConsumo'
+
 class OracleExactFetchError(Exception):
     """Raised when Oracle returns ORA-01422 from SP_PLANPAGOSCONSUMO."""
 
@@ -47,11 +60,6 @@ def historial_pdfs(request):
         'not_found': not_found,
     })
 
-def _get_oracle_connection():
-    """Obtiene conexión Oracle desde el pool configurado."""
-    return acquire_connection()
-
-
 def _obtener_pagare(obligacion):
     """Convierte una obligación (ej. 10-123456789) en el pagaré esperado por Oracle."""
     if not obligacion:
@@ -68,180 +76,95 @@ def _filtrar_flujos(pagare=None):
     Llama al procedimiento almacenado SP_PLANPAGOSCONSUMO y retorna los flujos.
     Se puede proporcionar un pagaré para filtrar los resultados.
     """
-    print("FILTRANDO POR PAGARE:", pagare)
-    with _get_oracle_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.callTimeout = getattr(settings, "ORACLE_CALL_TIMEOUT_MS", 60000)
-            ref_cursor_out = cursor.var(oracledb.CURSOR)
-            
-            # Se le pasa el pagare al SP para que filtre en la base de datos.
-            parametros_completos = [pagare, ref_cursor_out]
-            logger.info(f"Llamando SP_PLANPAGOSCONSUMO con parametros: {parametros_completos}")
-            try:
-                cursor.callproc('SP_PLANPAGOSCONSUMO', parametros_completos)
-            except oracledb.DatabaseError as exc:
-                message = str(exc)
-                if "ORA-01422" in message:
-                    logger.error(
-                        "ORA-01422 in SP_PLANPAGOSCONSUMO for pagare=%s",
-                        pagare,
-                        exc_info=True,
-                    )
-                    raise OracleExactFetchError(message) from exc
-                raise
-            
-            result_cursor = ref_cursor_out.getvalue()
+    #? Si el listado ya precargó el detalle (PREFETCH_DETALLES) no se consulta Oracle
+    flujos = prefetch_detalles.tomar('SP_PLANPAGOSCONSUMO', pagare)
+    if flujos is not None:
+        logger.info(f"SP_PLANPAGOSCONSUMO: usando flujos precargados para el pagaré {pagare}")
+        return flujos
+
+    #? Caché negativa: tras un fallo reciente se repite el error sin llamar a Oracle
+    fallido = buscar_negativo('SP_PLANPAGOSCONSUMO', pagare)
+    if fallido is not None and fallido.vigente:
+        logger.info(f"SP_PLANPAGOSCONSUMO: fallo en caché para el pagaré {pagare} ({fallido.motivo})")
+        if fallido.motivo == MOTIVO_ORA_01422:
+            raise OracleExactFetchError(fallido.detalle)
+        return []
+
+    # Se le pasa el pagare al SP para que filtre en la base de datos.
+    logger.info(f"Llamando SP_PLANPAGOSCONSUMO con parametros: {[pagare]}")
+    try:
+        all_rows = ejecutar_procedimiento('SP_PLANPAGOSCONSUMO', [pagare], particion=PARTICION_ORACLE)
+    except oracledb.DatabaseError as exc:
+        message = str(exc)
+        if "ORA-01422" in message:
+            logger.error(
+                "ORA-01422 in SP_PLANPAGOSCONSUMO for pagare=%s",
+                pagare,
+                exc_info=True,
+            )
+            registrar_negativo('SP_PLANPAGOSCONSUMO', pagare, MOTIVO_ORA_01422, message)
+            raise OracleExactFetchError(message) from exc
+        raise
 
-            if not result_cursor:
-                return []
+    if not all_rows:
+        logger.info(f"SP_PLANPAGOSCONSUMO: sin filas para el pagaré {pagare}")
+        registrar_negativo('SP_PLANPAGOSCONSUMO', pagare, MOTIVO_SIN_FILAS)
+        return []
 
-            try:
-                cols = [c[0] for c in result_cursor.description]
-                all_rows = [dict(zip(cols, row)) for row in result_cursor]
-            finally:
-                # Asegurarse de cerrar el cursor del procedimiento almacenado
-                if result_cursor:
-                    result_cursor.close()
-
-            if not all_rows:
-                print("El SP no retornó filas para el pagaré:", pagare)
-                return []
-
-            print("FILTRADO POR PAGARE - TOTAL ROWS:", len(all_rows))
-
-            # Procesamiento de las filas
-            for row in all_rows:
-                for key, value in row.items():
-                    if value is None:
-                        row[key] = ''
-                
-                if 'MAIL' not in row or not row['MAIL']:
-                    row['MAIL'] = 'no-email@example.com'
-
-                plan_pago = []
-                nos = str(row.get('NO', '')).split(';')
-                fechas = str(row.get('FECHA', '')).split(';')
-                abonos_capital = str(row.get('ABONO_CAPITAL', '')).split(';')
-                abonos_interes = str(row.get('ABONO_INTERES', '')).split(';')
-                seguro_vida = str(row.get('SEGURO_VIDA', '')).split(';')
-                otros_conceptos = str(row.get('OTROS_CONCEPTOS', '')).split(';')
-                capitalizaciones = str(row.get('CAPITALIZACION', '')).split(';')
-                valores_cuota = str(row.get('VALOR_CUOTA', '')).split(';')
-                saldos_parcial = str(row.get('SALDO_PARCIAL', '')).split(';')
-
-                num_cuotas = len(nos)
-                for i in range(num_cuotas):
-                    plan_pago.append({
-                        'NO': (nos[i] if i < len(nos) else '').strip(),
-                        'FECHA': (fechas[i] if i < len(fechas) else '').strip(),
-                        'ABONO_CAPITAL': (abonos_capital[i] if i < len(abonos_capital) else '').strip(),
-                        'ABONO_INTERES': (abonos_interes[i] if i < len(abonos_interes) else '').strip(),
-                        'SEGURO_VIDA': (seguro_vida[i] if i < len(seguro_vida) else '').strip(),
-                        'OTROS_CONCEPTOS': (otros_conceptos[i] if i < len(otros_conceptos) else '').strip(),
-                        'CAPITALIZACION': (capitalizaciones[i] if i < len(capitalizaciones) else '').strip(),
-                        'VALOR_CUOTA': (valores_cuota[i] if i < len(valores_cuota) else '').strip(),
-                        'SALDO_PARCIAL': (saldos_parcial[i] if i < len(saldos_parcial) else '').strip(),
-                    })
-                
-                row['PLAN_PAGO'] = plan_pago
-                
-                fechas_no_vacias = [r['FECHA'] for r in plan_pago if r.get('FECHA')]
-                row['FECHAULTIMA'] = fechas_no_vacias[-1] if fechas_no_vacias else row.get('FECHAULTIMA', 'N/A')
+    if fallido is not None:
+        #? El pagaré ya responde: se olvida el fallo anterior
+        fallido.delete()
 
-                valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if str(r.get('NO')) == '1' and r.get('VALOR_CUOTA')), None)
-                if not valor_cuota_no1:
-                    valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if r.get('VALOR_CUOTA')), None)
-                row['VALORCUOTA'] = valor_cuota_no1 or row.get('VALORCUOTA', 'N/A')
+    logger.debug(f"SP_PLANPAGOSCONSUMO: {len(all_rows)} filas para el pagaré {pagare}")
+    return _procesar_flujos(all_rows)
 
-            return all_rows
 
+def _procesar_flujos(all_rows):
+    """Normaliza las filas del SP de detalle y arma el PLAN_PAGO de cada una. Ver API/plan_pagos.py."""
+    return procesar_flujos(all_rows)
 
 def _filtrar_flujos_individual(pagare=None):
     """
     Llama al procedimiento almacenado SP_PLANPAGOSCONSUMOINDIVIDUAL y retorna los flujos.
     Se puede proporcionar un pagaré para filtrar los resultados.
     """
-    print("FILTRANDO POR PAGARE (INDIVIDUAL):", pagare)
-    with _get_oracle_connection() as conn:
-        with conn.cursor() as cursor:
-            cursor.callTimeout = getattr(settings, "ORACLE_CALL_TIMEOUT_MS", 60000)
-            ref_cursor_out = cursor.var(oracledb.CURSOR)
-
-            parametros_completos = [pagare, ref_cursor_out]
-            logger.info(f"Llamando SP_PLANPAGOSCONSUMOINDIVIDUAL con parametros: {parametros_completos}")
-            try:
-                cursor.callproc('SP_PLANPAGOSCONSUMOINDIVIDUAL', parametros_completos)
-            except oracledb.DatabaseError as exc:
-                message = str(exc)
-                if "ORA-01422" in message:
-                    logger.error(
-                        "ORA-01422 in SP_PLANPAGOSCONSUMOINDIVIDUAL for pagare=%s",
-                        pagare,
-                        exc_info=True,
-                    )
-                    raise OracleExactFetchError(message) from exc
-                raise
-
-            result_cursor = ref_cursor_out.getvalue()
-
-            if not result_cursor:
-                return []
+    #? Caché negativa: tras un fallo reciente se repite el error sin llamar a Oracle
+    fallido = buscar_negativo('SP_PLANPAGOSCONSUMOINDIVIDUAL', pagare)
+    if fallido is not None and fallido.vigente:
+        logger.info(f"SP_PLANPAGOSCONSUMOINDIVIDUAL: fallo en caché para el pagaré {pagare} ({fallido.motivo})")
+        if fallido.motivo == MOTIVO_ORA_01422:
+            raise OracleExactFetchError(fallido.detalle)
+        return []
+
+    logger.info(f"Llamando SP_PLANPAGOSCONSUMOINDIVIDUAL con parametros: {[pagare]}")
+    try:
+        all_rows = ejecutar_procedimiento('SP_PLANPAGOSCONSUMOINDIVIDUAL', [pagare], particion=PARTICION_ORACLE)
+    except oracledb.DatabaseError as exc:
+        message = str(exc)
+        if "ORA-01422" in message:
+            logger.error(
+                "ORA-01422 in SP_PLANPAGOSCONSUMOINDIVIDUAL for pagare=%s",
+                pagare,
+                exc_info=True,
+            )
+            registrar_negativo('SP_PLANPAGOSCONSUMOINDIVIDUAL', pagare, MOTIVO_ORA_01422, message)
+            raise OracleExactFetchError(message) from exc
+        raise
+
+    if not all_rows:
+        logger.info(f"SP_PLANPAGOSCONSUMOINDIVIDUAL: sin filas para el pagaré {pagare}")
+        registrar_negativo('SP_PLANPAGOSCONSUMOINDIVIDUAL', pagare, MOTIVO_SIN_FILAS)
+        return []
+
+    if fallido is not None:
+        #? El pagaré ya responde: se olvida el fallo anterior
+        fallido.delete()
+
+    return _procesar_flujos(all_rows)
+
+#? Normaliza y filtra el listado mientras se lee el cursor (API/flujos.py)
+_LECTURA_LISTADO = LecturaListado(_obtener_pagare)
 
-            try:
-                cols = [c[0] for c in result_cursor.description]
-                all_rows = [dict(zip(cols, row)) for row in result_cursor]
-            finally:
-                if result_cursor:
-                    result_cursor.close()
-
-            if not all_rows:
-                print("El SP individual no retornó filas para el pagaré:", pagare)
-                return []
-
-            for row in all_rows:
-                for key, value in row.items():
-                    if value is None:
-                        row[key] = ''
-
-                if 'MAIL' not in row or not row['MAIL']:
-                    row['MAIL'] = 'no-email@example.com'
-
-                plan_pago = []
-                nos = str(row.get('NO', '')).split(';')
-                fechas = str(row.get('FECHA', '')).split(';')
-                abonos_capital = str(row.get('ABONO_CAPITAL', '')).split(';')
-                abonos_interes = str(row.get('ABONO_INTERES', '')).split(';')
-                seguro_vida = str(row.get('SEGURO_VIDA', '')).split(';')
-                otros_conceptos = str(row.get('OTROS_CONCEPTOS', '')).split(';')
-                capitalizaciones = str(row.get('CAPITALIZACION', '')).split(';')
-                valores_cuota = str(row.get('VALOR_CUOTA', '')).split(';')
-                saldos_parcial = str(row.get('SALDO_PARCIAL', '')).split(';')
-
-                num_cuotas = len(nos)
-                for i in range(num_cuotas):
-                    plan_pago.append({
-                        'NO': (nos[i] if i < len(nos) else '').strip(),
-                        'FECHA': (fechas[i] if i < len(fechas) else '').strip(),
-                        'ABONO_CAPITAL': (abonos_capital[i] if i < len(abonos_capital) else '').strip(),
-                        'ABONO_INTERES': (abonos_interes[i] if i < len(abonos_interes) else '').strip(),
-                        'SEGURO_VIDA': (seguro_vida[i] if i < len(seguro_vida) else '').strip(),
-                        'OTROS_CONCEPTOS': (otros_conceptos[i] if i < len(otros_conceptos) else '').strip(),
-                        'CAPITALIZACION': (capitalizaciones[i] if i < len(capitalizaciones) else '').strip(),
-                        'VALOR_CUOTA': (valores_cuota[i] if i < len(valores_cuota) else '').strip(),
-                        'SALDO_PARCIAL': (saldos_parcial[i] if i < len(saldos_parcial) else '').strip(),
-                    })
-
-                row['PLAN_PAGO'] = plan_pago
-
-                fechas_no_vacias = [r['FECHA'] for r in plan_pago if r.get('FECHA')]
-                row['FECHAULTIMA'] = fechas_no_vacias[-1] if fechas_no_vacias else row.get('FECHAULTIMA', 'N/A')
-
-                valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if str(r.get('NO')) == '1' and r.get('VALOR_CUOTA')), None)
-                if not valor_cuota_no1:
-                    valor_cuota_no1 = next((r.get('VALOR_CUOTA') for r in plan_pago if r.get('VALOR_CUOTA')), None)
-                row['VALORCUOTA'] = valor_cuota_no1 or row.get('VALORCUOTA', 'N/A')
-
-            return all_rows
 
 def _obtener_datos_basicos():
     """
@@ -252,76 +175,46 @@ def _obtener_datos_basicos():
     now = datetime.now()
     fecha_actual = now.strftime("%Y/%m/%d %H:%M:%S")
 
-    with _get_oracle_connection() as conn:
-        with conn.cursor() as cursor:
-            ref_cursor_out = cursor.var(oracledb.CURSOR)
-            parametros_completos = [fecha_actual, ref_cursor_out]
-            
-            logger.info(f"Llamando SP_PLANPAGOSCONSUMO1 con parametros: {parametros_completos}")
-            cursor.callproc('SP_PLANPAGOSCONSUMO1', parametros_completos)
-            
-            result_cursor = ref_cursor_out.getvalue()
-            
-            if not result_cursor:
-                return []
+    logger.info(f"Llamando SP_PLANPAGOSCONSUMO1 con parametros: {[fecha_actual]}")
+    #? Las filas llegan normalizadas, con su PAGARE y sin las que no tienen MAIL o CEDULA
+    all_rows = ejecutar_procedimiento('SP_PLANPAGOSCONSUMO1', [fecha_actual], particion=PARTICION_ORACLE, lectura=_LECTURA_LISTADO)
+    logger.debug(f"SP_PLANPAGOSCONSUMO1: {len(all_rows)} filas en el listado")
 
-            try:
-                cols = [c[0] for c in result_cursor.description]
-                fetched_rows = result_cursor.fetchall()
-                all_rows = [dict(zip(cols, row)) for row in fetched_rows]
-                print("TOTAL ROWS OBTENIDAS DE SP_PLANPAGOSCONSUMO1:", len(all_rows))
-                print("TODOS LOS DATOS ",all_rows)
-            finally:
-                # Asegurarse de cerrar el cursor del procedimiento almacenado
-                if result_cursor:
-                    result_cursor.close()
-
-            # Procesar los datos obtenidos
-            for row in all_rows:
-                # Reemplazar valores None por strings vacíos
-                for key, value in row.items():
-                    if value is None:
-                        row[key] = ''
-                
-                # Asignar un email por defecto si no existe o está vacío
-                if 'MAIL' not in row or not row['MAIL']:
-                    row['MAIL'] = 'no-email@example.com'
+    return all_rows
 
-                # Guardar el pagaré derivado de la obligación para su uso en la API
-                row['PAGARE'] = _obtener_pagare(row.get('OBLIGACION'))
+def _resumen_flujos(all_flows):
+    """
+    Resumen (FlujoResumen) de los flujos. Solo llegan registros con MAIL válido y CEDULA
+    no vacía: _LECTURA_LISTADO descarta el resto durante el fetch.
+    """
+    return resumen_listado(all_flows)
 
-            return all_rows
+
+def _obtener_resumen():
+    """Resumen del listado SP_PLANPAGOSCONSUMO1: lo que se guarda en la caché de listados."""
+    return _resumen_flujos(_obtener_datos_basicos())
 
 class ListarFlujosPendientes(APIView):
 
     def get(self, request):
         try:
-            all_flows = _obtener_datos_basicos()
-            # Filtrar solo registros con MAIL válido y CEDULA no vacía
-            all_flows = [
-                flow for flow in all_flows
-                if flow.get("MAIL")
-                and flow.get("MAIL") != "no-email@example.com"
-                and str(flow.get("CEDULA", "")).strip()
-            ]
+            #? Resumen compartido entre peticiones (TTL + single-flight); no se modifica
+            listado = listado_cacheado('SP_PLANPAGOSCONSUMO1', _obtener_resumen)
             existing_obligaciones = set(
                 HistorialPDFs.objects.values_list("obligacion", flat=True)
             )
-            summary_list = []
-            for flow in all_flows:
-                obligacion = str(flow.get("OBLIGACION", "")).strip()
-                pagare = flow.get("PAGARE") or _obtener_pagare(flow.get("OBLIGACION"))
-                pagare = str(pagare).strip()
-                if obligacion in existing_obligaciones or pagare in existing_obligaciones:
-                    continue
-                summary_list.append({
-                    "CEDULA": flow.get("CEDULA"),
-                    "NOMBRE": flow.get("NOMBRE"),
-                    "MAIL": flow.get("MAIL"),
-                    "OBLIGACION": flow.get("OBLIGACION"),
-                    "PAGARE": pagare,
-                })
-            return JsonResponse(summary_list, safe=False, status=status.HTTP_200_OK)
+            summary_list = [
+                flow for flow in listado.valor
+                if str(flow.OBLIGACION).strip() not in existing_obligaciones
+                and flow.PAGARE not in existing_obligaciones
+            ]
+            prefetch_detalles.programar('SP_PLANPAGOSCONSUMO', [flow.PAGARE for flow in summary_list], _procesar_flujos)
+            response = JsonResponse(resumen_json(summary_list), safe=False, status=status.HTTP_200_OK)
+            return cabeceras_cache(response, listado)
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
         except Exception as e:
             logger.error(f"Error en la funcin ListarFlujosPendientes: {e}", exc_info=True)
             return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -331,42 +224,8 @@ class GenerarPDF(APIView):
         return _filtrar_flujos(pagare=pagare or None)
 
     def _parse_number(self, s):
-        """
-        Convierte una cadena en Decimal entendiendo formatos:
-        - '1.234.567' -> 1234567
-        - '146004,84' -> 146004.84
-        - '146004.84' -> 146004.84
-        - '3,791,706'  -> 3791706
-        - '' o None    -> 0
-        """
-        if s is None:
-            return Decimal(0)
-        s = str(s).strip()
-        if not s:
-            return Decimal(0)
-
-        # Si tiene ambos separadores, asume . = miles, , = decimal (formato PESOS)
-        if '.' in s and ',' in s:
-            s = s.replace('.', '').replace(',', '.')
-        else:
-            # Si sólo tiene ',', aseume que es decimal
-            if ',' in s:
-                s = s.replace('.', '')  # por si vienen puntos de miles mezclados
-                s = s.replace(',', '.')
-            else:
-                # Sólo tiene puntos. ¿Es decimal?
-                parts = s.split('.')
-                if len(parts) > 1 and len(parts[-1]) <= 2:
-                    # ej: 146004.84 => decimal, se conserva
-                    s = ''.join(parts[:-1]) + '.' + parts[-1]
-                else:
-                    # ej: 1.234.567 => miles, se remueven
-                    s = s.replace('.', '')
-
-        try:
-            return Decimal(s)
-        except InvalidOperation:
-            return Decimal(0)
+        """Convierte una cadena de Oracle en Decimal ('' o None -> 0). Ver API/numeros.py."""
+        return parse_numero(s)
 
     def _format_colombian(self, num_str):
         """Formatea a miles con punto. Acepta str/Decimal/float; sin decimales en la salida."""
@@ -815,31 +674,19 @@ class GenerarPDF(APIView):
         if end_row is None:
             end_row = len(plan_pago_data)
         
-        data_slice = plan_pago_data[start_row:end_row]
-
         headers = ["No.", "Fecha", "Abono\nCapital", "Abono\nInterés", "Seguro de\nvida", "Otros\nconceptos", "Capitalización", "Valor Cuota", "Saldo\nparcial"]
-        col_names = ['NO', 'FECHA', 'ABONO_CAPITAL', 'ABONO_INTERES', 'SEGURO_VIDA', 'OTROS_CONCEPTOS', 'CAPITALIZACION', 'VALOR_CUOTA', 'SALDO_PARCIAL']
-        
+
         table_data = [headers]
-        
-        for row in data_slice:
-            formatted_row = []
-            for idx, col_name in enumerate(col_names):
-                value = row.get(col_name, '')
-                if idx > 1:
-                    formatted_row.append(self._format_colombian(value))
-                else:
-                    formatted_row.append(str(value))
-            table_data.append(formatted_row)
+
+        #? El plan se lee por columnas (API/plan_pagos.py): las cuotas del tramo salen como tuplas
+        for no, fecha, *valores in plan_pago_data.filas(start_row, end_row):
+            table_data.append([no, fecha, *map(self._format_colombian, valores)])
 
         is_last_slice = (end_row >= len(plan_pago_data))
-        # Dentro de _draw_payment_table, en el bloque de totales:
         if is_last_slice and len(plan_pago_data) > 0:
+            #? Totales de las columnas numéricas, calculados una vez por plan
             totales = ['Totales', '']
-            for col_idx, col_name in enumerate(col_names):
-                if col_idx > 1:
-                    total = sum(self._parse_number(row.get(col_name, 0)) for row in plan_pago_data if row.get(col_name) not in (None, ''))
-                    totales.append(self._format_colombian(total))
+            totales.extend(self._format_colombian(total) for total in plan_pago_data.totales().values())
             # Vacía el total de "Saldo parcial"
             totales[-1] = ''
             table_data.append(totales)
@@ -900,6 +747,14 @@ class GenerarPDF(APIView):
         p.drawRightString(width - 40, 30, f"Página: {page_num}")
 
     def get(self, request, obligacion):
+        #? Una sola generación por pagaré entre workers y nodos: si otra petición ya
+        #? la está haciendo se espera a que termine y se responde según el historial.
+        with bloqueo_generacion(f"pdf:{PARTICION_ORACLE}", _obtener_pagare(obligacion) or obligacion) as lider:
+            if not lider:
+                return respuesta_generacion_en_curso(obligacion)
+            return self._generar(request, obligacion)
+
+    def _generar(self, request, obligacion):
         pagare = _obtener_pagare(obligacion)
         # Primero, verificar si el PDF para esta obligación ya existe en el historial.
         if HistorialPDFs.objects.filter(obligacion=obligacion).exists():
@@ -937,6 +792,8 @@ class GenerarPDF(APIView):
             if not cedula:
                 return JsonResponse({"error": "No se encontró la cédula para la obligación dada."}, status=status.HTTP_400_BAD_REQUEST)
 
+            #? No se renderiza si el cliente ya no va a esperar el PDF
+            verificar_deadline('render')
             buffer = io.BytesIO()
 
             cedula_password = str(cedula)
@@ -967,6 +824,7 @@ class GenerarPDF(APIView):
             page_num = 2
             start_row = 0
             for i in range(num_payment_pages):
+                verificar_deadline('render')
                 p.showPage()
                 self._draw_header(p, width, height)
                 y_pos_page = height - 80
@@ -985,6 +843,7 @@ class GenerarPDF(APIView):
 
             file_name = f'{datetime.now().strftime("%b-%Y").upper()}_ID_{cedula}_SOL.pdf'
 
+            verificar_deadline('guardado')
             # Guardar el nuevo PDF en el historial (ya no se necesita la comprobación aquí).
             historial = HistorialPDFs(
                 obligacion=obligacion,
@@ -1000,6 +859,10 @@ class GenerarPDF(APIView):
             
             return response
 
+        except PoolSaturadoError as e:
+            return respuesta_pool_saturado(e)
+        except DeadlineAgotadoError as e:
+            return respuesta_deadline_agotado(e)
         except Exception as e:
             logger.error(f"Error en GenerarPDF para obligación {obligacion}: {e}", exc_info=True)
             return JsonResponse({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -59,6 +59,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'API.deadline.DeadlineMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -111,6 +112,193 @@ DATABASES = {
     },
 }
 
+# Pool de conexiones Oracle (API/oracle_pool.py)
+# Cada worker de gunicorn tiene su propio pool. Por defecto su máximo cubre los
+# hilos de petición del worker (GUNICORN_THREADS), las sesiones reservadas para
+# API (ORACLE_POOL_RESERVA_API) y la precarga en segundo plano (cuota 'prefetch'),
+# de modo que las cuotas de abajo realmente separen unas líneas de otras.
+# Sesiones Oracle totales = workers * ORACLE_POOL_MAX (+ workers ASGI * ORACLE_ASYNC_POOL_MAX).
+GUNICORN_THREADS = env.int('GUNICORN_THREADS', default=1)
+ORACLE_POOL_RESERVA_API = env.int('ORACLE_POOL_RESERVA_API', default=1)
+_CUOTA_PREFETCH = env.int('ORACLE_POOL_CUOTA_PREFETCH', default=1)
+ORACLE_POOL_MIN = env.int('ORACLE_POOL_MIN', default=1)
+ORACLE_POOL_MAX = env.int(
+    'ORACLE_POOL_MAX', default=GUNICORN_THREADS + ORACLE_POOL_RESERVA_API + _CUOTA_PREFETCH
+)
+ORACLE_POOL_INCREMENT = env.int('ORACLE_POOL_INCREMENT', default=1)
+ORACLE_POOL_TIMEOUT = env.int('ORACLE_POOL_TIMEOUT', default=300)
+# 'timedwait': si no hay conexión libre en ORACLE_POOL_WAIT_TIMEOUT_MS la petición
+# responde 503 con Retry-After en lugar de dejar el worker esperando indefinidamente.
+ORACLE_POOL_GETMODE = env('ORACLE_POOL_GETMODE', default='timedwait')
+ORACLE_POOL_WAIT_TIMEOUT_MS = env.int('ORACLE_POOL_WAIT_TIMEOUT_MS', default=5000)
+ORACLE_POOL_RETRY_AFTER_S = env.int('ORACLE_POOL_RETRY_AFTER_S', default=5)
+# Cuotas por línea de producto: sesiones del pool que cada app puede ocupar a la vez
+# DENTRO DE UN WORKER (son semáforos por proceso, no un límite global entre workers).
+# Las líneas masivas dejan ORACLE_POOL_RESERVA_API sesiones libres para API
+# (ValidarAsociado, interactivo). Una app sin cuota usa todo el pool.
+_CUOTA_LINEA = max(1, ORACLE_POOL_MAX - ORACLE_POOL_RESERVA_API)
+ORACLE_POOL_CUOTAS = {
+    'API': env.int('ORACLE_POOL_CUOTA_API', default=ORACLE_POOL_MAX),
+    'APIConsumo': env.int('ORACLE_POOL_CUOTA_CONSUMO', default=_CUOTA_LINEA),
+    'APIComercial': env.int('ORACLE_POOL_CUOTA_COMERCIAL', default=_CUOTA_LINEA),
+    'APIMicro': env.int('ORACLE_POOL_CUOTA_MICRO', default=_CUOTA_LINEA),
+    # Precarga en segundo plano (API/prefetch.py)
+    'prefetch': _CUOTA_PREFETCH,
+}
+# Máximo del pool async (API/oracle_async.py): un worker ASGI atiende muchas
+# peticiones concurrentes, por eso no se liga a GUNICORN_THREADS.
+ORACLE_ASYNC_POOL_MAX = env.int('ORACLE_ASYNC_POOL_MAX', default=10)
+# Cuotas del pool async, por worker ASGI y con la misma reserva para API.
+_CUOTA_LINEA_ASYNC = max(1, ORACLE_ASYNC_POOL_MAX - ORACLE_POOL_RESERVA_API)
+ORACLE_ASYNC_POOL_CUOTAS = {
+    'API': env.int('ORACLE_ASYNC_POOL_CUOTA_API', default=ORACLE_ASYNC_POOL_MAX),
+    'APIConsumo': env.int('ORACLE_ASYNC_POOL_CUOTA_CONSUMO', default=_CUOTA_LINEA_ASYNC),
+    'APIComercial': env.int('ORACLE_ASYNC_POOL_CUOTA_COMERCIAL', default=_CUOTA_LINEA_ASYNC),
+    'APIMicro': env.int('ORACLE_ASYNC_POOL_CUOTA_MICRO', default=_CUOTA_LINEA_ASYNC),
+}
+# Grabación / reproducción de respuestas (API/oracle_replay.py): 'real' (por defecto),
+# 'grabar' (usa Oracle y guarda cada REF CURSOR en ORACLE_FIXTURES_DIR) o 'replay'
+# (sin Oracle: responde con los fixtures, con latencia +/- jitter por ida y vuelta).
+# Solo aplica al pool sync (el de oracle_pool.acquire_connection).
+ORACLE_MODO = env('ORACLE_MODO', default='real')
+ORACLE_FIXTURES_DIR = env('ORACLE_FIXTURES_DIR', default=str(BASE_DIR / 'oracle_fixtures'))
+ORACLE_REPLAY_LATENCIA_MS = env.float('ORACLE_REPLAY_LATENCIA_MS', default=0)
+ORACLE_REPLAY_JITTER_MS = env.float('ORACLE_REPLAY_JITTER_MS', default=0)
+ORACLE_REPLAY_ESTRICTO = env.bool('ORACLE_REPLAY_ESTRICTO', default=False)
+# Precalentamiento del pool al arrancar cada worker (gunicorn.conf.py)
+ORACLE_POOL_WARMUP = env.bool('ORACLE_POOL_WARMUP', default=True)
+ORACLE_POOL_WARMUP_PING = env.bool('ORACLE_POOL_WARMUP_PING', default=True)
+# Segundos que se espera a las llamadas en curso antes de cerrar el pool al salir el worker
+ORACLE_POOL_DRAIN_S = env.int('ORACLE_POOL_DRAIN_S', default=10)
+# Formatos NLS fijados en cada sesión nueva del pool. Con el formato conocido los
+# montos se parsean de forma estricta (API/numeros.py). Vacío = formato de la BD.
+# NLS_NUMERIC_CHARACTERS: primer carácter = decimal, segundo = miles.
+ORACLE_NLS_NUMERIC_CHARACTERS = env('ORACLE_NLS_NUMERIC_CHARACTERS', default='.,')
+ORACLE_NLS_DATE_FORMAT = env('ORACLE_NLS_DATE_FORMAT', default='DD/MM/YYYY')
+
+# Ejecución de procedimientos con REF CURSOR (API/oracle_exec.py)
+ORACLE_CALL_TIMEOUT_MS = env.int('ORACLE_CALL_TIMEOUT_MS', default=60000)
+# Valores por defecto para cualquier procedimiento; row_factory: 'dict', 'tuple' o
+# 'flujo' (registro con __slots__ de API/flujos.py, sin un dict por fila).
+# lobs_inline: los CLOB (ej. columnas del plan de pagos unidas con ';') llegan como
+# str en el primer fetch en vez de requerir una ida y vuelta por LOB.
+ORACLE_SP_DEFAULTS = {
+    'arraysize': 100,
+    'prefetchrows': 2,
+    'call_timeout_ms': ORACLE_CALL_TIMEOUT_MS,
+    'row_factory': 'dict',
+    'lobs_inline': True,
+}
+# Ajustes por procedimiento. Los listados (SP_*1) devuelven cientos de filas: se
+# traen en lotes grandes. Las consultas de una fila traen la fila y el fin del
+# cursor en la misma ida y vuelta (prefetchrows = filas esperadas + 1).
+# Las filas de los SP_PLANPAGOS* llegan como Flujo (los listados traen miles).
+_SP_LISTADO = {'arraysize': 500, 'prefetchrows': 501, 'row_factory': 'flujo'}
+_SP_DETALLE = {'arraysize': 10, 'prefetchrows': 11, 'row_factory': 'flujo'}
+ORACLE_SP_CONFIG = {
+    'SP_PLANPAGOS1': _SP_LISTADO,
+    'SP_PLANPAGOSCONSUMO1': _SP_LISTADO,
+    'SP_PLANPAGOSCOMERCIAL1': _SP_LISTADO,
+    'SP_PLANPAGOSMICROCREDITO1': _SP_LISTADO,
+    'SP_PLANPAGOS': _SP_DETALLE,
+    'SP_PLANPAGOSCONSUMO': _SP_DETALLE,
+    'SP_PLANPAGOSCONSUMOINDIVIDUAL': _SP_DETALLE,
+    'SP_PLANPAGOSCOMERCIAL': _SP_DETALLE,
+    'SP_PLANPAGOSMICROCREDITO': _SP_DETALLE,
+    'SP_CONSULTACAPA': {'arraysize': 1, 'prefetchrows': 2},
+}
+
+# Cachés. 'oracle' es el nivel compartido entre workers (y nodos) de API/cache.py:
+# tabla UNLOGGED oracle_cache en Postgres (migración API 0003). Al superar
+# MAX_ENTRIES se descarta 1/CULL_FREQUENCY de las entradas.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'oracle': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'oracle_cache',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': env.int('ORACLE_CACHE_MAX_ENTRADAS', default=5000),
+            'CULL_FREQUENCY': 3,
+        },
+    },
+}
+# Entradas del nivel local (LRU en memoria de cada worker) por caché
+CACHE_LOCAL_MAX_ENTRADAS = env.int('CACHE_LOCAL_MAX_ENTRADAS', default=1000)
+# Al vencer una clave compartida, un solo worker consulta Oracle (advisory lock por
+# clave); los demás releen el nivel compartido hasta CACHE_BLOQUEO_ESPERA_S y después
+# consultan por su cuenta.
+CACHE_BLOQUEO_ESPERA_S = env.int('CACHE_BLOQUEO_ESPERA_S', default=10)
+
+# Lotes (API/oracle_exec.py: ejecutar_procedimiento_lote): máximo de llamadas al SP
+# por bloque PL/SQL (una ida y vuelta) y máximo de obligaciones por generar-pdf-lote.
+ORACLE_LOTE_MAX = env.int('ORACLE_LOTE_MAX', default=50)
+PDF_LOTE_MAX = env.int('PDF_LOTE_MAX', default=50)
+
+# Segundos que se reutiliza el listado de flujos pendientes (SP_PLANPAGOS*1) por
+# línea de producto (API/cache.py). Se guarda solo el resumen de 5 campos por flujo
+# (FlujoResumen), no las filas completas. Las peticiones simultáneas comparten una
+# sola consulta a Oracle. 0 = sin caché (solo se comparten las consultas en curso).
+LISTADO_CACHE_TTL_S = env.int('LISTADO_CACHE_TTL_S', default=60)
+
+# Caché de ValidarAsociado (SP_CONSULTACAPA) por cédula. Los "NO" duran menos porque la
+# cédula puede afiliarse en cualquier momento; Cache-Control: no-cache la salta.
+ASOCIADO_CACHE_TTL_S = env.int('ASOCIADO_CACHE_TTL_S', default=300)
+ASOCIADO_CACHE_TTL_NO_S = env.int('ASOCIADO_CACHE_TTL_NO_S', default=30)
+ASOCIADO_CACHE_MAX_ENTRADAS = env.int('ASOCIADO_CACHE_MAX_ENTRADAS', default=5000)
+# Las filas de SP_CONSULTACAPA son datos personales: por defecto solo se guardan en la
+# memoria de cada worker. True = también en la tabla compartida de Postgres (oracle_cache).
+ASOCIADO_CACHE_COMPARTIDA = env.bool('ASOCIADO_CACHE_COMPARTIDA', default=False)
+# validar-asociado-lote/: máximo de cédulas distintas por petición y consultas
+# simultáneas por worker (compartidas entre todos los lotes en curso). Los hilos
+# efectivos son min(ASOCIADO_LOTE_HILOS, ORACLE_POOL_CUOTAS['API'], ORACLE_POOL_MAX);
+# las cédulas que no caben esperan en la cola del worker.
+ASOCIADO_LOTE_MAX = env.int('ASOCIADO_LOTE_MAX', default=1000)
+ASOCIADO_LOTE_HILOS = env.int('ASOCIADO_LOTE_HILOS', default=4)
+
+# Caché negativa por pagaré (API/negativos.py, modelo PagareFallido). Un pagaré sin
+# filas o con ORA-01422 no se vuelve a consultar hasta pasado el backoff: BASE, 2*BASE,
+# 4*BASE, ... hasta MAX. Se consulta y limpia en oracle/negativos/ (solo staff).
+NEGATIVO_CACHE = env.bool('NEGATIVO_CACHE', default=True)
+NEGATIVO_BACKOFF_BASE_S = env.int('NEGATIVO_BACKOFF_BASE_S', default=900)
+NEGATIVO_BACKOFF_MAX_S = env.int('NEGATIVO_BACKOFF_MAX_S', default=21600)
+
+# Precarga de detalles (API/prefetch.py). Tras cada listado, un hilo del worker trae
+# en lote el SP_PLANPAGOS* de los pagarés listados y lo deja PREFETCH_TTL_S segundos
+# para GenerarPDF. Opcional: el hilo ocupa una sesión del pool (cuota 'prefetch'),
+# así que conviene ORACLE_POOL_MAX >= 2 al activarlo.
+PREFETCH_DETALLES = env.bool('PREFETCH_DETALLES', default=False)
+PREFETCH_TTL_S = env.int('PREFETCH_TTL_S', default=120)
+PREFETCH_HILOS = env.int('PREFETCH_HILOS', default=1)
+PREFETCH_MAX_PENDIENTES = env.int('PREFETCH_MAX_PENDIENTES', default=500)
+# Los detalles precargados traen datos personales (cédula, nombre, dirección, correo):
+# como ASOCIADO_CACHE_COMPARTIDA, por defecto quedan solo en la memoria del worker que
+# hizo el listado. True = también en la tabla compartida oracle_cache, para que los
+# aproveche el worker que reciba la petición del PDF.
+PREFETCH_CACHE_COMPARTIDA = env.bool('PREFETCH_CACHE_COMPARTIDA', default=False)
+
+# Generación de PDFs: un advisory lock de Postgres por pagaré (API/bloqueos.py) evita
+# que un reintento genere el mismo PDF en otro worker. Quien no obtiene el lock espera
+# hasta PDF_BLOQUEO_ESPERA_S y luego responde 409 GENERACION_EN_CURSO con Retry-After.
+# La espera ocupa el worker (con gunicorn sync, todo el worker): se mantiene corta y es
+# el cliente quien reintenta tras Retry-After.
+PDF_BLOQUEO_ESPERA_S = env.int('PDF_BLOQUEO_ESPERA_S', default=3)
+PDF_BLOQUEO_RETRY_AFTER_S = env.int('PDF_BLOQUEO_RETRY_AFTER_S', default=15)
+
+# Deadline por petición (API/deadline.py). El pool, cada llamada a Oracle y el render
+# del PDF usan solo el tiempo que le queda a la petición; al agotarse se responde 504.
+# Ligeramente por debajo de los timeouts del flujo de n8n (60 s listados, 120 s PDFs).
+REQUEST_DEADLINE_S = env.int('REQUEST_DEADLINE_S', default=55)
+REQUEST_DEADLINE_PDF_S = env.int('REQUEST_DEADLINE_PDF_S', default=115)
+# Fragmento de la ruta -> segundos; la cabecera X-Request-Timeout tiene prioridad
+REQUEST_DEADLINE_RUTAS = {
+    'generar-pdf': REQUEST_DEADLINE_PDF_S,
+}
+# Tope para X-Request-Timeout (un cliente no puede pedir más que esto)
+REQUEST_DEADLINE_MAX_S = env.int('REQUEST_DEADLINE_MAX_S', default=115)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
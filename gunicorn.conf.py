@@ -0,0 +1,49 @@
+# gunicorn.conf.py
+#? gunicorn carga este archivo automáticamente desde el directorio de trabajo (/app).
+#? Los parámetros de la línea de comandos (--workers, --timeout, ...) siguen aplicando.
+import logging
+import os
+
+logger = logging.getLogger("gunicorn.error")
+
+#? Carga Django, reportlab y las URLs una sola vez en el master y las comparte
+#? copy-on-write con los workers. El pool Oracle se crea por worker (ver API/oracle_pool.py).
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in ("1", "true", "yes")
+
+#? Tiempo que tiene un worker tras SIGTERM para terminar las peticiones en curso
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+
+def when_ready(server):
+    """En el master: si algo creó el pool durante la precarga se cierra antes de hacer fork."""
+    if not preload_app:
+        return
+    from API.oracle_pool import cerrar_pool
+
+    cerrar_pool(espera_s=0)
+
+
+def post_worker_init(worker):
+    """Precalienta el pool Oracle del worker antes de aceptar peticiones."""
+    from django.conf import settings
+
+    if not getattr(settings, "ORACLE_POOL_WARMUP", True):
+        return
+    from API.oracle_pool import precalentar_pool
+
+    try:
+        resultado = precalentar_pool()
+        logger.info("Worker %s: pool Oracle precalentado en %s ms", worker.pid, resultado["duracion_ms"])
+    except Exception as e:
+        #? Si Oracle no responde el worker arranca igual; el pool se creará en la primera petición
+        logger.error("Worker %s: fallo al precalentar el pool Oracle: %s", worker.pid, e, exc_info=True)
+
+
+def worker_exit(server, worker):
+    """Al salir el worker (SIGTERM, max_requests, reinicio) drena y cierra su pool."""
+    try:
+        from API.oracle_pool import cerrar_pool
+
+        cerrar_pool()
+    except Exception as e:
+        logger.error("Worker %s: error cerrando el pool Oracle: %s", worker.pid, e, exc_info=True)